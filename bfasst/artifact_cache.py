@@ -0,0 +1,186 @@
+""" Content-addressed cache of tool products, shared between build directories
+
+A run of a tool is identified by a key, which is a hash of:
+    - the tool class, and the source of the bfasst modules that define it and of the modules
+      of their packages that they use (the tool version),
+    - the version of the external tool, if any (Tool.get_tool_version),
+    - the parsed tool arguments (flow_args),
+    - the part,
+    - the contents of the input files.
+
+The key of the last run started in a tool work directory is kept in the directory, so a previous
+run is reused as long as nothing it depends on changed, whatever the file timestamps are.
+
+The products (and logs) of successful runs are also stored in a shared cache directory, under
+their key, and hardlinked back into the build directory when an identical run is needed again,
+eg. for the same design in another experiment.  Since products are hardlinked, files are always
+unlinked before a tool writes them again (see remove_products), never modified in place.
+
+The cache directory is $BFASST_CACHE_DIR (default ~/.cache/bfasst).  BFASST_CACHE=0 disables the
+shared cache; previous runs in the same build directory are still reused.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pathlib
+import shutil
+import sys
+
+ENABLED = os.environ.get("BFASST_CACHE", "1") != "0"
+CACHE_DIR = pathlib.Path(
+    os.environ.get("BFASST_CACHE_DIR", pathlib.Path.home() / ".cache" / "bfasst")
+)
+
+# Bump this whenever the key or the layout of the cache changes
+CACHE_VERSION = 1
+
+KEY_FILE_NAME = ".run_key"
+MANIFEST_FILE_NAME = "manifest.json"
+
+# (path, inode, size, mtime) -> hash, so unchanged files are only read once per process
+_FILE_HASHES = {}
+
+
+def hash_file(path):
+    """Hash of the contents of a file"""
+    stat = os.stat(path)
+    memo_key = (str(path), stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _FILE_HASHES:
+        digest = hashlib.sha256()
+        with open(path, "rb") as fp:
+            for chunk in iter(lambda: fp.read(1 << 20), b""):
+                digest.update(chunk)
+        _FILE_HASHES[memo_key] = digest.hexdigest()
+    return _FILE_HASHES[memo_key]
+
+
+def get_tool_source_files(tool):
+    """Source files of the bfasst classes a tool is made of, and of the modules of their
+    packages that they use (eg. bfasst.transform.edif_to_verilog for XilinxPhysNetlist)"""
+    files = []
+    for cls in type(tool).__mro__:
+        if cls.__module__.split(".")[0] != "bfasst":
+            continue
+        module = sys.modules[cls.__module__]
+        package = cls.__module__.rpartition(".")[0]
+        modules = [module] + [
+            used
+            for used in map(inspect.getmodule, vars(module).values())
+            if used is not None and used.__name__.rpartition(".")[0] == package
+        ]
+        for used in modules:
+            path = inspect.getsourcefile(used)
+            if path not in files:
+                files.append(path)
+    return files
+
+
+def get_run_key(tool, dependencies):
+    """Key of a run of a tool on the given input files"""
+    # pylint: disable=import-outside-toplevel
+    import bfasst.config
+
+    args = {} if tool.args is None else vars(tool.args)
+    record = {
+        "version": CACHE_VERSION,
+        "tool": type(tool).__module__ + "." + type(tool).__qualname__,
+        "sources": [hash_file(path) for path in get_tool_source_files(tool)],
+        "tool_version": tool.get_tool_version(),
+        "args": sorted((name, repr(value)) for name, value in args.items()),
+        "part": bfasst.config.PART,
+        "inputs": [hash_file(path) for path in dependencies],
+    }
+    return hashlib.sha256(json.dumps(record).encode()).hexdigest()
+
+
+def read_run_key(work_dir):
+    try:
+        return (work_dir / KEY_FILE_NAME).read_text().strip()
+    except OSError:
+        return None
+
+
+def write_run_key(work_dir, key):
+    (work_dir / KEY_FILE_NAME).write_text(key + "\n")
+
+
+def get_product_paths(tool_products):
+    """All files (products and logs) of a list of ToolProducts"""
+    paths = []
+    for tool_product in tool_products:
+        for path in (tool_product.file_path, tool_product.log_path):
+            if path is not None and path not in paths:
+                paths.append(path)
+    return paths
+
+
+def remove_products(tool_products):
+    """Remove the files of a previous run, before running again.  They may be hardlinks to the
+    cache, so they must not be overwritten in place."""
+    for path in get_product_paths(tool_products):
+        path.unlink(missing_ok=True)
+
+
+def get_entry_dir(key):
+    return CACHE_DIR / "runs" / key[:2] / key
+
+
+def store(key, tool_products):
+    """Store the files of a successful run in the cache, if they are not there yet"""
+    if not ENABLED:
+        return
+    entry_dir = get_entry_dir(key)
+    if entry_dir.is_dir():
+        return
+    paths = get_product_paths(tool_products)
+    if not all(path.is_file() for path in paths):
+        return
+
+    # Built under a temporary name, so other processes never see a partial entry
+    tmp_dir = CACHE_DIR / "tmp" / f"{key}.{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    names = []
+    for idx, path in enumerate(paths):
+        names.append(f"{idx}_{path.name}")
+        link_or_copy(path, tmp_dir / names[-1])
+    with open(tmp_dir / MANIFEST_FILE_NAME, "w") as fp:
+        json.dump(names, fp)
+
+    entry_dir.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        tmp_dir.rename(entry_dir)
+    except OSError:
+        # Stored by another process in the meantime
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def restore(key, tool_products):
+    """Hardlink the files of a cached run into place.  Returns whether the run was found."""
+    if not ENABLED:
+        return False
+    entry_dir = get_entry_dir(key)
+    try:
+        with open(entry_dir / MANIFEST_FILE_NAME) as fp:
+            names = json.load(fp)
+    except (OSError, ValueError):
+        return False
+    paths = get_product_paths(tool_products)
+    if len(names) != len(paths):
+        return False
+
+    for name, path in zip(names, paths):
+        path.unlink(missing_ok=True)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        link_or_copy(entry_dir / name, path)
+    return True
+
+
+def link_or_copy(src, dest):
+    try:
+        os.link(src, dest)
+    except OSError:
+        # Eg. the cache is on another file system
+        shutil.copy2(src, dest)
@@ -2,7 +2,6 @@
 
 import re
 import socket
-import pathlib
 
 # Suppress paramiko warning
 # import warnings
@@ -15,7 +14,7 @@ import scp
 import bfasst
 from bfasst import paths
 from bfasst.design import HdlType
-from bfasst.tool import ToolProduct
+from bfasst.tool import ToolProduct, tool_stage
 from bfasst.status import BfasstException, Status, CompareStatus
 from bfasst.compare.base import CompareTool
 from bfasst.types import Vendor
@@ -40,28 +39,9 @@ class ConformalCompareTool(CompareTool):
         self.remote_libs_dir_path = None
         self.local_libs_paths = None
 
+    @tool_stage
     def compare_netlists(self, design):
         """Compare given netlists"""
-        log_path = self.work_dir / self.LOG_FILE_NAME
-
-        generate_comparison = ToolProduct(None, log_path, self.check_compare_status)
-        status = self.get_prev_run_status(
-            tool_products=(generate_comparison,),
-            dependency_modified_time=max(
-                pathlib.Path(__file__).stat().st_mtime,
-                design.reversed_netlist_path.stat().st_mtime,
-            ),
-        )
-
-        if status is not None:
-            self.print_skipping_compare()
-            return status
-
-        self.print_running_compare()
-
-        # Connect to remote machine
-        client = self.connect_to_remote_machine()
-
         # Handle libraries
         if self.vendor == Vendor.XILINX:
             self.remote_libs_dir_path = bfasst.config.CONFORMAL_REMOTE_LIBS_DIR / "xilinx"
@@ -83,6 +63,27 @@ class ConformalCompareTool(CompareTool):
         else:
             assert False, self.vendor
 
+        log_path = self.work_dir / self.LOG_FILE_NAME
+
+        generate_comparison = ToolProduct(None, log_path, self.check_compare_status)
+        status = self.get_prev_run_status(
+            tool_products=(generate_comparison,),
+            dependencies=[
+                *self.local_libs_paths,
+                *design.get_golden_files(),
+                design.reversed_netlist_path,
+            ],
+        )
+
+        if status is not None:
+            self.print_skipping_compare()
+            return status
+
+        self.print_running_compare()
+
+        # Connect to remote machine
+        client = self.connect_to_remote_machine()
+
         # Create do file
         do_file_path = self.create_do_file(design)
 
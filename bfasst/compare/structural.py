@@ -1,11 +1,36 @@
 """ Structural Comparison and Mapping tool """
 
+from array import array
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import itertools
+import multiprocessing
+
 from bidict import bidict
-import spydrnet as sdn
+import numpy as np
 from bfasst import jpype_jvm
 from bfasst.compare.base import CompareTool
-from bfasst.status import CompareStatus, Status
-from bfasst.utils import TermColor, error, properties_are_equal
+from bfasst.compare.structural_incremental import (
+    MAPPING_FILE_NAME,
+    HashedNetlist,
+    load_mapping,
+    save_mapping,
+)
+from bfasst.compare.structural_partition import get_components, group_pairs, pair_components
+from bfasst.compare.structural_signatures import compute_signatures, match_unique_signatures
+from bfasst.compare.structural_verify import verify_mapping
+from bfasst.netlist_ir import (
+    ASSIGNMENT_CELL_PREFIX,
+    DIRECTION_IN,
+    DIRECTION_OUT,
+    NO_ID,
+    load_netlist_ir,
+)
+from bfasst.status import BfasstException, CompareStatus, Status
+from bfasst.tool import tool_stage
+from bfasst.tool_log import LogLevel
+from bfasst.utils import TermColor, error, normalize_properties
 
 
 class StructuralCompareTool(CompareTool):
@@ -13,6 +38,34 @@ class StructuralCompareTool(CompareTool):
 
     TOOL_WORK_DIR = "struct_cmp"
 
+    # Properties that must match for a cell to be considered equivalent, by cell type
+    PROPERTIES_TO_MATCH_BY_TYPE = {
+        "LUT6_2": ("INIT",),
+        "FDSE": ("INIT",),
+        "FDRE": ("INIT",),
+        "BUFGCTRL": (
+            "INIT_OUT",
+            "IS_CE0_INVERTED",
+            "IS_CE1_INVERTED",
+            "IS_IGNORE0_INVERTED",
+            "IS_IGNORE1_INVERTED",
+            "IS_S0_INVERTED",
+            "IS_S1_INVERTED",
+            "PRESELECT_I0",
+            "PRESELECT_I1",
+        ),
+        "IBUF": (),
+        "OBUF": (),
+        "OBUFT": (),
+        "MUXF7": (),
+        "MUXF8": (),
+        "CARRY4": (),
+    }
+
+    # Ambiguous instances with at most this many candidates are re-queued when one of the
+    # candidates is mapped elsewhere.  Larger candidate sets rely on net mapping events.
+    MAX_CANDIDATES_TO_WAIT_ON = 16
+
     def __init__(self, cwd, flow_args="") -> None:
         super().__init__(cwd, flow_args)
 
@@ -22,57 +75,73 @@ class StructuralCompareTool(CompareTool):
         self.block_mapping = bidict()
         self.net_mapping = bidict()
 
-        jpype_jvm.start()
+        # Mapping saved after a successful compare, reused with --incremental
+        self.mapping_path = self.work_dir / MAPPING_FILE_NAME
+
+        # Worklist of named instances to (re)consider for mapping
+        self.worklist = deque()
+        self.queued = set()
+        self.waiting_on_candidate = defaultdict(list)
+        self.worklist_pushes = 0
+        self.worklist_pops = 0
+        self.worklist_sweeps = 0
+        self.num_mapped_at_last_sweep = None
+
+    def add_args(self):
+        super().add_args()
+        self.arg_parser.add_argument(
+            "--parallel_components",
+            type=int,
+            default=0,
+            help="Map independent components of the netlists on this many worker processes",
+        )
+        self.arg_parser.add_argument(
+            "--signature_rounds",
+            type=int,
+            default=4,
+            help="Rounds of structural signature refinement used to pre-match instances "
+            "(0 to disable)",
+        )
+        self.arg_parser.add_argument(
+            "--skip_verify",
+            action="store_true",
+            help="Don't verify the pins and LUT functions of the complete mapping",
+        )
+        self.arg_parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Reuse the mapping saved by the previous run, and only map the instances and "
+            "nets that changed since",
+        )
 
+    @tool_stage
     def compare_netlists(self, design):
         """Map the golden and reversed netlists through automated block mapping"""
 
+        jpype_jvm.start()
+
         impl_netlist = design.impl_netlist_path
         netlist_b = design.reversed_netlist_path
 
         self.open_new_log()
 
         self.log_title("Building netlist A", impl_netlist)
-
-        # Loads the first netlist as intermediate representation (ir1)
-        ir_a = sdn.parse(str(impl_netlist))
-        library_a = ir_a.libraries[0]
-        netlist_a = self.get_netlist(library_a)
-        self.log(f"Golden netlist size: {len(netlist_a.instances)}")
+        netlist_a = self.get_netlist(load_netlist_ir(impl_netlist))
+        self.log(f"Golden netlist size: {netlist_a.ir.num_instances}")
 
         self.log_title("Building netlist B", netlist_b)
-
-        # Loads the second netlist as intermediate representation (ir2)
-        ir_b = sdn.parse(str(netlist_b))
-        library_b = ir_b.libraries[0]
-        netlist_b = self.get_netlist(library_b)
-        self.log(f"Reversed netlist size: {len(netlist_b.instances)}")
-
-        # golden_netlist = [i for i in golden_netlist if i.name not in ("GND")]
+        netlist_b = self.get_netlist(load_netlist_ir(netlist_b))
+        self.log(f"Reversed netlist size: {netlist_b.ir.num_instances}")
 
         self.named_netlist = netlist_a
         self.reversed_netlist = netlist_b
 
-        # for instance in self.named_netlist.instances:
-        #     print(instance.instance.name)
-        #     if instance.instance.name.strip() == r"\count_i_reg[12]_i_6":
-        #         for pin in instance.pins:
-        #             print(
-        #                 pin.pin.inner_pin.port.name,
-        #                 pin.index,
-        #                 pin.pin.wire,
-        #                 pin.pin.wire.index() if pin.pin.wire else "",
-        #             )
-        #         raise NotImplementedError
-
-        # raise NotImplementedError
-
         # Structurally map the rest of the netlists
         self.perform_mapping()
 
         self.log_title("Mapping Report")
         for key, val in self.block_mapping.items():
-            self.log(f"{key.name} -> {val.name}")
+            self.log(f"{netlist_a.get_instance_name(key)} -> {netlist_b.get_instance_name(val)}")
 
         self.log_title("Finalizing")
         self.log(
@@ -85,445 +154,743 @@ class StructuralCompareTool(CompareTool):
             for block in self.named_netlist.instances_to_map
             if block not in self.block_mapping
         ]:
-            self.log(f"    {block.name}")
+            self.log(f"    {netlist_a.get_instance_name(block)}")
 
         self.log(
-            "Number of mapped nets:", f"{len(self.net_mapping)} of {self.named_netlist.num_wires()}"
+            "Number of mapped nets:",
+            f"{len(self.net_mapping)} of {self.named_netlist.ir.num_wires}",
         )
         self.log("  Unmapped nets:")
-        for net in [net for net in self.named_netlist.nets if net not in self.net_mapping]:
-            self.log(f"    {net.name}")
+        for net in range(self.named_netlist.ir.num_nets):
+            if net not in self.net_mapping:
+                self.log(f"    {netlist_a.ir.get_net_name(net)}")
 
         if len(self.block_mapping) < len(self.named_netlist.instances_to_map):
             return Status(CompareStatus.COULD_NOT_MAP)
 
-        # TODO: After establishing mapping, verify equivalence
-        # Basically make sure all outputs are mapped, and then everything is identical
-        # Maybe this will already be guaranteed by the mapping algorithm? ...good to
-        # double check.
+        # Check that every pin of every mapped instance is on corresponding nets, and that
+        # mapped LUTs compute the same functions
+        if not self.args.skip_verify:
+            self.log_title("Verifying mapping")
+            num_errors, errors = verify_mapping(
+                self.named_netlist, self.reversed_netlist, self.block_mapping, self.net_mapping
+            )
+            for msg in errors:
+                self.log_color(TermColor.RED, msg, level=LogLevel.ERROR)
+            if num_errors:
+                self.log_color(TermColor.RED, f"{num_errors} errors")
+                return Status(CompareStatus.NOT_EQUIVALENT, errors[0])
+            self.log(f"Verified {len(self.block_mapping)} blocks and {len(self.net_mapping)} nets")
+
+        save_mapping(self.mapping_path, *self.hashed_netlists, self.block_mapping, self.net_mapping)
 
         return self.success_status
 
     def perform_mapping(self):
         """Maps netlists based on their cells and nets"""
 
+        named_ir = self.named_netlist.ir
+        reversed_ir = self.reversed_netlist.ir
+
         # First map top-level nets
         self.log_title("Mapping top-level ports")
-        for pin in self.named_netlist.pins:
-            assert isinstance(pin, Pin)
-            self.log(
-                "Mapping port",
-                f"{pin.name}[{pin.index}] to",
-                f"{pin.name}[{pin.index}]",
-            )
+        for pin in named_ir.get_top_pins():
+            name = named_ir.get_port_name(pin)
+            index = named_ir.pin_index[pin]
+            self.log_debug("Mapping port", f"{name}[{index}] to", f"{name}[{index}]")
             self.add_net_mapping(
-                pin.net,
-                self.reversed_netlist.get_pin(pin.name, pin.index).net,
+                named_ir.pin_net[pin],
+                reversed_ir.pin_net[reversed_ir.get_top_pin(name, index)],
             )
 
-        self.log_title("Starting mapping iterations")
-        progress = True
+        if self.args.incremental:
+            self.restore_saved_mapping()
 
-        # Loop until all blocks have been mapped or there is no more progress
+        if self.args.signature_rounds > 0:
+            self.prematch_signatures(self.args.signature_rounds)
 
-        iteration = 0
-        while len(self.block_mapping) < len(self.named_netlist.instances_to_map):
-            if not progress:
-                self.log_color(
-                    TermColor.RED, f"No more progress can be made. Failed at iteration {iteration}."
-                )
-                break
-            progress = False
+        if self.args.parallel_components > 1:
+            self.map_components_in_parallel(self.args.parallel_components)
 
-            self.log_color(TermColor.BLUE, f"===== Mapping Iteration {iteration} =====")
+        return self.map_instances()
 
-            # Loop through reversed netlist blocks
-            for instance in self.named_netlist.instances_to_map:
-                if instance not in self.block_mapping:
-                    # Skip assign statements (named netlist shouldn't have them)
-                    assert not instance.cell_type.startswith("SDN_VERILOG_ASSIGNMENT")
+    def map_instances(self):
+        """Map all remaining instances, propagating from the mapped nets"""
 
-                    self.log(f"Considering {instance.name} ({instance.cell_type})")
+        named_ir = self.named_netlist.ir
 
-                    # Get the implemented potential instance to map
-                    instances_matching = self.check_for_potential_mapping(instance)
+        self.log_title("Starting mapping")
 
-                    # self.log(f"  {instances_matching} matches")
+        # Every instance is considered at least once.  After that, an instance is only
+        # reconsidered when something in its neighbourhood changes (see enqueue callers).
+        for instance in self.named_netlist.instances_to_map:
+            if instance not in self.block_mapping:
+                self.enqueue(instance)
 
-                    if not instances_matching:
-                        return Status(
-                            CompareStatus.NOT_EQUIVALENT,
-                            f"{instance.name} has no possible match in netlist",
-                        )
+        # Loop until all blocks have been mapped or there is no more progress
+        while len(self.block_mapping) < len(self.named_netlist.instances_to_map):
+            if not self.worklist:
+                if not self.requeue_unmapped():
+                    self.log_color(TermColor.RED, "No more progress can be made.")
+                    break
+                continue
 
-                    if len(instances_matching) > 1:
-                        self.log(f"  {len(instances_matching)} matches, skipping for now:")
-                        for matched_instance in instances_matching:
-                            self.log(f"    {matched_instance.name}")
-                        continue
+            instance = self.worklist.popleft()
+            self.queued.discard(instance)
+            self.worklist_pops += 1
 
-                    assert len(instances_matching) == 1
-                    matched_instance = instances_matching[0]
+            if instance in self.block_mapping:
+                continue
 
-                    self.log(f"  Mapped to {matched_instance.name}")
+            # Skip assign statements (named netlist shouldn't have them)
+            cell_type = named_ir.get_cell_type(instance)
+            assert not cell_type.startswith(ASSIGNMENT_CELL_PREFIX)
 
-                    self.add_block_mapping(instance, matched_instance)
+            self.log_debug(
+                f"Considering {self.named_netlist.get_instance_name(instance)} ({cell_type})"
+            )
 
-                    progress = True
-                    continue
+            # Get the implemented potential instance to map
+            instances_matching = self.check_for_potential_mapping(instance)
+
+            if not instances_matching:
+                return Status(
+                    CompareStatus.NOT_EQUIVALENT,
+                    f"{self.named_netlist.get_instance_name(instance)} has no possible match in "
+                    "netlist",
+                )
+
+            if len(instances_matching) > 1:
+                self.log_debug(f"  {len(instances_matching)} matches, skipping for now:")
+                for matched_instance in instances_matching:
+                    self.log_debug(
+                        f"    {self.reversed_netlist.get_instance_name(matched_instance)}"
+                    )
+
+                # Reconsider this instance once one of a few candidates gets taken
+                if len(instances_matching) <= self.MAX_CANDIDATES_TO_WAIT_ON:
+                    for matched_instance in instances_matching:
+                        self.waiting_on_candidate[matched_instance].append(instance)
+                continue
 
-            iteration += 1
+            matched_instance = instances_matching[0]
+
+            self.log_debug(
+                f"  Mapped to {self.reversed_netlist.get_instance_name(matched_instance)}"
+            )
+
+            self.add_block_mapping(instance, matched_instance)
+
+        self.log(
+            f"Worklist: {self.worklist_pushes} pushes, {self.worklist_pops} pops,",
+            f"{self.worklist_sweeps} sweeps",
+        )
         return self.success_status
 
+    def requeue_unmapped(self):
+        """Safety net for an empty worklist: candidates can also be disambiguated by other
+        instances being mapped, which is only partially tracked, so queue every unmapped
+        instance again as long as the previous sweep made progress.  Returns whether
+        anything was queued."""
+        if self.num_mapped_at_last_sweep == len(self.block_mapping):
+            return False
+        self.num_mapped_at_last_sweep = len(self.block_mapping)
+        self.worklist_sweeps += 1
+        self.log_color(TermColor.BLUE, f"===== Mapping Sweep {self.worklist_sweeps} =====")
+        for instance in self.named_netlist.instances_to_map:
+            if instance not in self.block_mapping:
+                self.enqueue(instance)
+        return True
+
+    def enqueue(self, instance):
+        """Add a named instance to the worklist, if it isn't already queued"""
+        if instance in self.queued:
+            return
+        self.queued.add(instance)
+        self.worklist.append(instance)
+        self.worklist_pushes += 1
+
     def add_block_mapping(self, instance, matched_instance):
-        """Add mapping point between two Instances"""
-        assert isinstance(instance, Instance)
-        assert isinstance(matched_instance, Instance)
+        """Add mapping point between two instances (given by their ids in the named and
+        reversed netlist), and map the nets connected to their pins"""
+        named_ir = self.named_netlist.ir
+        reversed_ir = self.reversed_netlist.ir
 
         self.block_mapping[instance] = matched_instance
+        self.reversed_netlist.remove_from_index(matched_instance)
 
-        for pin in instance.pins:
-            # Some pins should not be used to establish net mapping
-            if pin.ignore_net_equivalency:
-                continue
+        # Instances that were only ambiguous because of this candidate
+        for waiting_instance in self.waiting_on_candidate.pop(matched_instance, ()):
+            if waiting_instance not in self.block_mapping:
+                self.enqueue(waiting_instance)
 
-            net_a = pin.net
+        for pin in named_ir.get_instance_pins(instance):
+            net_a = named_ir.pin_net[pin]
 
-            if net_a is None:
+            if net_a == NO_ID:
                 # Disconnected pin
                 continue
 
-            assert isinstance(net_a, Net)
-            if net_a in self.net_mapping:
+            # Some pins should not be used to establish net mapping
+            if self.named_netlist.ignore_net_equivalency(pin):
                 continue
 
-            net_b = matched_instance.get_pin(pin.name, pin.index).net
-            assert isinstance(net_b, Net)
-
             if net_a in self.net_mapping:
-                assert net_b == self.net_mapping[net_a]
                 continue
 
-            self.log(
+            name = named_ir.get_port_name(pin)
+            other_pin = reversed_ir.get_instance_pin(
+                matched_instance, name, named_ir.pin_index[pin]
+            )
+            net_b = reversed_ir.pin_net[other_pin]
+            assert net_b != NO_ID
+
+            self.log_debug(
                 "    Net",
-                net_a.name.strip(),
+                named_ir.get_net_name(net_a).strip(),
                 "mapped to",
-                net_b.name,
-                f"(from {pin.name})",
+                reversed_ir.get_net_name(net_b),
+                f"(from {name})",
             )
-            # self.log(pin.ignore_net_equivalency)
-            # self.log(pin.net.is_gnd)
-            # self.log(pin.net.driver_pin)
             self.add_net_mapping(net_a, net_b)
 
-        # TODO: Update net mappings
-
     def add_net_mapping(self, net1, net2):
-        assert isinstance(net1, Net)
-        assert isinstance(net2, Net)
+        """Add mapping point between two nets, and queue the affected named instances"""
+        assert net1 != NO_ID
+        assert net2 != NO_ID
 
         assert net1 not in self.net_mapping
         assert net2 not in self.net_mapping.inverse
         self.net_mapping[net1] = net2
 
+        # A newly mapped net can narrow down the candidates of any instance connected to it
+        for instance in self.named_netlist.get_instances_to_map_on_net(net1):
+            if instance not in self.block_mapping:
+                self.enqueue(instance)
+
     def check_for_potential_mapping(self, named_instance):
         """Returns cells that could map to the named_instance"""
-        all_instances = self.reversed_netlist.instances
 
-        ###############################################################
-        # First find all instances of the same type that are unmapped
-        ###############################################################
-        instances_matching_cell_type = [
-            i
-            for i in all_instances
-            if i.cell_type == named_instance.cell_type and i not in self.block_mapping.inverse
-        ]
-
-        if not instances_matching_cell_type:
-            self.log_color(TermColor.RED, "No unmapped instances of type", named_instance.cell_type)
-            return instances_matching_cell_type
-        self.log(
-            f"  {len(instances_matching_cell_type)} unmapped {named_instance.cell_type} instance(s)"
-        )
+        named_ir = self.named_netlist.ir
 
         ###############################################################
-        # Now look at properties
+        # First find all unmapped instances of the same type and properties
         ###############################################################
-        properties_to_match = self.get_properties_for_type(named_instance.cell_type)
-
-        properties = named_instance.properties
+        cell_type = named_ir.get_cell_type(named_instance)
+        properties_to_match = self.get_properties_for_type(cell_type)
 
-        instances_matching_props = instances_matching_cell_type[:]
+        properties = named_ir.instance_properties[named_instance]
         for prop in properties_to_match:
             if properties is None or prop not in properties:
                 error(prop, "not in properties:", properties)
             assert prop in properties
 
-            # Filter by properties match (case insensitive)
-            instances_matching_props = [
-                i
-                for i in instances_matching_cell_type
-                if i not in self.block_mapping.inverse
-                and prop in i.properties
-                and properties_are_equal(properties[prop], i.properties[prop])
-            ]
+        instances_matching_props = self.reversed_netlist.get_unmapped_instances(
+            self.named_netlist.property_keys[named_instance]
+        )
         if not instances_matching_props:
             self.log_color(
                 TermColor.RED,
-                f"No unmapped instances of {named_instance.cell_type} with matching properties",
-                ",".join(p + "=" + properties[p] for p in properties_to_match),
-                "\n  "
-                + "\n  ".join(
-                    str(i.name) + " " + str(i.properties) for i in instances_matching_cell_type
-                ),
+                f"No unmapped instances of {cell_type} with matching properties",
+                ",".join(p + "=" + str(properties[p]) for p in properties_to_match),
             )
-            return instances_matching_props
-        self.log(f"  {len(instances_matching_props)} instance(s) after filtering on properties")
+            return []
+        self.log_debug(
+            f"  {len(instances_matching_props)} instance(s) after filtering on properties"
+        )
 
-        ###############################################################
-        # Now look at connections
-        ###############################################################
+        return self.filter_on_connections(named_instance, instances_matching_props)
+
+    def filter_on_connections(self, named_instance, candidates):
+        """Narrow down candidates to the instances connected to the same mapped nets"""
+        named_ir = self.named_netlist.ir
+
+        # Each pin connected to a mapped net narrows the candidates down to the instances
+        # connected to the corresponding mapped net on the same pin.
+        candidate_sets = [candidates]
+        for pin, other_net, instances_on_pin in self.get_candidates_on_mapped_nets(named_instance):
+            self.log_debug(
+                f"  Filtering on pin {named_ir.get_port_name(pin)}[{named_ir.pin_index[pin]}],",
+                f"{self.reversed_netlist.ir.get_net_name(other_net)}:",
+                f"{len(instances_on_pin)} connected",
+            )
+            candidate_sets.append(instances_on_pin)
+
+        instances_matching_connections = intersect_candidates(candidate_sets)
 
-        instances_matching_connections = instances_matching_props[:]
+        self.log_debug(
+            f"  {len(instances_matching_connections)} instance(s) after filtering on connections"
+        )
 
-        for pin in named_instance.pins:
-            assert isinstance(pin, Pin)
+        return instances_matching_connections
 
+    def get_candidates_on_mapped_nets(self, named_instance):
+        """For each pin of named_instance connected to a mapped net, yield the pin, the mapped
+        net in the reversed netlist, and the unmapped instances connected to it on the same pin"""
+        named_ir = self.named_netlist.ir
+        for pin in named_ir.get_instance_pins(named_instance):
             # Skip pin that is not yet mapped
-            if pin.net not in self.net_mapping:
+            net = named_ir.pin_net[pin]
+            if net not in self.net_mapping:
                 continue
 
-            # Otherwise pin connected to a mapped net, and filter based on instances that are
-            # connected to the corresponding mapped net.
-            other_net = self.net_mapping[pin.net]
+            other_net = self.net_mapping[net]
+            yield pin, other_net, self.reversed_netlist.get_unmapped_instances_on_net(
+                other_net, named_ir.get_port_name(pin), named_ir.pin_index[pin]
+            )
 
-            self.log(f"  Filtering on pin {pin.name_with_index}, {other_net.name}")
+    def prematch_signatures(self, rounds):
+        """Map, in bulk, the instances whose structural signature is unique in both netlists.
+        Pairs that contradict the nets mapped so far are left to the regular algorithm."""
 
-            # for instance in instances_matching_connections:
-            #     self.log(
-            #         instance.get_pin(pin.name, pin.index).name_with_index,
-            #         instance.get_pin(pin.name, pin.index).net.name,
-            #     )
-            instances_matching_connections = [
-                instance
-                for instance in instances_matching_connections
-                if instance.get_pin(pin.name, pin.index).net == other_net
-            ]
-            self.log(
-                f"    {len(instances_matching_connections)} remaining:",
-                ",".join(i.name for i in instances_matching_connections),
+        self.log_title("Matching unique structural signatures")
+
+        named_colours, reversed_colours = compute_signatures(
+            (self.named_netlist, self.reversed_netlist), rounds
+        )
+        named_unmapped = self.named_netlist.get_remaining_instances(self.block_mapping)
+        reversed_unmapped = self.reversed_netlist.get_remaining_instances(
+            self.block_mapping.inverse
+        )
+        pairs = match_unique_signatures(
+            named_colours, named_unmapped, reversed_colours, reversed_unmapped
+        )
+
+        num_rejected = 0
+        for instance, matched_instance in pairs:
+            if not self.is_consistent_pair(instance, matched_instance):
+                num_rejected += 1
+                continue
+            self.log_debug(
+                f"{self.named_netlist.get_instance_name(instance)} matched to",
+                self.reversed_netlist.get_instance_name(matched_instance),
             )
+            self.add_block_mapping(instance, matched_instance)
 
         self.log(
-            f"  {len(instances_matching_connections)} instance(s) after filtering on connections"
+            f"Matched {len(pairs) - num_rejected} of {len(named_unmapped)}",
+            f"instances on signatures, {num_rejected} rejected",
         )
 
-        return instances_matching_connections
+    def restore_saved_mapping(self):
+        """Reuse the pairs of the mapping saved by the previous run whose instances or nets are
+        unchanged on both sides (see structural_incremental).  Pairs that contradict the nets
+        mapped so far are left to the regular algorithm."""
 
-    def get_properties_for_type(self, cell_type):
-        """Return the list of properties that must match for a given cell type
-        for the cell to be considered equivalent."""
+        self.log_title("Restoring saved mapping")
 
-        if cell_type == "LUT6_2":
-            return ("INIT",)
-        if cell_type in ("FDSE", "FDRE"):
-            return ("INIT",)
-        if cell_type == "BUFGCTRL":
-            return (
-                "INIT_OUT",
-                "IS_CE0_INVERTED",
-                "IS_CE1_INVERTED",
-                "IS_IGNORE0_INVERTED",
-                "IS_IGNORE1_INVERTED",
-                "IS_S0_INVERTED",
-                "IS_S1_INVERTED",
-                "PRESELECT_I0",
-                "PRESELECT_I1",
-            )
-        if cell_type in ("IBUF", "OBUF", "OBUFT", "MUXF7", "MUXF8", "CARRY4"):
-            return ()
+        saved = load_mapping(self.mapping_path, *self.hashed_netlists)
+        if saved is None:
+            self.log("No saved mapping")
+            return
+        block_pairs, net_pairs = saved
+
+        # Nets first, in bulk.  Instances don't need to be queued yet (see map_instances).
+        for net, matched_net in net_pairs:
+            if net not in self.net_mapping and matched_net not in self.net_mapping.inverse:
+                self.net_mapping[net] = matched_net
+        num_nets = len(self.net_mapping)
+
+        num_blocks = 0
+        for instance, matched_instance in block_pairs:
+            if not self.is_consistent_pair(instance, matched_instance):
+                continue
+            self.add_block_mapping(instance, matched_instance)
+            num_blocks += 1
 
-        raise KeyError(f"Unhandled properties for type {cell_type}")
+        self.log(
+            f"Restored {num_blocks} of {len(self.named_netlist.instances_to_map)} blocks",
+            f"and {num_nets} of {self.named_netlist.ir.num_nets} nets",
+        )
 
-    def get_netlist(self, library):
-        return Netlist(library, self)
+    @functools.cached_property
+    def hashed_netlists(self):
+        """Structural hashes of the named and reversed netlists, computed on first use"""
+        return HashedNetlist(self.named_netlist), HashedNetlist(self.reversed_netlist)
+
+    def is_consistent_pair(self, instance, matched_instance):
+        """Check that mapping instance to matched_instance agrees with the net mapping"""
+        named_ir = self.named_netlist.ir
+        reversed_ir = self.reversed_netlist.ir
+        for pin in named_ir.get_instance_pins(instance):
+            net_a = named_ir.pin_net[pin]
+            if net_a == NO_ID or self.named_netlist.ignore_net_equivalency(pin):
+                continue
+            other_pin = reversed_ir.get_instance_pin(
+                matched_instance, named_ir.get_port_name(pin), named_ir.pin_index[pin]
+            )
+            net_b = reversed_ir.pin_net[other_pin]
+            if net_b == NO_ID:
+                return False
+            if self.net_mapping.get(net_a, net_b) != net_b:
+                return False
+            if self.net_mapping.inverse.get(net_b, net_a) != net_a:
+                return False
+        return True
+
+    def map_components_in_parallel(self, num_workers):
+        """Split both netlists into components that are independent once the top-level ports
+        are mapped, and map the components that can be paired up on a pool of worker processes.
+        The mappings found by the workers are merged, and any conflict between them discards
+        all of them.  Whatever is left unmapped is mapped by the regular (serial) algorithm."""
+
+        self.log_title("Mapping components in parallel")
+
+        named_unmapped = self.named_netlist.get_remaining_instances(self.block_mapping)
+        reversed_unmapped = self.reversed_netlist.get_remaining_instances(
+            self.block_mapping.inverse
+        )
+        named_component_of, named_components = get_components(
+            self.named_netlist.ir,
+            named_unmapped,
+            self.named_netlist.is_cut_net_for_components(self.net_mapping),
+        )
+        reversed_component_of, reversed_components = get_components(
+            self.reversed_netlist.ir,
+            reversed_unmapped,
+            self.reversed_netlist.is_cut_net_for_components(self.net_mapping.inverse),
+        )
 
+        anchors = self.get_component_anchors(
+            named_unmapped, named_component_of, reversed_component_of
+        )
+        pairs = pair_components(anchors, len(named_components))
 
-class Netlist:
-    """Wrapper class around spydernet top level library"""
+        self.log(
+            f"{len(named_components)} golden and {len(reversed_components)} reversed components,",
+            f"{len(pairs)} paired, covering",
+            f"{sum(len(named_components[c]) for c in pairs)} of",
+            f"{len(named_unmapped)} unmapped instances",
+        )
+        if len(pairs) < 2:
+            self.log("Not enough independent components, mapping serially")
+            return
 
-    def __init__(self, library, tool) -> None:
-        self.library = library
-        self.tool = tool
+        groups = [
+            (
+                [i for named, _ in group for i in named_components[named]],
+                [i for _, rev in group for i in reversed_components[rev]],
+            )
+            for group in group_pairs(pairs, named_components, 4 * num_workers)
+        ]
 
-        # Nets
-        self.wire_to_net = {}
-        self.build_nets()
-
-        # Instances
-        instances = [Instance(i, self) for i in library.get_instances()]
-        # instances = [i for i in instances if i.cell_type not in ("VCC", "GND")]
-        self.instances = instances
-
-        self.instances_to_map = [i for i in self.instances if i.cell_type not in ("GND", "VCC")]
-
-        # Top-level IO pins
-        self.pins = [Pin(pin, None, self) for pin in library.get_pins()]
-
-        self.pins_by_name_and_idx = {}
-        for pin in self.pins:
-            assert isinstance(pin, Pin)
-            key = (pin.name, pin.index)
-            assert key not in self.pins_by_name_and_idx
-            self.pins_by_name_and_idx[key] = pin
-
-    def get_pin(self, name, index):
-        return self.pins_by_name_and_idx[(name, index)]
-
-    def num_wires(self):
-        return len(list(self.library.get_wires()))
-
-    def build_nets(self):
-        """Setup Net objects"""
-
-        # First construct net objects for each wire, skipping alias wires
-        non_alias_wires = [wire for wire in self.library.get_wires() if not Net.wire_is_alias(wire)]
-        for wire in non_alias_wires:
-            net = Net(wire, self.tool)
-            self.tool.log(f"New Net for wire {wire.cable.name}[{wire.index()}]")
-            self.wire_to_net[wire] = net
-
-        # Now add alias wires iteratively until they are all added
-        alias_wires = [wire for wire in self.library.get_wires() if Net.wire_is_alias(wire)]
-        while alias_wires:
-            processed_alias_wires = []
-            for wire in alias_wires:
-                driver_wire = Net.wire_derived_from(wire)
-                if driver_wire not in self.wire_to_net:
-                    continue
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_component_worker,
+            initargs=(self.named_netlist.ir, self.reversed_netlist.ir),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    map_component_group,
+                    self.cwd,
+                    idx,
+                    list(self.net_mapping.items()),
+                    named_instances,
+                    reversed_instances,
+                )
+                for idx, (named_instances, reversed_instances) in enumerate(groups)
+            ]
+            results = [future.result() for future in futures]
+
+        self.merge_component_mappings(results)
 
-                net = self.wire_to_net[driver_wire]
-                self.tool.log(
-                    f"Adding alias wire {wire.cable.name}[{wire.index()}]",
-                    f"to net {net.name}[{net.wire.index()}]",
+    def get_component_anchors(self, named_instances, named_component_of, reversed_component_of):
+        """Instances with a single candidate anchor their component to the candidate's
+        component.  Returns the (named component, reversed component) pair of each anchor."""
+        anchors = []
+        for instance in named_instances:
+            key = self.named_netlist.property_keys[instance]
+            if key is None:
+                continue
+            candidate_sets = [self.reversed_netlist.get_unmapped_instances(key)]
+            candidate_sets.extend(c for _, _, c in self.get_candidates_on_mapped_nets(instance))
+            candidates = intersect_candidates(candidate_sets, limit=2)
+            if len(candidates) == 1:
+                anchors.append((named_component_of[instance], reversed_component_of[candidates[0]]))
+        return anchors
+
+    def merge_component_mappings(self, results):
+        """Merge the (block mapping, net mapping) pairs found for each group of components (None
+        for the groups that couldn't be mapped, which discards all of them)"""
+        block_mapping = bidict()
+        net_mapping = bidict(self.net_mapping)
+        for idx, result in enumerate(results):
+            if result is None:
+                self.log_color(
+                    TermColor.RED, f"Component group {idx} couldn't be mapped, mapping serially"
                 )
-                net.add_alias_wire(wire)
-                processed_alias_wires.append(wire)
+                return
+            block_items, net_items = result
+            self.log(f"Component group {idx}: mapped {len(block_items)} blocks")
+            for mapping, items in ((block_mapping, block_items), (net_mapping, net_items)):
+                for key, val in items:
+                    if mapping.get(key, val) != val or mapping.inverse.get(val, key) != key:
+                        self.log_color(
+                            TermColor.RED,
+                            "Conflicting mappings between components, mapping serially",
+                        )
+                        return
+                    mapping[key] = val
 
-            # Remove wires we processed
-            alias_wires = [wire for wire in alias_wires if wire not in processed_alias_wires]
+        self.log(f"Merged {len(block_mapping)} blocks and {len(net_mapping)} nets")
+        self.net_mapping = net_mapping
+        for instance, matched_instance in block_mapping.items():
+            self.block_mapping[instance] = matched_instance
+            self.reversed_netlist.remove_from_index(matched_instance)
 
-        # Now determine the driver for each net
-        for net in self.wire_to_net.values():
-            net.find_driver()
+    def get_properties_for_type(self, cell_type):
+        """Return the list of properties that must match for a given cell type
+        for the cell to be considered equivalent."""
 
-    @property
-    def nets(self):
-        return self.wire_to_net.values()
+        if cell_type not in self.PROPERTIES_TO_MATCH_BY_TYPE:
+            raise KeyError(f"Unhandled properties for type {cell_type}")
+        return self.PROPERTIES_TO_MATCH_BY_TYPE[cell_type]
 
+    def get_netlist(self, netlist_ir, instances_to_map=None, shared=None):
+        return Netlist(netlist_ir, self, instances_to_map, shared)
 
-class Pin:
-    """Wrapper class around spydernet InnerPin/OuterPin to add some helper properties"""
 
-    def __init__(self, pin, instance, netlist):
-        self.pin = pin
-        self.instance = instance
-        self.netlist = netlist
-        if isinstance(pin, sdn.OuterPin):
-            self.name = self.pin.inner_pin.port.name
-            self.index = self.pin.inner_pin.port.pins.index(self.pin.inner_pin)
-            self.ignore_net_equivalency = self._ignore_net_equivalency(instance)
-        else:
-            self.name = self.pin.port.name
-            self.index = self.pin.port.pins.index(self.pin)
-            self.ignore_net_equivalency = False
+def intersect_candidates(candidate_sets, limit=None):
+    """Instances present in all candidate sets, in the order of the smallest set.  If limit is
+    given, stop after finding that many."""
+    candidate_sets = sorted(candidate_sets, key=len)
+    common = (
+        instance
+        for instance in candidate_sets[0]
+        if all(instance in candidates for candidates in candidate_sets[1:])
+    )
+    return list(itertools.islice(common, limit))
 
-    def _ignore_net_equivalency(self, instance):
-        """Determines whether the net equivalency should be ignored on this pin."""
-        # Ignore net equivalency on constant LUT inputs
-        # The logic function PROBABLY doesn't depend on this LUT input
-        # TODO: Verify this by looking at the LUT INIT
-        if instance.cell_type == "LUT6_2" and self.net and (self.net.is_vdd or self.net.is_gnd):
-            return True
-        return False
 
-        # This didn't work unfortunately
-        # if instance.cell_type == "LUT6_2":
-        #     eqn = LUTTools.getLUTEquation(instance.properties["INIT"])
-        #     print(instance.properties["INIT"])
-        #     # print(eqn)
-        #     return self.name not in eqn
-        # return False
+# The netlist IRs, sent once to each component worker process (see init_component_worker), and
+# Netlists of them with nothing to map, whose whole-IR parts (property keys, net drivers) are
+# shared by the Netlists of the component groups mapped by the worker
+_COMPONENT_WORKER_IRS = None
+_COMPONENT_WORKER_NETLISTS = None
+
+
+def init_component_worker(named_ir, reversed_ir):
+    global _COMPONENT_WORKER_IRS  # pylint: disable=global-statement
+    _COMPONENT_WORKER_IRS = (named_ir, reversed_ir)
+
 
-    @property
-    def net(self):
-        # print()
-        # print(self.instance.name, self.name, self.pin.wire)
-        return self.netlist.wire_to_net.get(self.pin.wire)
+def get_component_worker_netlists(tool):
+    """The shared Netlists of this worker, built (and logged) by the first group it maps"""
+    global _COMPONENT_WORKER_NETLISTS  # pylint: disable=global-statement
+    if _COMPONENT_WORKER_NETLISTS is None:
+        _COMPONENT_WORKER_NETLISTS = tuple(
+            tool.get_netlist(netlist_ir, []) for netlist_ir in _COMPONENT_WORKER_IRS
+        )
+    return _COMPONENT_WORKER_NETLISTS
+
+
+def map_component_group(cwd, idx, net_mapping_items, named_instances, reversed_instances):
+    """Worker process entry point: map the named_instances to the reversed_instances, starting
+    from the given net mapping.  Returns the block and net mapping items, or None if the
+    instances can't all be mapped (Status exceptions don't pickle, so they don't leave the
+    worker)."""
+    tool = StructuralCompareTool(cwd)
+    tool.log_path = tool.work_dir / f"log_component_group_{idx}.txt"
+    tool.open_new_log()
+
+    named_ir, reversed_ir = _COMPONENT_WORKER_IRS
+    named_shared, reversed_shared = get_component_worker_netlists(tool)
+    tool.named_netlist = tool.get_netlist(named_ir, named_instances, named_shared)
+    tool.reversed_netlist = tool.get_netlist(reversed_ir, reversed_instances, reversed_shared)
+    tool.net_mapping.update(net_mapping_items)
+    try:
+        tool.map_instances()
+    except BfasstException as e:
+        tool.log_color(TermColor.RED, "Mapping failed:", e)
+        return None
+    finally:
+        tool.close_log()
 
-    @property
-    def name_with_index(self):
-        return f"{self.name}[{self.index}]"
+    return list(tool.block_mapping.items()), list(tool.net_mapping.items())
 
 
-class Net:
+class Netlist:
+    """Compare-specific indexes on top of the NetlistIR of one netlist.  Instances, pins and
+    nets are all referred to by their IR ids."""
 
-    """Wrapper class around spydernet Wire to add some helper properties"""
+    # Constant drivers.  LUT inputs tied to these nets are not used to map nets.
+    CONSTANT_CELL_TYPES = ("GND", "VCC")
 
-    def __init__(self, wire, tool):
-        self.wire = wire
+    def __init__(self, netlist_ir, tool, instances_to_map=None, shared=None) -> None:
+        self.ir = netlist_ir
         self.tool = tool
-        self.alias_wires = []
-        self.driver_pin = None
-        self.is_vdd = None
-        self.is_gnd = None
 
-    def add_alias_wire(self, wire):
-        assert wire not in self.alias_wires
-        self.alias_wires.append(wire)
+        # Optionally restricted to a set of components (see map_component_group)
+        if instances_to_map is None:
+            instances_to_map = [
+                instance
+                for instance in range(netlist_ir.num_instances)
+                if netlist_ir.get_cell_type(instance) not in self.CONSTANT_CELL_TYPES
+            ]
+        self.instances_to_map = instances_to_map
 
-    def find_driver(self):
-        """Determine the pin that drives this wire"""
+        if shared is not None:
+            # The parts that cover the whole IR are taken from another Netlist of the same IR
+            self.property_keys = shared.property_keys
+            self.net_driver = shared.net_driver
+            self.constant_nets = shared.constant_nets
+        else:
+            self.build_whole_ir()
+
+        # Index of unmapped instances, used to quickly find mapping candidates
+        self.unmapped_by_property_key = defaultdict(dict)
+        self.unmapped_by_net_pin = defaultdict(dict)
+        self.build_index()
+
+    def build_whole_ir(self):
+        """Property keys, net drivers and constant nets, which cover the whole IR (not only the
+        instances to map)"""
+        netlist_ir = self.ir
+
+        # Hashable (cell type, property values) key of each instance.  Instances can only map to
+        # each other if their keys are equal.  None for cell types without property rules.
+        self.property_keys = [
+            self.get_property_key(instance) for instance in range(netlist_ir.num_instances)
+        ]
 
-        # If wire is not connected to any pins, just return
-        if not self.wire.pins:
-            return
+        # Nets
+        self.net_driver = array("i", [NO_ID]) * netlist_ir.num_nets
+        self.constant_nets = set()
+        self.find_drivers()
+
+        self.tool.log(
+            f"Built {netlist_ir.num_nets} nets from {netlist_ir.num_wires} wires,",
+            f"{netlist_ir.num_wires - netlist_ir.num_nets - netlist_ir.num_unresolved_aliases}",
+            "alias wires resolved through assign statements",
+        )
+        if netlist_ir.num_unresolved_aliases:
+            self.tool.log_color(
+                TermColor.RED, f"{netlist_ir.num_unresolved_aliases} alias wires have no driver"
+            )
 
-        # Find the pin that drives this wire
-        for pin in self.wire.pins:
-            # If connected to top-level input
-            if isinstance(pin, sdn.ir.InnerPin):
-                if pin.port.direction == sdn.ir.Port.Direction.IN:
-                    self.set_driver_pin(pin)
-            else:
-                pin_direction = self.get_direction_for_unisim(
-                    pin.instance.reference.name, pin.inner_pin.port.name
-                )
-                if pin_direction == sdn.ir.Port.Direction.OUT:
-                    self.set_driver_pin(pin)
+    def get_instance_name(self, instance):
+        return self.ir.instance_names[instance]
+
+    def get_property_key(self, instance):
+        cell_type = self.ir.get_cell_type(instance)
+        properties_to_match = self.tool.PROPERTIES_TO_MATCH_BY_TYPE.get(cell_type)
+        if properties_to_match is None:
+            return None
+        return (
+            cell_type,
+            normalize_properties(self.ir.instance_properties[instance], properties_to_match),
+        )
 
-        # if self.driver_pin is None:
-        #     print(self.name)
-        # assert self.driver_pin is not None
+    def build_index(self):
+        """Index instances by (cell type, properties) and by (net, pin name, pin index).
+        Dicts are used as insertion-ordered sets so candidate order is deterministic."""
+        for instance in self.instances_to_map:
+            # Cell types without property rules (eg. assign statements) are never candidates
+            if self.property_keys[instance] is None:
+                continue
 
-    def set_driver_pin(self, pin):
-        """Set the driver pin"""
-        assert self.driver_pin is None
-        self.driver_pin = pin
+            self.unmapped_by_property_key[self.property_keys[instance]][instance] = None
+            for key in self.get_net_pin_keys(instance):
+                self.unmapped_by_net_pin[key][instance] = None
 
-        # Check for constant GND/VDD.  Top-level I/O will not be GND/VDD
-        if isinstance(pin, sdn.OuterPin) and self.driver_pin.instance.reference.name == "GND":
-            self.is_gnd = True
-        else:
-            self.is_gnd = False
-        if isinstance(pin, sdn.OuterPin) and self.driver_pin.instance.reference.name == "VDD":
-            self.is_vdd = True
-        else:
-            self.is_vdd = False
+    def get_net_pin_keys(self, instance):
+        """(net, pin name, pin index) of each connected pin of an instance"""
+        return [
+            (self.ir.pin_net[pin], self.ir.get_port_name(pin), self.ir.pin_index[pin])
+            for pin in self.ir.get_instance_pins(instance)
+            if self.ir.pin_net[pin] != NO_ID
+        ]
+
+    def remove_from_index(self, instance):
+        """Remove a (newly mapped) instance from the buckets it belongs to"""
+        self.unmapped_by_property_key[self.property_keys[instance]].pop(instance, None)
+        for key in self.get_net_pin_keys(instance):
+            self.unmapped_by_net_pin[key].pop(instance, None)
+
+    def get_unmapped_instances(self, property_key):
+        """Return the unmapped instances matching a (cell type, properties) key"""
+        return self.unmapped_by_property_key.get(property_key, {})
+
+    def get_remaining_instances(self, block_mapping):
+        """The instances to map that are not mapped yet, given the block mapping from this
+        netlist"""
+        return [instance for instance in self.instances_to_map if instance not in block_mapping]
+
+    def get_unmapped_instances_on_net(self, net, pin_name, pin_index):
+        """Return the unmapped instances connected to net through the given pin"""
+        return self.unmapped_by_net_pin.get((net, pin_name, pin_index), {})
+
+    def get_instances_to_map_on_net(self, net):
+        """Instances connected to a net, excluding constant and assign cells"""
+        return [
+            instance
+            for instance in self.ir.get_net_instances(net)
+            if self.property_keys[instance] is not None
+        ]
+
+    def find_drivers(self):
+        """Determine the pin that drives each net, and which nets are driven by constants"""
+        ir = self.ir
+        for pin in range(ir.num_pins):
+            net = ir.pin_net[pin]
+            if net == NO_ID:
+                continue
 
-    @property
-    def name(self):
-        return self.wire.cable.name
+            instance = ir.pin_instance[pin]
+            if instance == NO_ID:
+                # Top-level input
+                is_driver = ir.pin_direction[pin] == DIRECTION_IN
+            else:
+                cell_type = ir.get_cell_type(instance)
+                # Assign statements only connect alias wires, they don't drive nets
+                if cell_type.startswith(ASSIGNMENT_CELL_PREFIX):
+                    continue
+                is_driver = (
+                    self.get_direction_for_unisim(cell_type, ir.get_port_name(pin)) == DIRECTION_OUT
+                )
+
+            if not is_driver:
+                continue
+            assert self.net_driver[net] == NO_ID
+            self.net_driver[net] = pin
+            if instance != NO_ID and ir.get_cell_type(instance) in self.CONSTANT_CELL_TYPES:
+                self.constant_nets.add(net)
+
+    def is_cut_net_for_components(self, net_mapping):
+        """Return a predicate for the nets that don't connect components: nets that are already
+        mapped, and nets driven by constant cells, which connect most of the netlist"""
+        constant_net_mask = self.get_constant_net_mask()
+
+        def is_cut_net(net):
+            return net in net_mapping or constant_net_mask[net]
+
+        return is_cut_net
+
+    def get_constant_net_mask(self):
+        """Boolean array of the nets driven by GND/VCC cells"""
+        return self.get_constant_net_values() != NO_ID
+
+    def get_constant_net_values(self):
+        """Array of the value of each net driven by a GND (0) or VCC (1) cell, NO_ID for the
+        other nets"""
+        values = np.full(self.ir.num_nets, NO_ID, dtype=np.int8)
+        for net, driver in enumerate(self.net_driver):
+            if NO_ID not in (driver, self.ir.pin_instance[driver]):
+                cell_type = self.ir.get_cell_type(self.ir.pin_instance[driver])
+                if cell_type in self.CONSTANT_CELL_TYPES:
+                    values[net] = cell_type == "VCC"
+        return values
+
+    def ignore_net_equivalency(self, pin):
+        """Determines whether the net equivalency should be ignored on this pin."""
+        # Ignore net equivalency on constant LUT inputs
+        # The logic function PROBABLY doesn't depend on this LUT input
+        # (this is checked against the LUT INIT once mapping is done, see verify_mapping)
+        return (
+            self.ir.get_cell_type(self.ir.pin_instance[pin]) == "LUT6_2"
+            and self.ir.pin_net[pin] in self.constant_nets
+        )
 
     @staticmethod
     def get_direction_for_unisim(cell_type_name, port_name):
@@ -543,96 +910,9 @@ class Net:
         for cell_types, inputs, outputs in cell_inputs_and_outputs:
             if cell_type_name in cell_types:
                 if port_name in inputs:
-                    return sdn.ir.Port.Direction.IN
+                    return DIRECTION_IN
                 if port_name in outputs:
-                    return sdn.ir.Port.Direction.OUT
+                    return DIRECTION_OUT
                 raise NotImplementedError(cell_type_name, port_name)
 
-        if cell_type_name.startswith("SDN_VERILOG_ASSIGNMENT"):
-            if port_name == "i":
-                return sdn.ir.Port.Direction.IN
-            # Shouldn't be possible to get here.  The way the code is set up, this function
-            # is never called on alias wires (wires driven by assign statement)
-            assert False
-
         raise NotImplementedError(cell_type_name, port_name)
-
-    # @staticmethod
-    # def get_assign_statement(wire):
-    #     """Check if a wire is connected to an assign statement and return the pin"""
-
-    #     return None
-
-    @staticmethod
-    def wire_is_alias(wire):
-        """Return whether wire is an alias of another wire (ie derived from assign statement)"""
-        for pin in wire.pins:
-            # assign statements don't have InnerPins
-            if isinstance(pin, sdn.InnerPin):
-                continue
-
-            if (
-                pin.instance.reference.name.startswith("SDN_VERILOG_ASSIGNMENT")
-                and pin.inner_pin.port.name == "o"
-            ):
-                return True
-        return False
-
-    @staticmethod
-    def wire_derived_from(wire):
-        """If a wire is derived from another wire via assign statement, return the driver wire"""
-        for pin in wire.pins:
-            # assign statements don't have InnerPins
-            if isinstance(pin, sdn.InnerPin):
-                continue
-
-            if (
-                pin.instance.reference.name.startswith("SDN_VERILOG_ASSIGNMENT")
-                and pin.inner_pin.port.name == "o"
-            ):
-                # Get the wire driving the assign statement
-                if pin.inner_pin.port.name == list(pin.instance.pins)[0].inner_pin.port.name:
-                    return list(pin.instance.pins)[1].wire
-                return list(pin.instance.pins)[0].wire
-
-        return None
-
-
-class Instance:
-    """Wrapper class around spydernet Instance to add some helper properties"""
-
-    def __init__(self, instance, netlist):
-        self.instance = instance
-        self.netlist = netlist
-
-        self.pins = []
-        self.pins_by_name_and_index = {}
-
-        for pin_spydernet in self.instance.pins:
-            pin = Pin(pin_spydernet, self, self.netlist)
-            self.pins.append(pin)
-            self.pins_by_name_and_index[
-                (
-                    pin_spydernet.inner_pin.port.name,
-                    pin_spydernet.inner_pin.port.pins.index(pin_spydernet.inner_pin),
-                )
-            ] = pin
-            # print(pin.name, pin.ignore_net_equivalency)
-
-        # if self.name == "Sout_i_3_phys":
-        #     raise NotImplementedError
-
-    @property
-    def name(self):
-        return self.instance.name
-
-    @property
-    def cell_type(self):
-        return self.instance.reference.name
-
-    @property
-    def properties(self):
-        return self.instance.data.get("VERILOG.Parameters")
-
-    def get_pin(self, name, index):
-        return self.pins_by_name_and_index[(name, index)]
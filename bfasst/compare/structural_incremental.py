@@ -0,0 +1,167 @@
+"""Persisted structural compare mappings, for incremental re-compare
+
+After a successful compare, the block and net mappings are saved by name, along with a hash of
+the local structure of every mapped instance and net, on both sides:
+
+    instance hash:  cell type, compared properties, and the name of the net on each pin
+    net hash:       the (instance name, port name, pin index) of each pin on the net
+
+On the next run, a saved pair is reused if both of its names still exist and both hashes are
+unchanged, ie. neither side of the pair was touched by the change.  Everything else is mapped
+again by the regular algorithm.  Hashes use structural_signatures.stable_hash, so they can be
+compared between runs.
+"""
+
+import json
+
+import numpy as np
+
+from bfasst.compare.structural_signatures import NO_COLOUR, combine, get_pin_keys, mix, stable_hash
+from bfasst.netlist_ir import NO_ID, as_numpy
+
+# Bump this whenever the file layout or the hashes change, to ignore old mapping files
+MAPPING_FILE_VERSION = 1
+
+MAPPING_FILE_NAME = "structural_mapping.json"
+
+
+def get_net_names(ir):
+    """Unique name of each net, which is the name of its root wire"""
+    return [ir.get_wire_name(wire) for wire in ir.net_wire]
+
+
+def get_structural_hashes(netlist, net_names):
+    """Return the hash of each instance and of each net of a (compare) Netlist, as uint64
+    arrays.  The hashes of the pins of an instance (or a net) are summed, so the pin order
+    doesn't matter, but each pin is keyed by its port name and index."""
+    ir = netlist.ir
+    pin_instance = as_numpy(ir.pin_instance)
+    pin_net = as_numpy(ir.pin_net)
+    pin_keys = get_pin_keys(ir)
+    connected = np.flatnonzero(pin_net != NO_ID)
+    on_instance = connected[pin_instance[connected] != NO_ID]
+
+    with np.errstate(over="ignore"):
+        instance_hashes = mix(hash_values(netlist.property_keys))
+        np.add.at(
+            instance_hashes,
+            pin_instance[on_instance],
+            combine(hash_values(net_names)[pin_net[on_instance]], pin_keys[on_instance]),
+        )
+
+        # Top-level pins are told apart by their pin key
+        pin_instance_names = np.full(ir.num_pins, NO_COLOUR, dtype=np.uint64)
+        pin_instance_names[on_instance] = hash_values(ir.instance_names)[pin_instance[on_instance]]
+        net_hashes = np.zeros(ir.num_nets, dtype=np.uint64)
+        np.add.at(
+            net_hashes,
+            pin_net[connected],
+            combine(pin_instance_names[connected], pin_keys[connected]),
+        )
+
+    return instance_hashes, net_hashes
+
+
+def hash_values(values):
+    return np.array([stable_hash(value) for value in values], dtype=np.uint64)
+
+
+class HashedNetlist:
+    """Names and structural hashes of the instances and nets of a (compare) Netlist"""
+
+    def __init__(self, netlist):
+        self.instance_names = netlist.ir.instance_names
+        self.net_names = get_net_names(netlist.ir)
+        self.instance_hashes, self.net_hashes = get_structural_hashes(netlist, self.net_names)
+
+
+def save_mapping(path, named, reversed_, block_mapping, net_mapping):
+    """Save a block and net mapping (given by IR ids) by name, with the structural hashes of
+    the named and reversed_ HashedNetlists"""
+
+    record = {
+        "version": MAPPING_FILE_VERSION,
+        "blocks": [
+            (
+                named.instance_names[instance],
+                int(named.instance_hashes[instance]),
+                reversed_.instance_names[matched],
+                int(reversed_.instance_hashes[matched]),
+            )
+            for instance, matched in block_mapping.items()
+        ],
+        "nets": [
+            (
+                named.net_names[net],
+                int(named.net_hashes[net]),
+                reversed_.net_names[matched],
+                int(reversed_.net_hashes[matched]),
+            )
+            for net, matched in net_mapping.items()
+        ],
+    }
+
+    # Written under a temporary name first, so an interrupted run leaves the old file intact
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as fp:
+        json.dump(record, fp)
+    tmp_path.replace(path)
+
+
+def load_mapping(path, named, reversed_):
+    """Load a saved mapping, and return the (named id, reversed id) pairs of the blocks and of
+    the nets that are still valid in the named and reversed_ HashedNetlists.  Returns None if
+    there is no usable mapping file."""
+    try:
+        with open(path) as fp:
+            record = json.load(fp)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(record, dict) or record.get("version") != MAPPING_FILE_VERSION:
+        return None
+
+    block_pairs = validate_pairs(
+        record["blocks"],
+        (named.instance_names, named.instance_hashes),
+        (reversed_.instance_names, reversed_.instance_hashes),
+    )
+    net_pairs = validate_pairs(
+        record["nets"],
+        (named.net_names, named.net_hashes),
+        (reversed_.net_names, reversed_.net_hashes),
+    )
+    return block_pairs, net_pairs
+
+
+def validate_pairs(entries, named, reversed_):
+    """Convert saved (name, hash, name, hash) entries to pairs of ids, keeping only the entries
+    whose names both exist and whose hashes are both unchanged.  named and reversed_ are the
+    (names, hashes) of the current netlists."""
+    if not entries:
+        return []
+
+    valid = np.ones(len(entries), dtype=bool)
+    ids = []
+    for side, (names, hashes) in enumerate((named, reversed_)):
+        ids_by_name = get_ids_by_name(names)
+        side_ids = np.array([ids_by_name.get(entry[2 * side], NO_ID) for entry in entries])
+        saved_hashes = np.array([entry[2 * side + 1] for entry in entries], dtype=np.uint64)
+        found = side_ids != NO_ID
+        valid &= found
+        valid &= hashes[np.where(found, side_ids, 0)] == saved_hashes
+        ids.append(side_ids)
+
+    return list(zip(ids[0][valid].tolist(), ids[1][valid].tolist()))
+
+
+def get_ids_by_name(names):
+    """Dict of name -> id, leaving out names that are not unique"""
+    ids = {}
+    duplicates = set()
+    for name_id, name in enumerate(names):
+        if name in ids:
+            duplicates.add(name)
+        ids[name] = name_id
+    for name in duplicates:
+        del ids[name]
+    return ids
@@ -0,0 +1,84 @@
+"""Partitioning of netlists into independent components, for parallel structural compare
+
+Once the top-level ports are mapped, the mapping of an instance only depends on the instances
+it is connected to through unmapped nets.  Cutting the mapped nets (and the constant nets, which
+connect everything) splits a netlist into components that can be mapped independently.
+"""
+
+import heapq
+
+from bfasst.netlist_ir import NO_ID
+
+
+def get_components(ir, instances, is_cut_net):
+    """Split the given instances of a NetlistIR into weakly connected components, ignoring nets
+    for which is_cut_net(net) is True.  Returns a list mapping each instance to its component id
+    (NO_ID for instances that are not given), and the list of components."""
+
+    # Union-find over instances
+    parent = list(range(ir.num_instances))
+
+    def find(instance):
+        root = instance
+        while parent[root] != root:
+            root = parent[root]
+        while parent[instance] != root:
+            parent[instance], instance = root, parent[instance]
+        return root
+
+    to_map = set(instances)
+    for net in range(ir.num_nets):
+        if is_cut_net(net):
+            continue
+        net_instances = [instance for instance in ir.get_net_instances(net) if instance in to_map]
+        for instance in net_instances[1:]:
+            parent[find(instance)] = find(net_instances[0])
+
+    component_of = [NO_ID] * ir.num_instances
+    components = []
+    root_component = {}
+    for instance in instances:
+        root = find(instance)
+        if root not in root_component:
+            root_component[root] = len(components)
+            components.append([])
+        component_of[instance] = root_component[root]
+        components[root_component[root]].append(instance)
+    assert all(component_of[instance] != NO_ID for instance in to_map)
+
+    return component_of, components
+
+
+def pair_components(anchors, num_named_components):
+    """Pair named and reversed components from anchors, which are (named component, reversed
+    component) pairs of instances known to map to each other.  A component is only paired if
+    all of its anchors agree, in both directions.  Returns a dict of named -> reversed component
+    ids."""
+    named_to_reversed = [set() for _ in range(num_named_components)]
+    reversed_to_named = {}
+    for named_component, reversed_component in anchors:
+        named_to_reversed[named_component].add(reversed_component)
+        reversed_to_named.setdefault(reversed_component, set()).add(named_component)
+
+    pairs = {}
+    for named_component, reversed_components in enumerate(named_to_reversed):
+        if len(reversed_components) != 1:
+            continue
+        (reversed_component,) = reversed_components
+        if len(reversed_to_named[reversed_component]) == 1:
+            pairs[named_component] = reversed_component
+    return pairs
+
+
+def group_pairs(pairs, named_components, num_groups):
+    """Spread paired components over num_groups groups of roughly equal size (largest first,
+    each into the currently smallest group).  Returns a list of non-empty lists of pairs."""
+    groups = [[] for _ in range(num_groups)]
+    heap = [(0, idx) for idx in range(num_groups)]
+    for named_component, reversed_component in sorted(
+        pairs.items(), key=lambda pair: len(named_components[pair[0]]), reverse=True
+    ):
+        size, idx = heapq.heappop(heap)
+        groups[idx].append((named_component, reversed_component))
+        heapq.heappush(heap, (size + len(named_components[named_component]), idx))
+    return [group for group in groups if group]
@@ -0,0 +1,154 @@
+"""Structural signatures (Weisfeiler-Lehman style colour refinement) for structural compare
+
+Each instance starts with a colour derived from its cell type and matched properties.  In every
+round, each net is coloured from the colours of the pins on it, and each instance is recoloured
+from its own colour and the colours of the nets on its pins (keyed by pin name and index).
+Top-level ports are coloured by name, since they are mapped by name.
+
+Instances whose colour is unique in both netlists are (almost certainly) mapped to each other,
+so they can be matched in bulk before the regular propagation starts.
+
+Hashes are stable across runs (no use of Python's randomized str hash), so signatures can be
+persisted.  All arithmetic is on uint64 NumPy arrays and wraps around.
+"""
+
+import hashlib
+
+import numpy as np
+
+from bfasst.netlist_ir import NO_ID, as_numpy
+
+# Colour of instances and pins that don't take part in the refinement
+NO_COLOUR = np.uint64(0)
+
+
+def stable_hash(*values):
+    """64-bit hash of the repr of values, stable across runs"""
+    digest = hashlib.blake2b(repr(values).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def mix(values):
+    """Bijective 64-bit mixing function (splitmix64 finalizer), applied elementwise"""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def combine(colours, keys):
+    """Order dependent combination of two colour arrays"""
+    return mix(mix(colours) + keys)
+
+
+def compute_signatures(netlists, rounds):
+    """Return the colour of each instance of each (compare) Netlist after the given number of
+    refinement rounds.  All netlists are refined for the same number of rounds, so colours can
+    be compared between them.  Refinement stops early once the colours no longer split in any
+    netlist.  Instances without property rules (constants, assign statements) are coloured
+    NO_COLOUR."""
+    with np.errstate(over="ignore"):
+        refinements = [SignatureRefinement(netlist) for netlist in netlists]
+        for _ in range(rounds):
+            splits = [refinement.refine() for refinement in refinements]
+            if not any(splits):
+                break
+    return [refinement.colours for refinement in refinements]
+
+
+class SignatureRefinement:
+    """Colour refinement state of one netlist"""
+
+    def __init__(self, netlist):
+        ir = netlist.ir
+        self.num_instances = ir.num_instances
+        self.num_nets = ir.num_nets
+
+        self.colours = np.array(
+            [NO_COLOUR if key is None else stable_hash(key) for key in netlist.property_keys],
+            dtype=np.uint64,
+        )
+        self.active = self.colours != NO_COLOUR
+        self.num_colours = len(np.unique(self.colours[self.active]))
+
+        # Pins that take part: pins of active instances on non-constant nets, and top-level pins
+        pin_instance = as_numpy(ir.pin_instance)
+        pin_net = as_numpy(ir.pin_net)
+        is_top_pin = pin_instance == NO_ID
+        pins = (pin_net != NO_ID) & ~netlist.get_constant_net_mask()[pin_net]
+        pins &= is_top_pin | self.active[np.where(is_top_pin, 0, pin_instance)]
+        pins = np.flatnonzero(pins)
+
+        self.is_top_pin = is_top_pin[pins]
+        self.pin_instance = np.where(self.is_top_pin, 0, pin_instance[pins])
+        self.pin_net = pin_net[pins]
+        self.pin_keys = get_pin_keys(ir)[pins]
+
+    def refine(self):
+        """Run one round of refinement.  Returns whether any colour class was split."""
+
+        # Top-level pins keep a fixed colour given by their name
+        pin_colours = np.where(
+            self.is_top_pin, self.pin_keys, combine(self.colours[self.pin_instance], self.pin_keys)
+        )
+        net_colours = np.zeros(self.num_nets, dtype=np.uint64)
+        np.add.at(net_colours, self.pin_net, mix(pin_colours))
+
+        instance_pins = ~self.is_top_pin
+        neighbourhood = np.zeros(self.num_instances, dtype=np.uint64)
+        np.add.at(
+            neighbourhood,
+            self.pin_instance[instance_pins],
+            combine(net_colours[self.pin_net[instance_pins]], self.pin_keys[instance_pins]),
+        )
+        self.colours = np.where(self.active, combine(self.colours, neighbourhood), NO_COLOUR)
+
+        prev_num_colours = self.num_colours
+        self.num_colours = len(np.unique(self.colours[self.active]))
+        return self.num_colours > prev_num_colours
+
+
+def get_pin_keys(ir):
+    """Stable hash of the (port name, index) of each pin.  Top-level pins are distinguished
+    from instance pins with the same name."""
+    pin_index = as_numpy(ir.pin_index)
+    codes = as_numpy(ir.pin_port).astype(np.int64) * (int(pin_index.max(initial=0)) + 1)
+    codes = (codes + pin_index) * 2 + (as_numpy(ir.pin_instance) == NO_ID)
+    codes, first_pins, pin_codes = np.unique(codes, return_index=True, return_inverse=True)
+    hashes = np.array(
+        [
+            stable_hash(ir.pin_instance[pin] == NO_ID, ir.get_port_name(pin), ir.pin_index[pin])
+            for pin in first_pins.tolist()
+        ],
+        dtype=np.uint64,
+    )
+    return hashes[pin_codes.reshape(-1)]
+
+
+def match_unique_signatures(named_colours, named_instances, reversed_colours, reversed_instances):
+    """Return (named instance, reversed instance) pairs whose colour is unique among the given
+    instances of both netlists"""
+    named_unique = get_unique_colours(named_colours, named_instances)
+    reversed_unique = get_unique_colours(reversed_colours, reversed_instances)
+    return [
+        (instance, reversed_unique[colour])
+        for colour, instance in named_unique.items()
+        if colour in reversed_unique
+    ]
+
+
+def get_unique_colours(colours, instances):
+    """Dict of colour -> instance, for the colours held by a single one of the instances"""
+    unique = {}
+    seen = set()
+    for instance in instances:
+        colour = int(colours[instance])
+        if colour == NO_COLOUR:
+            continue
+        if colour in seen:
+            unique.pop(colour, None)
+        else:
+            seen.add(colour)
+            unique[colour] = instance
+    return unique
@@ -0,0 +1,295 @@
+"""Verification of a complete structural mapping
+
+Once every instance is mapped, the mapping is checked as a whole:
+
+  - Mapped instances have the same cell type and compared properties.
+  - Each pin of a named instance is on the net that maps to the net on the same pin of the
+    reversed instance.  Pins on constant nets must be on a constant net of the same value, and
+    disconnected pins must be disconnected on both sides.  Top-level ports are checked the same
+    way.
+  - The inputs of LUT6_2 cells can be permuted, so they are not compared pin by pin.  Instead,
+    the O5/O6 functions of both LUTs are compared on all 64 input values, each reversed input
+    following the named input on the corresponding net (or its constant value).
+
+The checks are batched with NumPy, over all the mapped instances of a cell type at once.
+"""
+
+import numpy as np
+
+from bfasst.netlist_ir import NO_ID, as_numpy
+
+LUT_CELL_TYPE = "LUT6_2"
+LUT_INPUTS = tuple((f"I{idx}", 0) for idx in range(6))
+LUT_OUTPUTS = (("O5", 0), ("O6", 0))
+
+# Where the value of a LUT input comes from, beyond the 6 inputs of the named LUT
+SOURCE_GND = len(LUT_INPUTS)
+SOURCE_VCC = SOURCE_GND + 1
+SOURCE_UNMAPPED = SOURCE_VCC + 1
+
+# Value of each source, for each of the 64 values of the named LUT inputs
+SOURCE_VALUES = np.concatenate(
+    (
+        (np.arange(64)[:, None] >> np.arange(len(LUT_INPUTS))) & 1,
+        np.zeros((64, 1), dtype=int),
+        np.ones((64, 1), dtype=int),
+        np.zeros((64, 1), dtype=int),
+    ),
+    axis=1,
+).astype(np.uint8)
+
+# Net mapping of a net that isn't mapped, distinct from NO_ID (disconnected pin)
+NOT_MAPPED = -2
+
+# Number of LUT pairs evaluated at once, to bound the size of the (64 x LUTs) tables
+LUT_CHUNK_SIZE = 1 << 14
+
+
+def verify_mapping(named_netlist, reversed_netlist, block_mapping, net_mapping, max_errors=50):
+    """Verify a complete mapping between two (compare) Netlists.  Returns the number of errors
+    found, and the messages of the first max_errors of them."""
+    verifier = MappingVerifier(named_netlist, reversed_netlist, block_mapping, net_mapping)
+    verifier.max_errors = max_errors
+    verifier.verify()
+    return verifier.num_errors, verifier.errors
+
+
+class MappingVerifier:
+    """Checks a block and net mapping, given by IR ids"""
+
+    def __init__(self, named_netlist, reversed_netlist, block_mapping, net_mapping):
+        self.named = named_netlist
+        self.reversed = reversed_netlist
+        self.pairs = np.array(list(block_mapping.items()), dtype=np.intc).reshape(-1, 2)
+
+        self.mapped_net = np.full(named_netlist.ir.num_nets, NOT_MAPPED, dtype=np.intc)
+        self.mapped_net[list(net_mapping.keys())] = list(net_mapping.values())
+        self.inverse_mapped_net = np.full(reversed_netlist.ir.num_nets, NOT_MAPPED, dtype=np.intc)
+        self.inverse_mapped_net[list(net_mapping.values())] = list(net_mapping.keys())
+
+        self.named_constants = named_netlist.get_constant_net_values()
+        self.reversed_constants = reversed_netlist.get_constant_net_values()
+
+        self.max_errors = 50
+        self.num_errors = 0
+        self.errors = []
+
+    def add_error(self, msg):
+        self.num_errors += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(msg)
+
+    def verify(self):
+        """Run all checks"""
+        self.check_top_pins()
+
+        named_ir = self.named.ir
+        cell_types = as_numpy(named_ir.instance_cell_type)[self.pairs[:, 0]]
+        for cell_type in np.unique(cell_types).tolist():
+            pairs = self.pairs[cell_types == cell_type]
+            if not self.check_cell_type(named_ir.cell_types[cell_type], pairs):
+                continue
+            self.check_pins(named_ir.cell_types[cell_type], pairs)
+            if named_ir.cell_types[cell_type] == LUT_CELL_TYPE:
+                for start in range(0, len(pairs), LUT_CHUNK_SIZE):
+                    self.check_luts(pairs[start : start + LUT_CHUNK_SIZE])
+
+    def check_top_pins(self):
+        """Top-level ports are mapped by name"""
+        named_ir = self.named.ir
+        reversed_ir = self.reversed.ir
+        named_pins = np.array(named_ir.get_top_pins(), dtype=np.intc)
+        reversed_pins = np.array(
+            [
+                reversed_ir.top_pins_by_name_and_index.get(
+                    (named_ir.get_port_name(pin), named_ir.pin_index[pin]), NO_ID
+                )
+                for pin in named_pins.tolist()
+            ],
+            dtype=np.intc,
+        )
+        for pin in named_pins[reversed_pins == NO_ID].tolist():
+            self.add_error(f"Top-level port {self.get_pin_name(named_ir, pin)} is missing")
+
+        named_pins = named_pins[reversed_pins != NO_ID]
+        reversed_pins = reversed_pins[reversed_pins != NO_ID]
+        bad = self.get_net_mismatches(
+            as_numpy(named_ir.pin_net)[named_pins], as_numpy(reversed_ir.pin_net)[reversed_pins]
+        )
+        for pin in named_pins[bad].tolist():
+            self.add_error(f"Top-level port {self.get_pin_name(named_ir, pin)} is on the wrong net")
+
+    def check_cell_type(self, cell_type, pairs):
+        """Check the cell type and properties of the pairs.  Returns whether they all match."""
+        reversed_ir = self.reversed.ir
+        ok = True
+        for instance, matched in pairs.tolist():
+            if reversed_ir.get_cell_type(matched) != cell_type:
+                self.add_error(
+                    f"{self.named.get_instance_name(instance)} ({cell_type}) mapped to "
+                    f"{self.reversed.get_instance_name(matched)} "
+                    f"({reversed_ir.get_cell_type(matched)})"
+                )
+                ok = False
+            elif cell_type != LUT_CELL_TYPE and (
+                self.named.property_keys[instance] != self.reversed.property_keys[matched]
+            ):
+                self.add_error(
+                    f"Properties of {self.named.get_instance_name(instance)} and "
+                    f"{self.reversed.get_instance_name(matched)} differ"
+                )
+        return ok
+
+    def check_pins(self, cell_type, pairs):
+        """Check that each pin (except LUT inputs) is on corresponding nets on both sides"""
+        named_ir = self.named.ir
+        reversed_ir = self.reversed.ir
+
+        # Leaf cells only have the ports used in the netlist, so the pins may differ
+        pin_keys = {
+            key: None
+            for ir in (named_ir, reversed_ir)
+            for key in ir.cell_pin_layout[ir.cell_types.get_id(cell_type)]
+            if not (cell_type == LUT_CELL_TYPE and key in LUT_INPUTS)
+        }
+        bad = self.get_net_mismatches(
+            self.get_pin_nets(named_ir, pairs[:, 0], cell_type, pin_keys),
+            self.get_pin_nets(reversed_ir, pairs[:, 1], cell_type, pin_keys),
+        )
+        pin_keys = list(pin_keys)
+        for row, col in np.argwhere(bad).tolist():
+            instance, matched = pairs[row].tolist()
+            self.add_error(
+                f"Pin {pin_keys[col][0]}[{pin_keys[col][1]}] of "
+                f"{self.named.get_instance_name(instance)} is not on the net that maps to the "
+                f"same pin of {self.reversed.get_instance_name(matched)}"
+            )
+
+    def check_luts(self, pairs):
+        """Compare the functions of LUT pairs, allowing for permuted inputs"""
+        named_sources, reversed_sources = self.get_lut_input_sources(pairs)
+        differs = self.get_lut_function_mismatches(pairs, named_sources, reversed_sources)
+        unmapped = (reversed_sources == SOURCE_UNMAPPED).any(axis=1)
+
+        for row in np.flatnonzero(differs | unmapped).tolist():
+            instance, matched = pairs[row].tolist()
+            reason = (
+                "has an input on an unrelated net" if unmapped[row] else "has a different function"
+            )
+            self.add_error(
+                f"{self.reversed.get_instance_name(matched)} {reason} from "
+                f"{self.named.get_instance_name(instance)}"
+            )
+
+    def get_lut_function_mismatches(self, pairs, named_sources, reversed_sources):
+        """Boolean array of the LUT pairs whose (used) outputs differ for some input value"""
+        named_addresses = get_addresses(named_sources)
+        reversed_addresses = get_addresses(reversed_sources)
+        named_inits = self.get_inits(self.named, pairs[:, 0])
+        reversed_inits = self.get_inits(self.reversed, pairs[:, 1])
+
+        # O5 is the function of I0-I4 in the lower half of INIT, O6 the function of I0-I5.
+        # Unused outputs are not compared.
+        named_outputs = self.get_pin_nets(self.named.ir, pairs[:, 0], LUT_CELL_TYPE, LUT_OUTPUTS)
+        differs = np.zeros(len(pairs), dtype=bool)
+        for output, address_mask in enumerate((np.uint8(31), np.uint8(63))):
+            output_differs = lut_outputs(
+                named_inits, named_addresses & address_mask
+            ) != lut_outputs(reversed_inits, reversed_addresses & address_mask)
+            differs |= output_differs.any(axis=0) & (named_outputs[:, output] != NO_ID)
+        return differs
+
+    def get_lut_input_sources(self, pairs):
+        """Source of each input of the named and of the reversed LUTs of the pairs"""
+        named_inputs = self.get_pin_nets(self.named.ir, pairs[:, 0], LUT_CELL_TYPE, LUT_INPUTS)
+        reversed_inputs = self.get_pin_nets(
+            self.reversed.ir, pairs[:, 1], LUT_CELL_TYPE, LUT_INPUTS
+        )
+        connected = reversed_inputs != NO_ID
+
+        named_sources = get_named_input_sources(named_inputs, self.named_constants)
+        reversed_sources = get_reversed_input_sources(
+            named_inputs,
+            named_sources,
+            np.where(connected, self.inverse_mapped_net[reversed_inputs], NO_ID),
+            np.where(connected, self.reversed_constants[reversed_inputs], NO_ID),
+        )
+        return named_sources, reversed_sources
+
+    def get_net_mismatches(self, named_nets, reversed_nets):
+        """Boolean array of the pins whose nets don't correspond"""
+        named_connected = named_nets != NO_ID
+        reversed_connected = reversed_nets != NO_ID
+        named_constants = np.where(named_connected, self.named_constants[named_nets], NO_ID)
+        reversed_constants = np.where(
+            reversed_connected, self.reversed_constants[reversed_nets], NO_ID
+        )
+        expected_nets = np.where(named_connected, self.mapped_net[named_nets], NO_ID)
+        return np.where(
+            named_constants != NO_ID,
+            named_constants != reversed_constants,
+            (expected_nets != reversed_nets) | (reversed_constants != NO_ID),
+        )
+
+    @staticmethod
+    def get_pin_nets(ir, instances, cell_type, pin_keys):
+        """2-D array of the nets on the given (port name, index) pins of instances of a cell
+        type.  Pins that the cell type doesn't have are disconnected (NO_ID)."""
+        layout = ir.cell_pin_layout[ir.cell_types.get_id(cell_type)]
+        offsets = np.array([layout.get(key, NO_ID) for key in pin_keys], dtype=np.intc)
+        pins = as_numpy(ir.instance_pin_offsets)[instances][:, None] + offsets[None, :]
+        return np.where(offsets[None, :] == NO_ID, NO_ID, as_numpy(ir.pin_net)[pins])
+
+    @staticmethod
+    def get_inits(netlist, instances):
+        """INIT of LUT instances, from their property keys"""
+        return np.array(
+            [netlist.property_keys[instance][1][0] for instance in instances.tolist()],
+            dtype=np.uint64,
+        )
+
+    @staticmethod
+    def get_pin_name(ir, pin):
+        return f"{ir.get_port_name(pin)}[{ir.pin_index[pin]}]"
+
+
+def get_named_input_sources(inputs, constants):
+    """Source of each input of the named LUTs: inputs on the same net follow the first of them,
+    inputs on constant nets have a constant value.  Disconnected inputs are taken as 0."""
+    sources = np.broadcast_to(np.arange(len(LUT_INPUTS)), inputs.shape).copy()
+    for idx in range(len(LUT_INPUTS) - 1, 0, -1):
+        for first_idx in range(idx - 1, -1, -1):
+            same_net = inputs[:, idx] == inputs[:, first_idx]
+            sources[same_net, idx] = first_idx
+    input_constants = np.where(inputs == NO_ID, 0, constants[inputs])
+    sources[input_constants == 0] = SOURCE_GND
+    sources[input_constants == 1] = SOURCE_VCC
+    return sources
+
+
+def get_reversed_input_sources(named_inputs, named_sources, mapped_inputs, constants):
+    """Source of each input of the reversed LUTs: the source of the named input on the net it
+    maps to, or a constant.  Inputs on other nets are SOURCE_UNMAPPED.  mapped_inputs are the
+    named nets the reversed inputs map to."""
+    sources = np.full(mapped_inputs.shape, SOURCE_UNMAPPED)
+    for idx in range(len(LUT_INPUTS)):
+        for named_idx in range(len(LUT_INPUTS)):
+            same_net = mapped_inputs[:, idx] == named_inputs[:, named_idx]
+            sources[same_net, idx] = named_sources[same_net, named_idx]
+    input_constants = np.where(mapped_inputs == NO_ID, 0, constants)
+    sources[input_constants == 0] = SOURCE_GND
+    sources[input_constants == 1] = SOURCE_VCC
+    return sources
+
+
+def get_addresses(sources):
+    """INIT bit address of each LUT (columns) for each of the 64 named input values (rows)"""
+    addresses = np.zeros((64, len(sources)), dtype=np.uint8)
+    for idx in range(len(LUT_INPUTS)):
+        addresses |= SOURCE_VALUES[:, sources[:, idx]] << np.uint8(idx)
+    return addresses
+
+
+def lut_outputs(inits, addresses):
+    """Output of each LUT (columns) at the given addresses"""
+    return (inits[None, :] >> addresses.astype(np.uint64)) & np.uint64(1)
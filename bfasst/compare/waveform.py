@@ -1,6 +1,5 @@
 """Waveform equivalence checker. Uses WaFoVe for verification."""
 
-import pathlib
 import re
 
 from wafove import compare_waveforms
@@ -10,8 +9,9 @@ from wafove.tools import analyze_graph
 import bfasst
 from bfasst.compare.base import CompareTool
 from bfasst.config import VIVADO_BIN_PATH
+from bfasst.paths import ROOT_PATH
 from bfasst.status import Status, CompareStatus
-from bfasst.tool import ToolProduct
+from bfasst.tool import ToolProduct, tool_stage
 
 
 class WaveformCompareTool(CompareTool):
@@ -23,6 +23,8 @@ class WaveformCompareTool(CompareTool):
 
     TOOL_WORK_DIR = "waveform"
     LOG_FILE_NAME = "log.txt"
+    CELLS_SIM_PATH = ROOT_PATH / "third_party/yosys/techlibs/xilinx/cells_sim.v"
+    TESTBENCH_TEMPLATE_PATH = ROOT_PATH / "third_party/WaFoVe/wafove/templates/sample_tb.v"
 
     def add_args(self):
         """Parses all input arguments for WaFoVe's bfasst implementation."""
@@ -82,6 +84,7 @@ class WaveformCompareTool(CompareTool):
             default=False,
         )
 
+    @tool_stage
     def compare_netlists(self, design):
         """The function that compares the netlists."""
 
@@ -96,10 +99,12 @@ class WaveformCompareTool(CompareTool):
         generate_comparison = ToolProduct(None, log_path, self.check_compare_status)
         status = self.get_prev_run_status(
             tool_products=(generate_comparison,),
-            dependency_modified_time=max(
-                pathlib.Path(__file__).stat().st_mtime,
-                design.reversed_netlist_path.stat().st_mtime,
-            ),
+            dependencies=[
+                self.CELLS_SIM_PATH,
+                self.TESTBENCH_TEMPLATE_PATH,
+                design.impl_netlist_path,
+                design.reversed_netlist_path,
+            ],
         )
 
         if status is not None:
@@ -111,8 +116,8 @@ class WaveformCompareTool(CompareTool):
         # Gets all paths used for file-generation
         paths = get_paths.get_paths(
             self.work_dir,
-            bfasst.paths.ROOT_PATH / ("third_party/yosys/techlibs/xilinx/cells_sim.v"),
-            bfasst.paths.ROOT_PATH / ("third_party/WaFoVe/wafove/templates/sample_tb.v"),
+            self.CELLS_SIM_PATH,
+            self.TESTBENCH_TEMPLATE_PATH,
             bfasst.paths.ROOT_PATH / ("third_party/WaFoVe/wafove/tools/"),
             design.impl_netlist_path,
             design.reversed_netlist_path,
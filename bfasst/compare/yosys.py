@@ -12,15 +12,18 @@ class Yosys_CompareTool(CompareTool):
     TOOL_WORK_DIR = "yosys"
     LOG_FILE_NAME = "log.txt"
     SCRIPT_FILE_NAME = "compare.ys"
+    CELLS_SIM_PATH = pathlib.Path.cwd() / "third_party/yosys/techlibs/xilinx/cells_sim.v"
     def compare_netlists(self, design):
         log_path = self.work_dir / self.LOG_FILE_NAME
 
         generate_comparison = ToolProduct(None, log_path, self.check_compare_status)
         status = self.get_prev_run_status(
             tool_products=(generate_comparison,),
-            dependency_modified_time=max(
-                pathlib.Path(__file__).stat().st_mtime, design.reversed_netlist_path.stat().st_mtime
-            ),
+            dependencies=[
+                self.CELLS_SIM_PATH,
+                design.impl_netlist_path,
+                design.reversed_netlist_path,
+            ],
         )
 
         if status is not None:
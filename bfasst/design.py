@@ -194,6 +194,11 @@ class Design:
     # def reversed_netlist_filename(self):
     #     return os.path.basename(self.reversed_netlist_path)
 
+    def get_source_files(self):
+        """All files the design is made of (design yaml and HDL sources)"""
+        files = [self.yaml_path, self.top_file_path] + self.get_support_files()
+        return files + list(self.vhdl_libs)
+
     def last_modified_time(self):
         return max(os.path.getmtime(f) for f in (self.yaml_path, self.top_file_path))
 
@@ -0,0 +1,200 @@
+""" Run the stages of a flow as a DAG, running independent stages at the same time
+
+Each stage declares the design attributes it reads (inputs) and sets (products), eg. vivado_impl
+reads netlist_path and produces bitstream_path.  Stages are given in an order that would work
+sequentially; a stage depends on the last earlier stage that produces each of its inputs, and on
+the earlier stages that read or produce anything it produces (so values are not replaced while
+they are in use).  Stages whose dependencies are done run concurrently, in threads of the design
+job (the tools run external processes or the JVM, so they don't hold the GIL).
+
+Every stage reserves an estimate of the CPUs and memory it uses from a ResourceBudget before it
+starts.  run_experiment.py shares one budget between all of its design jobs; otherwise the budget
+of a process is the whole machine.
+"""
+
+import concurrent.futures
+import contextlib
+import os
+import threading
+from dataclasses import dataclass
+from multiprocessing.managers import BaseManager
+from typing import Callable
+
+GB = 1 << 30
+
+
+@dataclass
+class Stage:
+    """A step of a flow.  fcn is called as fcn(design, build_dir, flow_args), like the functions
+    of tool_wrappers, and returns a Status."""
+
+    name: str
+    fcn: Callable
+    inputs: tuple = ()
+    products: tuple = ()
+    cpus: int = 1
+    memory_gb: float = 1.0
+
+
+class ResourceBudget:
+    """CPUs and memory (in GB) shared by the stages that run at the same time.  A reservation
+    larger than the whole budget is reduced to the whole budget, so it runs alone."""
+
+    def __init__(self, cpus=None, memory_gb=None):
+        self.cpus = os.cpu_count() if cpus is None else cpus
+        if memory_gb is None:
+            memory_gb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / GB
+        self.memory_gb = memory_gb
+
+        self.free_cpus = self.cpus
+        self.free_memory_gb = self.memory_gb
+        self.condition = threading.Condition()
+
+    def acquire(self, cpus, memory_gb):
+        """Wait until the resources are free, and reserve them"""
+        cpus, memory_gb = self.clamp(cpus, memory_gb)
+        with self.condition:
+            self.condition.wait_for(
+                lambda: cpus <= self.free_cpus and memory_gb <= self.free_memory_gb
+            )
+            self.free_cpus -= cpus
+            self.free_memory_gb -= memory_gb
+
+    def release(self, cpus, memory_gb):
+        cpus, memory_gb = self.clamp(cpus, memory_gb)
+        with self.condition:
+            self.free_cpus += cpus
+            self.free_memory_gb += memory_gb
+            self.condition.notify_all()
+
+    def get_size(self):
+        """Total (CPUs, memory in GB) of the budget"""
+        return self.cpus, self.memory_gb
+
+    def clamp(self, cpus, memory_gb):
+        return min(cpus, self.cpus), min(memory_gb, self.memory_gb)
+
+
+class ResourceBudgetManager(BaseManager):
+    """Manager process holding a ResourceBudget shared by several processes"""
+
+
+ResourceBudgetManager.register("ResourceBudget", ResourceBudget)
+
+_BUDGET = None
+_BUDGET_LOCK = threading.Lock()
+
+# Called with the name of each stage as it starts, eg. to report progress
+_STAGE_CALLBACK = None
+
+
+def set_resource_budget(budget):
+    """Set the budget of this process, eg. a proxy of a budget shared with other processes.  Can
+    be used as a process pool initializer."""
+    global _BUDGET  # pylint: disable=global-statement
+    _BUDGET = budget
+
+
+def get_resource_budget():
+    """The budget of this process, by default the whole machine"""
+    global _BUDGET  # pylint: disable=global-statement
+    with _BUDGET_LOCK:
+        if _BUDGET is None:
+            _BUDGET = ResourceBudget()
+        return _BUDGET
+
+
+def set_stage_callback(callback):
+    """Set a function called with the name of each stage run by this process, as it starts
+    (None: no callback)"""
+    global _STAGE_CALLBACK  # pylint: disable=global-statement
+    _STAGE_CALLBACK = callback
+
+
+@contextlib.contextmanager
+def shared_resource_budget(cpus=None, memory_gb=None):
+    """Start a ResourceBudget in a manager process, for the duration of a with block, and make
+    it the budget of this process.  get_resource_budget() then returns a proxy that can be
+    passed to other processes (see set_resource_budget)."""
+    with ResourceBudgetManager() as manager:
+        set_resource_budget(manager.ResourceBudget(cpus, memory_gb))  # pylint: disable=no-member
+        try:
+            yield
+        finally:
+            set_resource_budget(None)
+
+
+@contextlib.contextmanager
+def reserve(cpus, memory_gb):
+    """Reserve resources from the budget of this process for the duration of a with block"""
+    budget = get_resource_budget()
+    budget.acquire(cpus, memory_gb)
+    try:
+        yield
+    finally:
+        budget.release(cpus, memory_gb)
+
+
+def get_stage_dependencies(stages):
+    """Return the set of indices of the stages each stage depends on"""
+    dependencies = []
+    producers = {}
+    readers = {}
+    for idx, stage in enumerate(stages):
+        deps = {producers[name] for name in stage.inputs if name in producers}
+        for name in stage.products:
+            deps.update(readers.get(name, ()))
+            if name in producers:
+                deps.add(producers[name])
+        dependencies.append(deps)
+
+        for name in stage.inputs:
+            readers.setdefault(name, []).append(idx)
+        for name in stage.products:
+            producers[name] = idx
+            readers[name] = []
+    return dependencies
+
+
+def run_stage(stage, design, build_dir, flow_args):
+    with reserve(stage.cpus, stage.memory_gb):
+        if _STAGE_CALLBACK is not None:
+            _STAGE_CALLBACK(stage.name)
+        return stage.fcn(design, build_dir, flow_args)
+
+
+def run_stages(stages, design, flow_args, build_dir):
+    """Run the stages of a flow on a design, as soon as their dependencies are done.  Returns
+    the status of the last stage.  If a stage raises an exception, no more stages are started,
+    and the exception is raised once the running stages are done."""
+    dependencies = get_stage_dependencies(stages)
+    statuses = [None] * len(stages)
+    pending = set(range(len(stages)))
+    done = set()
+    running = {}
+    exception = None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(stages)) as pool:
+        while pending or running:
+            if exception is None:
+                for idx in sorted(idx for idx in pending if dependencies[idx] <= done):
+                    pending.remove(idx)
+                    future = pool.submit(run_stage, stages[idx], design, build_dir, flow_args)
+                    running[future] = idx
+            if not running:
+                break
+
+            finished, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in finished:
+                idx = running.pop(future)
+                if future.exception() is not None:
+                    exception = exception or future.exception()
+                else:
+                    statuses[idx] = future.result()
+                    done.add(idx)
+
+    if exception is not None:
+        raise exception
+    return statuses[-1]
@@ -12,6 +12,7 @@ from bfasst.compare.onespin import OneSpin_CompareTool
 
 from bfasst.design import Design
 from bfasst.error_injection.error_injector import ErrorInjector_ErrorInjectionTool
+from bfasst.flow_graph import Stage, run_stages
 from bfasst.impl.ic2 import Ic2ImplementationTool
 from bfasst.netlist_mapping.ccl_mapping import map_netlists as ccl_map
 from bfasst.netlist_mapping.structural_mapping import structurally_map_netlists
@@ -100,6 +101,51 @@ flow_fcn_map = {
 }
 
 
+# Stages of the flows that are run with flow_graph.run_stages.  Resources are rough estimates,
+# used to decide how many stages can run at the same time.
+VIVADO_SYNTH_STAGE = Stage(
+    "vivado_synth",
+    vivado_synth,
+    products=("netlist_path", "constraints_path"),
+    cpus=2,
+    memory_gb=4,
+)
+VIVADO_IMPL_STAGE = Stage(
+    "vivado_impl",
+    vivado_impl,
+    inputs=("netlist_path", "constraints_path"),
+    products=(
+        "xilinx_impl_checkpoint_path",
+        "impl_edif_path",
+        "impl_netlist_path",
+        "bitstream_path",
+    ),
+    cpus=2,
+    memory_gb=6,
+)
+PHYS_NETLIST_STAGE = Stage(
+    "xilinx_phys_netlist",
+    xilinx_phys_netlist,
+    inputs=("xilinx_impl_checkpoint_path", "impl_edif_path"),
+    products=("impl_netlist_path",),
+    memory_gb=6,
+)
+XRAY_REV_STAGE = Stage(
+    "xray_rev",
+    xray_rev,
+    inputs=("bitstream_path", "constraints_path"),
+    products=("reversed_netlist_path",),
+    memory_gb=2,
+)
+STRUCTURAL_CMP_STAGE = Stage(
+    "structural_cmp",
+    structural_cmp,
+    inputs=("impl_netlist_path", "reversed_netlist_path"),
+    memory_gb=2,
+)
+CONFORMAL_CMP_STAGE = Stage("conformal_cmp", conformal_cmp, inputs=("reversed_netlist_path",))
+
+
 def get_flow_fcn_by_name(flow_name):
     """Takes a string representing the flow_name, and returns a function implementing that flow"""
     try:
@@ -158,9 +204,7 @@ def flow_xilinx_ooc(design, flow_args, build_dir):
 
 def flow_xilinx(design, flow_args, build_dir):
     """Run Xilinx synthesis and implementation"""
-    status = vivado_synth(design, build_dir, flow_args)
-    status = vivado_impl(design, build_dir, flow_args)
-    return status
+    return run_stages([VIVADO_SYNTH_STAGE, VIVADO_IMPL_STAGE], design, flow_args, build_dir)
 
 
 def flow_xilinx_and_reversed(design, flow_args, build_dir):
@@ -169,10 +213,8 @@ def flow_xilinx_and_reversed(design, flow_args, build_dir):
     if "--max_dsp" not in flow_args[ToolType.SYNTH]:
         flow_args[ToolType.SYNTH] += " --max_dsp 0"
 
-    status = vivado_synth(design, build_dir, flow_args)
-    status = vivado_impl(design, build_dir, flow_args)
-    status = xray_rev(design, build_dir, flow_args)
-    return status
+    stages = [VIVADO_SYNTH_STAGE, VIVADO_IMPL_STAGE, XRAY_REV_STAGE]
+    return run_stages(stages, design, flow_args, build_dir)
 
 
 def flow_xilinx_phys_netlist(design, flow_args, build_dir):
@@ -181,32 +223,33 @@ def flow_xilinx_phys_netlist(design, flow_args, build_dir):
     if "--flatten" not in flow_args[ToolType.SYNTH]:
         flow_args[ToolType.SYNTH] += " --flatten"
 
-    status = vivado_synth(design, build_dir, flow_args)
-    status = vivado_impl(design, build_dir, flow_args)
-    status = xilinx_phys_netlist(design, build_dir)
-
-    return status
+    stages = [VIVADO_SYNTH_STAGE, VIVADO_IMPL_STAGE, PHYS_NETLIST_STAGE]
+    return run_stages(stages, design, flow_args, build_dir)
 
 
 def flow_xilinx_phys_netlist_cmp(design, flow_args, build_dir):
-    """Compare Xilinx physical netlist to FASM2BELs netlist"""
+    """Compare Xilinx physical netlist to FASM2BELs netlist.  The physical netlist and the
+    fasm2bels reverse both only need implementation, so they run at the same time."""
 
     if "--max_dsp" not in flow_args[ToolType.SYNTH]:
         flow_args[ToolType.SYNTH] += " --max_dsp 0"
+    if "--flatten" not in flow_args[ToolType.SYNTH]:
+        flow_args[ToolType.SYNTH] += " --flatten"
 
-    status = flow_xilinx_phys_netlist(design, flow_args, build_dir)
-    status = xray_rev(design, build_dir, flow_args)
-    status = structural_cmp(design, build_dir, flow_args)
-    return status
+    stages = [
+        VIVADO_SYNTH_STAGE,
+        VIVADO_IMPL_STAGE,
+        PHYS_NETLIST_STAGE,
+        XRAY_REV_STAGE,
+        STRUCTURAL_CMP_STAGE,
+    ]
+    return run_stages(stages, design, flow_args, build_dir)
 
 
 def flow_xilinx_conformal(design, flow_args, build_dir):
     """Run Xilinx synthesis and implementation and compare with conformal"""
-    status = vivado_synth(design, build_dir, flow_args)
-    status = vivado_impl(design, build_dir, flow_args)
-    status = xray_rev(design, build_dir, flow_args)
-    status = conformal_cmp(design, build_dir, flow_args)
-    return status
+    stages = [VIVADO_SYNTH_STAGE, VIVADO_IMPL_STAGE, XRAY_REV_STAGE, CONFORMAL_CMP_STAGE]
+    return run_stages(stages, design, flow_args, build_dir)
 
 
 def flow_xilinx_conformal_impl(design, flow_args, build_dir):
@@ -239,30 +282,28 @@ def flow_xilinx_conformal_impl(design, flow_args, build_dir):
 
 def flow_xilinx_yosys_impl(design, flow_args, build_dir):
     """Vivado synthesis and implementation, reverse with xray, compare with yosys"""
-    status = vivado_synth(design, build_dir, flow_args)
-    status = vivado_impl(design, build_dir, flow_args)
-
-    # Run X-ray and fasm2bel
-    status = xray_rev(design, build_dir, flow_args)
-
-    status = yosys_cmp(design, build_dir, flow_args)
-    return status
+    stages = [
+        VIVADO_SYNTH_STAGE,
+        VIVADO_IMPL_STAGE,
+        XRAY_REV_STAGE,
+        Stage("yosys_cmp", yosys_cmp, inputs=("reversed_netlist_path",)),
+    ]
+    return run_stages(stages, design, flow_args, build_dir)
 
 
 def flow_wafove(design, flow_args, build_dir):
     """Vivado synthesis and implementation, reverse with xray, compare with WaFoVe"""
-    status = vivado_synth(design, build_dir, flow_args)
-    status = vivado_impl(design, build_dir, flow_args)
-
-    # Run X-ray and fasm2bel
-    status = xray_rev(design, build_dir, flow_args)
 
     # Input number of tests to run, seed to base random on, whether or not to show all signals
     # Whether or not to open gtkwave and analyze graphs, and whether or not to open Vivado and
     # analyze graphs.
-    status = wave_cmp(design, build_dir, flow_args)
-
-    return status
+    stages = [
+        VIVADO_SYNTH_STAGE,
+        VIVADO_IMPL_STAGE,
+        XRAY_REV_STAGE,
+        Stage("wave_cmp", wave_cmp, inputs=("reversed_netlist_path",)),
+    ]
+    return run_stages(stages, design, flow_args, build_dir)
 
 
 def flow_ic2_synplify_conformal(design, flow_args, build_dir):
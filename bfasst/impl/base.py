@@ -1,6 +1,5 @@
 """ Base class for implementation tools """
 import abc
-import pathlib
 
 from bfasst.status import ImplStatus, Status
 from bfasst.utils import print_color
@@ -36,14 +35,22 @@ class ImplementationTool(Tool):
     def print_skipping_impl(self):
         print_color(self.TERM_COLOR_STAGE, "Implementation already run")
 
+    def get_tool_products(self, design, log_check_fcn):
+        """Files produced by implementation.  Tools that also write files used by later steps
+        should add them, so they are restored from the artifact cache along with the
+        bitstream."""
+        return [ToolProduct(design.bitstream_path, self.log_path, log_check_fcn)]
+
+    def get_dependencies(self, design):
+        """Input files of implementation"""
+        return [design.netlist_path]
+
     def common_startup(self, design, log_check_fcn):
         """Commmon startup code for Implementation tools that first checks if
         prevous run can be used, and if not starts a new run"""
         status = self.get_prev_run_status(
-            tool_products=[ToolProduct(design.bitstream_path, self.log_path, log_check_fcn)],
-            dependency_modified_time=max(
-                pathlib.Path(__file__).stat().st_mtime, design.netlist_path.stat().st_mtime
-            ),
+            tool_products=self.get_tool_products(design, log_check_fcn),
+            dependencies=self.get_dependencies(design),
         )
 
         if status is not None:
@@ -9,6 +9,7 @@ import bfasst
 from bfasst import paths
 from bfasst.impl.base import ImplementationTool
 from bfasst.status import Status, ImplStatus
+from bfasst.tool import tool_stage
 
 
 class Ic2ImplementationTool(ImplementationTool):
@@ -16,6 +17,7 @@ class Ic2ImplementationTool(ImplementationTool):
 
     TOOL_WORK_DIR = "ic2_impl"
 
+    @tool_stage
     def implement_bitstream(self, design):
         design.bitstream_path = self.cwd / (design.top + ".bit")
 
@@ -68,6 +70,8 @@ class Ic2ImplementationTool(ImplementationTool):
         cmd = ["tclsh", tcl_path, design.top, ".", netlist_no_ext]
         env = os.environ.copy()
         env["SBT_DIR"] = bfasst.config.IC2_INSTALL_DIR / "sbt_backend"
+        # The command output is appended to this tool's log
+        self.log_fp.flush()
         with open(self.log_path, "a") as fp:
             proc = subprocess.run(
                 cmd, stdout=fp, stderr=subprocess.STDOUT, cwd=self.work_dir, env=env
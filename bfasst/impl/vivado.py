@@ -7,7 +7,8 @@ import time
 import bfasst
 from bfasst.impl.base import ImplementationTool
 from bfasst.status import Status, ImplStatus
-from bfasst.config import VIVADO_COMMAND
+from bfasst.tool import ToolProduct, tool_stage
+from bfasst import vivado_server
 
 
 class VivadoImplementationTool(ImplementationTool):
@@ -26,6 +27,28 @@ class VivadoImplementationTool(ImplementationTool):
         design.utilization_path = self.work_dir / "utilization.txt"
         design.bitstream_path = self.cwd / (design.top + ".bit")
 
+    def get_tool_version(self):
+        return vivado_server.get_vivado_version()
+
+    def get_dependencies(self, design):
+        if self.args.out_of_context:
+            return [design.netlist_path]
+        return [design.netlist_path, design.constraints_path]
+
+    def get_tool_products(self, design, log_check_fcn):
+        # The checkpoint and netlists are used by later steps (eg. xilinx_phys_netlist)
+        main_product = design.xilinx_impl_checkpoint_path
+        if not self.args.out_of_context:
+            main_product = design.bitstream_path
+        return [
+            ToolProduct(main_product, self.log_path, log_check_fcn),
+            ToolProduct(design.xilinx_impl_checkpoint_path),
+            ToolProduct(design.impl_edif_path),
+            ToolProduct(design.impl_netlist_path),
+            ToolProduct(design.utilization_path),
+        ]
+
+    @tool_stage
     def implement_bitstream(self, design):
         """Run vivado executable to perform implementation"""
         self.init_design(design)
@@ -39,6 +62,7 @@ class VivadoImplementationTool(ImplementationTool):
 
         # Check implementation log
         status = self.check_impl_status(self.log_path)
+        self.cache_products(status)
 
         # Update a file in the main directory with info about impl results
         # self.write_to_results_file(design, log_path, need_to_run)
@@ -82,8 +106,7 @@ class VivadoImplementationTool(ImplementationTool):
             self.write_outputs(design, fp)
             self.write_footer(fp)
 
-        cmd = VIVADO_COMMAND + ["-source", str(tcl_path)]
-        proc = self.exec_and_log(cmd)
+        proc = vivado_server.exec_tcl(self, tcl_path)
         if proc.returncode:
             return Status(ImplStatus.ERROR)
 
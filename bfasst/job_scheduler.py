@@ -0,0 +1,175 @@
+""" Order and admit the design jobs of an experiment (see scripts/run_experiment.py)
+
+Jobs are started longest-first, so the largest designs don't end up running alone at the end of
+the experiment.  The runtime of a job is predicted from its runtime in previous runs of the
+experiment, which are kept in <work dir>/job_history.json.  Designs that never ran are predicted
+from the size of their source files, scaled by the runtime per byte of the designs that did.
+
+The history also has the peak memory of each type of tool (eg. vivado_impl) of each job.  A job
+only starts if, for each tool type it uses, its memory plus that of the running jobs fits the
+memory budget of the tool type.  Jobs that don't fit are passed over for smaller ones that do.
+A job always starts if nothing else is running.
+"""
+
+import collections
+import heapq
+import json
+import os
+import statistics
+import time
+from dataclasses import dataclass
+
+HISTORY_FILE_NAME = "job_history.json"
+
+# Predicted runtime of a design until some design of the experiment has run
+DEFAULT_SECONDS_PER_KB = 1.0
+
+KB_PER_GB = 1 << 20
+
+
+@dataclass
+class JobEstimate:
+    """Predicted runtime (seconds) and peak memory of each tool type (GB) of a job"""
+
+    runtime: float
+    memory_gb: dict
+    from_history: bool
+
+
+def get_source_size(design):
+    """Size (bytes) of the source files of a design, used to predict the designs that never ran"""
+    size = 0
+    for path in design.get_source_files():
+        try:
+            size += os.path.getsize(path)
+        except OSError:
+            continue
+    return size
+
+
+class JobHistory:
+    """Runtime and peak memory of each tool type of the jobs of previous runs of an experiment"""
+
+    def __init__(self, work_dir):
+        self.path = work_dir / HISTORY_FILE_NAME
+        try:
+            with open(self.path) as fp:
+                self.jobs = json.load(fp)
+        except (OSError, ValueError):
+            self.jobs = {}
+
+    def save(self):
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as fp:
+            json.dump(self.jobs, fp, indent=2, sort_keys=True)
+        tmp_path.replace(self.path)
+
+    def record(self, design, runtime, peak_rss_kb):
+        """Record a finished job, with the peak RSS (KB) of each tool type it ran.  The tool
+        types it didn't run (eg. reused from a previous run) keep their previous memory."""
+        previous = self.jobs.get(str(design.rel_path))
+        memory_gb = dict(previous["memory_gb"]) if previous else {}
+        memory_gb.update({tool: kb / KB_PER_GB for tool, kb in peak_rss_kb.items()})
+        self.jobs[str(design.rel_path)] = {
+            "runtime": runtime,
+            "memory_gb": memory_gb,
+            "source_size": get_source_size(design),
+        }
+
+    def estimate(self, design):
+        """Predicted runtime and memory of the job of a design"""
+        job = self.jobs.get(str(design.rel_path))
+        if job is not None:
+            return JobEstimate(job["runtime"], job["memory_gb"], True)
+
+        rates = [
+            job["runtime"] / job["source_size"] for job in self.jobs.values() if job["source_size"]
+        ]
+        seconds_per_byte = statistics.median(rates) if rates else DEFAULT_SECONDS_PER_KB / 1024
+
+        # Memory of an average job, per tool type
+        memory_gb = collections.defaultdict(list)
+        for job in self.jobs.values():
+            for tool, gb in job["memory_gb"].items():
+                memory_gb[tool].append(gb)
+        memory_gb = {tool: statistics.median(values) for tool, values in memory_gb.items()}
+
+        return JobEstimate(get_source_size(design) * seconds_per_byte, memory_gb, False)
+
+
+def predict_makespan(runtimes, max_jobs):
+    """Time to run jobs of the given runtimes, in order, max_jobs at a time"""
+    slots = [0.0] * max_jobs
+    for runtime in runtimes:
+        heapq.heappush(slots, heapq.heappop(slots) + runtime)
+    return max(slots)
+
+
+class JobScheduler:
+    """Decides which design jobs of an experiment to start, and when: longest-first, at most
+    max_jobs at a time, and within the memory budget (GB) of each tool type.  Tool types without
+    a budget in memory_budgets get default_memory_budget (None: unlimited)."""
+
+    def __init__(self, designs, history, max_jobs, memory_budgets=None, default_memory_budget=None):
+        self.history = history
+        self.max_jobs = max_jobs
+        self.memory_budgets = memory_budgets or {}
+        self.default_memory_budget = default_memory_budget
+
+        self.estimates = {design.rel_path: history.estimate(design) for design in designs}
+        self.pending = sorted(
+            designs, key=lambda design: self.estimates[design.rel_path].runtime, reverse=True
+        )
+        self.predicted_makespan = predict_makespan(
+            [self.estimates[design.rel_path].runtime for design in self.pending], max_jobs
+        )
+
+        self.running = {}
+        self.memory_in_use = collections.Counter()
+        self.start_time = time.monotonic()
+
+    def fits(self, estimate):
+        if not self.running:
+            return True
+        for tool, memory_gb in estimate.memory_gb.items():
+            budget = self.memory_budgets.get(tool, self.default_memory_budget)
+            if budget is not None and self.memory_in_use[tool] + memory_gb > budget:
+                return False
+        return True
+
+    def start_ready_jobs(self):
+        """Return the pending jobs that can start now, and mark them as running"""
+        started = []
+        for design in list(self.pending):
+            if len(self.running) >= self.max_jobs:
+                break
+            estimate = self.estimates[design.rel_path]
+            if not self.fits(estimate):
+                continue
+            self.pending.remove(design)
+            self.running[design.rel_path] = time.monotonic()
+            self.memory_in_use.update(estimate.memory_gb)
+            started.append(design)
+        return started
+
+    def finish(self, design, peak_rss_kb=None):
+        """Mark a job as done, and return its runtime.  Jobs given the peak RSS (KB) of each of
+        their tool types are recorded in the history.  Jobs that raised an exception, or that ran
+        no tool (all their stages were reused or restored), are not, so they don't replace the
+        estimate of a real run."""
+        start_time = self.running.pop(design.rel_path)
+        self.memory_in_use.subtract(self.estimates[design.rel_path].memory_gb)
+        runtime = time.monotonic() - start_time
+        if peak_rss_kb is not None:
+            self.history.record(design, runtime, peak_rss_kb)
+            self.history.save()
+        return runtime
+
+    def get_report(self):
+        """Predicted versus actual completion time of the experiment"""
+        num_known = sum(estimate.from_history for estimate in self.estimates.values())
+        return (
+            f"Predicted completion in {self.predicted_makespan:.1f} seconds "
+            f"({num_known} of {len(self.estimates)} designs from previous runs), "
+            f"took {time.monotonic() - self.start_time:.1f} seconds"
+        )
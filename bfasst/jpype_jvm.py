@@ -6,6 +6,9 @@ from bfasst.paths import THIRD_PARTY_PATH
 
 _STARTED = False
 
+# RapidWright devices loaded by this process, by part name
+_DEVICES = {}
+
 
 def start():
     """Start the JVM"""
@@ -22,3 +25,19 @@ def start():
     )
 
     _STARTED = True
+
+
+def get_device(part=None):
+    """Return the RapidWright Device of a part (default: config.PART), starting the JVM if
+    needed.  Each device is loaded once per process; RapidWright then reuses it when it reads
+    checkpoints of that part, so long-lived processes only pay the load once."""
+    # pylint: disable=import-outside-toplevel
+    from bfasst import config
+
+    start()
+    from com.xilinx.rapidwright.device import Device
+
+    part = config.PART if part is None else part
+    if part not in _DEVICES:
+        _DEVICES[part] = Device.getDevice(part)
+    return _DEVICES[part]
@@ -0,0 +1,275 @@
+"""On-disk cache of parsed netlists, so repeated compare/mapping runs skip sdn.parse
+
+The cache stores a compact, bfasst-owned record of the netlist (plain lists, tuples and dicts,
+no SpyDrNet objects), keyed on a hash of the netlist file contents.  The record is laid out as:
+
+    {
+        "version": NETLIST_CACHE_VERSION,
+        "data": netlist data dict,
+        "libraries": [(library data, [definition index, ...]), ...],
+        "definitions": [
+            (
+                definition data,
+                [(port data, direction name, pin count, is_downto, is_scalar, lower_index), ...],
+                [(cable data, wire count, is_downto, is_scalar, lower_index), ...],
+                [(instance data, definition index), ...],
+                [(cable index, wire index, instance index or -1, port index, pin index), ...],
+            ),
+            ...
+        ],
+        "top": (top instance data, definition index) or None,
+    }
+
+Connections with an instance index of -1 are to the definition's own ports (InnerPins).
+"""
+
+import hashlib
+import os
+import pathlib
+import pickle
+
+import spydrnet as sdn
+
+# Bump this whenever the record layout changes, to invalidate old cache files
+NETLIST_CACHE_VERSION = 1
+
+CACHE_DIR_NAME = "netlist_cache"
+
+
+def parse_netlist(netlist_path, cache_dir=None):
+    """Return the SpyDrNet netlist for netlist_path.  If the file contents are unchanged since
+    the last call, the netlist is rebuilt from the cache instead of being parsed."""
+    netlist_path = pathlib.Path(netlist_path)
+    cache_path = get_cache_path(netlist_path, cache_dir)
+    record = read_cache(cache_path)
+    if record is not None:
+        return record_to_netlist(record)
+
+    netlist = sdn.parse(str(netlist_path))
+    remove_stale_cache_files(netlist_path, cache_path)
+    write_cache(cache_path, netlist_to_record(netlist))
+    return netlist
+
+
+def load_netlist_record(netlist_path, cache_dir=None):
+    """Return the cache record for netlist_path, without building a SpyDrNet netlist when the
+    cache is warm.  See bfasst.netlist_ir for a representation built directly on the record."""
+    netlist_path = pathlib.Path(netlist_path)
+    cache_path = get_cache_path(netlist_path, cache_dir)
+    record = read_cache(cache_path)
+    if record is None:
+        record = netlist_to_record(sdn.parse(str(netlist_path)))
+        remove_stale_cache_files(netlist_path, cache_path)
+        write_cache(cache_path, record)
+    return record
+
+
+def get_cache_path(netlist_path, cache_dir=None):
+    """Cache file path for a netlist.  By default the cache lives in a directory next to the
+    netlist (ie. in the build directory of the tool that produced it)."""
+    if cache_dir is None:
+        cache_dir = netlist_path.parent / CACHE_DIR_NAME
+
+    digest = hashlib.sha256()
+    with open(netlist_path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b""):
+            digest.update(chunk)
+
+    return cache_dir / (
+        f"{netlist_path.name}.{digest.hexdigest()[:16]}.v{NETLIST_CACHE_VERSION}.pickle"
+    )
+
+
+def read_cache(cache_path):
+    """Load a netlist record, or return None if it is missing, unreadable or out of date"""
+    if not cache_path.is_file():
+        return None
+    try:
+        with open(cache_path, "rb") as fp:
+            record = pickle.load(fp)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    if not isinstance(record, dict) or record.get("version") != NETLIST_CACHE_VERSION:
+        return None
+    return record
+
+
+def write_cache(cache_path, record):
+    """Save a netlist record.  The file is written under a temporary name first, as several jobs
+    may share a cache directory."""
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as fp:
+        pickle.dump(record, fp, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+
+def remove_stale_cache_files(netlist_path, cache_path):
+    """Remove cache files left behind by earlier contents of the same netlist"""
+    for stale_path in cache_path.parent.glob(f"{netlist_path.name}.*.pickle"):
+        if stale_path != cache_path:
+            stale_path.unlink(missing_ok=True)
+
+
+def netlist_to_record(netlist):
+    """Convert a SpyDrNet netlist to a cache record"""
+
+    definitions = [
+        definition for library in netlist.libraries for definition in library.definitions
+    ]
+    definition_indices = {definition: idx for idx, definition in enumerate(definitions)}
+
+    # InnerPin -> (port index, pin index) within its definition
+    pin_indices = {}
+    for definition in definitions:
+        for port_idx, port in enumerate(definition.ports):
+            for pin_idx, pin in enumerate(port.pins):
+                pin_indices[pin] = (port_idx, pin_idx)
+
+    top = netlist.top_instance
+    return {
+        "version": NETLIST_CACHE_VERSION,
+        "data": dict(netlist.data),
+        "libraries": [
+            (dict(library.data), [definition_indices[d] for d in library.definitions])
+            for library in netlist.libraries
+        ],
+        "definitions": [
+            definition_to_record(definition, definition_indices, pin_indices)
+            for definition in definitions
+        ],
+        "top": (dict(top.data), definition_indices[top.reference]) if top else None,
+    }
+
+
+def definition_to_record(definition, definition_indices, pin_indices):
+    """Convert one SpyDrNet definition (ports, cables, children and connections) to a record"""
+
+    children = list(definition.children)
+    child_indices = {child: idx for idx, child in enumerate(children)}
+
+    connections = []
+    for cable_idx, cable in enumerate(definition.cables):
+        for wire_idx, wire in enumerate(cable.wires):
+            for pin in wire.pins:
+                if isinstance(pin, sdn.OuterPin):
+                    port_idx, pin_idx = pin_indices[pin.inner_pin]
+                    connections.append(
+                        (cable_idx, wire_idx, child_indices[pin.instance], port_idx, pin_idx)
+                    )
+                else:
+                    connections.append((cable_idx, wire_idx, -1) + pin_indices[pin])
+
+    return (
+        dict(definition.data),
+        [
+            (
+                dict(port.data),
+                port.direction.name,
+                len(port.pins),
+                port.is_downto,
+                port.is_scalar,
+                port.lower_index,
+            )
+            for port in definition.ports
+        ],
+        [
+            (
+                dict(cable.data),
+                len(cable.wires),
+                cable.is_downto,
+                cable.is_scalar,
+                cable.lower_index,
+            )
+            for cable in definition.cables
+        ],
+        [(dict(child.data), definition_indices[child.reference]) for child in children],
+        connections,
+    )
+
+
+def record_to_netlist(record):
+    """Rebuild a SpyDrNet netlist from a cache record"""
+
+    netlist = sdn.Netlist()
+    set_data(netlist, record["data"])
+
+    # Create all definitions (and their ports/cables) before any children reference them
+    definitions = [None] * len(record["definitions"])
+    for library_data, definition_indices in record["libraries"]:
+        library = netlist.create_library()
+        set_data(library, library_data)
+        for definition_idx in definition_indices:
+            definition = library.create_definition()
+            definition_record = record["definitions"][definition_idx]
+            create_ports_and_cables(definition, definition_record)
+            definitions[definition_idx] = definition
+
+    for definition, definition_record in zip(definitions, record["definitions"]):
+        create_children_and_connections(definition, definition_record, definitions)
+
+    if record["top"] is not None:
+        # Not set_top_instance(definition), which would also rename the definition
+        top_data, top_definition_idx = record["top"]
+        top = sdn.Instance()
+        top.reference = definitions[top_definition_idx]
+        set_data(top, top_data)
+        netlist.top_instance = top
+
+    return netlist
+
+
+def create_ports_and_cables(definition, definition_record):
+    """Populate the data, ports and cables of a new definition from its record"""
+    definition_data, port_records, cable_records, _, _ = definition_record
+    set_data(definition, definition_data)
+
+    for port_data, direction, pin_count, is_downto, is_scalar, lower_index in port_records:
+        port = definition.create_port(
+            direction=sdn.Port.Direction[direction],
+            is_downto=is_downto,
+            is_scalar=is_scalar,
+            lower_index=lower_index,
+        )
+        set_data(port, port_data)
+        port.create_pins(pin_count)
+
+    for cable_data, wire_count, is_downto, is_scalar, lower_index in cable_records:
+        cable = definition.create_cable(
+            is_downto=is_downto, is_scalar=is_scalar, lower_index=lower_index
+        )
+        set_data(cable, cable_data)
+        cable.create_wires(wire_count)
+
+
+def create_children_and_connections(definition, definition_record, definitions):
+    """Populate the child instances of a definition, and connect all wires"""
+    _, _, _, child_records, connection_records = definition_record
+
+    children = []
+    for child_data, reference_idx in child_records:
+        child = definition.create_child(reference=definitions[reference_idx])
+        set_data(child, child_data)
+        children.append(child)
+
+    connect_wires(definition, children, connection_records)
+
+
+def connect_wires(definition, children, connection_records):
+    """Connect the wires of a definition to its own ports and the pins of its children"""
+    ports = list(definition.ports)
+    cables = list(definition.cables)
+    for cable_idx, wire_idx, instance_idx, port_idx, pin_idx in connection_records:
+        wire = cables[cable_idx].wires[wire_idx]
+        if instance_idx == -1:
+            wire.connect_pin(ports[port_idx].pins[pin_idx])
+        else:
+            child = children[instance_idx]
+            inner_pin = child.reference.ports[port_idx].pins[pin_idx]
+            wire.connect_pin(child.pins[inner_pin])
+
+
+def set_data(element, data):
+    """Copy a data dictionary (name, properties, metadata) onto a SpyDrNet element"""
+    for key, value in data.items():
+        element[key] = value
@@ -0,0 +1,326 @@
+"""Compact, integer-ID netlist representation shared by the compare and mapping algorithms
+
+The IR is built directly from a netlist cache record (see bfasst.netlist_cache), so no SpyDrNet
+objects are created when the cache is warm.  Instances, pins, wires and nets are identified by
+their position in a set of columns:
+
+    instances:  instance_cell_type, instance_names, instance_properties
+    pins:       pin_instance (NO_ID for top-level ports), pin_port, pin_index, pin_wire, pin_net,
+                pin_direction
+    wires:      wire_cable, wire_index, wire_net, wire_num_pins
+    nets:       net_wire (the root wire of the net)
+
+Integer columns are array.array objects, which are compact and fast to index from Python.
+Use as_numpy() for a zero-copy NumPy view when vectorizing a pass over the whole netlist.
+
+Cell types, port names and cable names are interned in StringTables.
+
+Adjacency is stored CSR-style:
+  - The pins of instance i are pins instance_pin_offsets[i] to instance_pin_offsets[i + 1].
+    Top-level port pins come first, before the pins of instance 0.
+  - The pins of net n are net_pins[net_pin_offsets[n]:net_pin_offsets[n + 1]].
+
+Wires driven by assign statements (SDN_VERILOG_ASSIGNMENT instances) are aliases, and belong to
+the same net as the wire at the root of their assign chain.
+"""
+
+from array import array
+
+import numpy as np
+
+from bfasst.netlist_cache import load_netlist_record
+
+NO_ID = -1
+
+ASSIGNMENT_CELL_PREFIX = "SDN_VERILOG_ASSIGNMENT"
+
+# Port directions, using the names of spydrnet.Port.Direction
+DIRECTIONS = ("UNDEFINED", "INOUT", "IN", "OUT")
+DIRECTION_UNDEFINED, DIRECTION_INOUT, DIRECTION_IN, DIRECTION_OUT = range(len(DIRECTIONS))
+
+
+def load_netlist_ir(netlist_path, cache_dir=None):
+    """Build the IR of a netlist file, going through the netlist cache"""
+    return NetlistIR(load_netlist_record(netlist_path, cache_dir))
+
+
+def as_numpy(column):
+    """Zero-copy NumPy view of an integer column"""
+    return np.frombuffer(column, dtype=np.intc)
+
+
+def to_column(values):
+    """Convert a NumPy array (or any iterable of ints) to an integer column"""
+    if isinstance(values, np.ndarray):
+        column = array("i")
+        column.frombytes(values.astype(np.intc).tobytes())
+        return column
+    return array("i", values)
+
+
+class StringTable:
+    """Interned strings, each identified by its position in the table"""
+
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+
+    def intern(self, string):
+        string_id = self.ids.get(string)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.ids[string] = string_id
+            self.strings.append(string)
+        return string_id
+
+    def get_id(self, string):
+        return self.ids.get(string, NO_ID)
+
+    def __getitem__(self, string_id):
+        return self.strings[string_id]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class NetlistIR:
+    """Integer-ID representation of the instances and connectivity of the definitions in one
+    library of a netlist (by default the first library, which holds the top-level design)"""
+
+    def __init__(self, record, library_idx=0):
+        self.cell_types = StringTable()
+        self.port_names = StringTable()
+        self.cable_names = StringTable()
+
+        # Instances
+        self.instance_names = []
+        self.instance_cell_type = array("i")
+        self.instance_properties = []
+        self.instance_pin_offsets = array("i")
+
+        # Pins
+        self.pin_instance = array("i")
+        self.pin_port = array("i")
+        self.pin_index = array("i")
+        self.pin_direction = array("b")
+        self.pin_wire = None
+        self.pin_net = None
+
+        # Wires
+        self.wire_cable = array("i")
+        self.wire_index = array("i")
+        self.wire_net = None
+        self.wire_num_pins = None
+
+        # Nets
+        self.net_wire = None
+        self.net_pins = None
+        self.net_pin_offsets = None
+        self.num_unresolved_aliases = 0
+
+        # Offset of each pin of a cell type, within the pins of an instance of that cell type
+        self.cell_pin_layout = {}
+        self.top_pins_by_name_and_index = {}
+
+        definitions = [record["definitions"][idx] for idx in record["libraries"][library_idx][1]]
+        self.build_pins_and_wires(definitions, record["definitions"])
+        self.build_nets()
+        self.build_adjacency()
+
+    @property
+    def num_instances(self):
+        return len(self.instance_cell_type)
+
+    @property
+    def num_pins(self):
+        return len(self.pin_instance)
+
+    @property
+    def num_wires(self):
+        return len(self.wire_cable)
+
+    @property
+    def num_nets(self):
+        return len(self.net_wire)
+
+    def build_pins_and_wires(self, definitions, all_definitions):
+        """Create the top-level pins, then the instances and their pins, then the wires, and
+        finally connect pins to wires"""
+
+        # Top-level pins first, so the pins of each instance are contiguous
+        top_pin_offsets = []
+        for _, port_records, _, _, _ in definitions:
+            top_pin_offsets.append(self._add_pins(NO_ID, port_records))
+        for pin in range(self.num_pins):
+            key = (self.get_port_name(pin), self.pin_index[pin])
+            assert key not in self.top_pins_by_name_and_index
+            self.top_pins_by_name_and_index[key] = pin
+
+        child_pin_offsets = []
+        for _, _, _, child_records, _ in definitions:
+            child_pin_offsets.append(self._add_instances(child_records, all_definitions))
+        self.instance_pin_offsets.append(self.num_pins)
+
+        self.pin_wire = array("i", [NO_ID]) * self.num_pins
+        for definition, top_offsets, child_offsets in zip(
+            definitions, top_pin_offsets, child_pin_offsets
+        ):
+            self._add_wires(definition, top_offsets, child_offsets)
+
+    def _add_wires(self, definition, top_offsets, child_offsets):
+        """Add the wires of a definition, and connect them to the pins created earlier"""
+        _, _, cable_records, _, connection_records = definition
+        cable_offsets = []
+        for cable_data, wire_count, _, _, _ in cable_records:
+            cable_offsets.append(self.num_wires)
+            self.wire_cable.extend([self.cable_names.intern(cable_data.get(".NAME"))] * wire_count)
+            self.wire_index.extend(range(wire_count))
+
+        for cable_idx, wire_idx, instance_idx, port_idx, pin_idx in connection_records:
+            if instance_idx == NO_ID:
+                pin = top_offsets[port_idx] + pin_idx
+            else:
+                pin = child_offsets[instance_idx][port_idx] + pin_idx
+            self.pin_wire[pin] = cable_offsets[cable_idx] + wire_idx
+
+    def _add_instances(self, child_records, all_definitions):
+        """Add the child instances of a definition, and their pins.  Returns, for each child,
+        the id of the first pin of each of its ports."""
+        child_offsets = []
+        for child_data, reference_idx in child_records:
+            reference_data, port_records, _, _, _ = all_definitions[reference_idx]
+            cell_type = self.cell_types.intern(reference_data.get(".NAME"))
+
+            instance = self.num_instances
+            self.instance_names.append(child_data.get(".NAME"))
+            self.instance_cell_type.append(cell_type)
+            self.instance_properties.append(child_data.get("VERILOG.Parameters"))
+            self.instance_pin_offsets.append(self.num_pins)
+
+            child_offsets.append(self._add_pins(instance, port_records))
+
+            if cell_type not in self.cell_pin_layout:
+                first_pin = self.instance_pin_offsets[instance]
+                self.cell_pin_layout[cell_type] = {
+                    (self.get_port_name(pin), self.pin_index[pin]): pin - first_pin
+                    for pin in range(first_pin, self.num_pins)
+                }
+        return child_offsets
+
+    def _add_pins(self, instance, port_records):
+        """Add the pins of every port, returning the id of the first pin of each port"""
+        port_offsets = []
+        for port_data, direction, pin_count, _, _, _ in port_records:
+            port_offsets.append(self.num_pins)
+            self.pin_instance.extend([instance] * pin_count)
+            self.pin_port.extend([self.port_names.intern(port_data.get(".NAME"))] * pin_count)
+            self.pin_index.extend(range(pin_count))
+            self.pin_direction.extend([DIRECTIONS.index(direction)] * pin_count)
+        return port_offsets
+
+    def build_nets(self):
+        """Group wires into nets.  Each wire that is not driven by an assign statement starts a
+        net, and alias wires join the net of the wire at the root of their assign chain."""
+
+        alias_drivers = self._get_alias_drivers()
+
+        self.wire_net = array("i", [NO_ID]) * self.num_wires
+        self.net_wire = array("i")
+        for wire in range(self.num_wires):
+            if wire not in alias_drivers:
+                self.wire_net[wire] = len(self.net_wire)
+                self.net_wire.append(wire)
+
+        for wire in alias_drivers:
+            root_wire = self._resolve_alias(wire, alias_drivers)
+            if root_wire == NO_ID:
+                self.num_unresolved_aliases += 1
+                continue
+            self.wire_net[wire] = self.wire_net[root_wire]
+
+        pin_wire = as_numpy(self.pin_wire)
+        self.pin_net = to_column(
+            np.where(pin_wire == NO_ID, NO_ID, as_numpy(self.wire_net)[pin_wire])
+        )
+
+    def _get_alias_drivers(self):
+        """Return a dict mapping each alias wire (driven by an assign statement) to the wire
+        driving the assign statement.  This forms a forest of assign chains."""
+        alias_drivers = {}
+        in_port = self.port_names.get_id("i")
+        out_port = self.port_names.get_id("o")
+        for instance in range(self.num_instances):
+            if not self.get_cell_type(instance).startswith(ASSIGNMENT_CELL_PREFIX):
+                continue
+            # Pins of a port are stored in index order
+            pins = self.get_instance_pins(instance)
+            in_pins = [pin for pin in pins if self.pin_port[pin] == in_port]
+            out_pins = [pin for pin in pins if self.pin_port[pin] == out_port]
+            for in_pin, out_pin in zip(in_pins, out_pins):
+                if self.pin_wire[out_pin] != NO_ID:
+                    alias_drivers[self.pin_wire[out_pin]] = self.pin_wire[in_pin]
+        return alias_drivers
+
+    @staticmethod
+    def _resolve_alias(wire, alias_drivers):
+        """Follow the assign chain from wire to its root (non-alias) wire, like a union-find
+        lookup.  The chain is compressed in alias_drivers so later lookups are constant time."""
+        chain = []
+        while wire in alias_drivers:
+            chain.append(wire)
+            wire = alias_drivers[wire]
+            assert len(chain) <= len(alias_drivers), "Cycle of assign statements"
+        for alias_wire in chain:
+            alias_drivers[alias_wire] = wire
+        return wire
+
+    def build_adjacency(self):
+        """Build the net->pins CSR arrays and the number of pins on each wire"""
+        pin_net = as_numpy(self.pin_net)
+        connected = np.flatnonzero(pin_net != NO_ID)
+        self.net_pins = to_column(connected[np.argsort(pin_net[connected], kind="stable")])
+
+        offsets = np.zeros(self.num_nets + 1, dtype=np.intc)
+        np.cumsum(np.bincount(pin_net[connected], minlength=self.num_nets), out=offsets[1:])
+        self.net_pin_offsets = to_column(offsets)
+
+        pin_wire = as_numpy(self.pin_wire)
+        self.wire_num_pins = to_column(
+            np.bincount(pin_wire[pin_wire != NO_ID], minlength=self.num_wires)
+        )
+
+    def get_instance_pins(self, instance):
+        return range(self.instance_pin_offsets[instance], self.instance_pin_offsets[instance + 1])
+
+    def get_instance_pin(self, instance, port_name, index):
+        """Return the pin of an instance with the given port name and index"""
+        layout = self.cell_pin_layout[self.instance_cell_type[instance]]
+        return self.instance_pin_offsets[instance] + layout[(port_name, index)]
+
+    def get_net_pins(self, net):
+        return self.net_pins[self.net_pin_offsets[net] : self.net_pin_offsets[net + 1]]
+
+    def get_net_instances(self, net):
+        """Unique instances connected to a net, in pin order"""
+        instances = {self.pin_instance[pin]: None for pin in self.get_net_pins(net)}
+        instances.pop(NO_ID, None)
+        return list(instances)
+
+    def get_top_pins(self):
+        return range(self.instance_pin_offsets[0])
+
+    def get_top_pin(self, port_name, index):
+        return self.top_pins_by_name_and_index[(port_name, index)]
+
+    def get_cell_type(self, instance):
+        return self.cell_types[self.instance_cell_type[instance]]
+
+    def get_port_name(self, pin):
+        return self.port_names[self.pin_port[pin]]
+
+    def get_wire_name(self, wire):
+        return f"{self.cable_names[self.wire_cable[wire]]}[{self.wire_index[wire]}]"
+
+    def get_net_name(self, net):
+        """Name of a net, which is the name of the cable of its root wire"""
+        return self.cable_names[self.wire_cable[self.net_wire[net]]]
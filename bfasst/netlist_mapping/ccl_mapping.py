@@ -14,7 +14,7 @@
 
 
 import argparse
-import spydrnet as sdn
+from bfasst.netlist_cache import parse_netlist
 from bfasst.netlist_mapping.print_data import (
     print_conformal_input_output_points,
     print_conformal_mapped_ffs,
@@ -31,13 +31,13 @@ def map_netlists(golden_netlist_arg, reversed_netlist_arg):
     """Maps the golden and reversed netlist based on block chains and functional trees"""
     print(f"golden: {golden_netlist_arg} reversed: {reversed_netlist_arg}")
     # Loads the first netlist as intermediate representation (ccl_ir1)
-    ccl_ir1 = sdn.parse(golden_netlist_arg)
+    ccl_ir1 = parse_netlist(golden_netlist_arg)
 
     # Get the first library in the netlist
     library1 = ccl_ir1.libraries[0]
 
     # Loads the second netlist as intermediate representation (ccl_ir2)
-    ccl_ir2 = sdn.parse(reversed_netlist_arg)
+    ccl_ir2 = parse_netlist(reversed_netlist_arg)
 
     # Get the second library in the netlist
     library2 = ccl_ir2.libraries[0]
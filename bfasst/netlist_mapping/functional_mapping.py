@@ -14,7 +14,7 @@
 
 
 import argparse
-import spydrnet as sdn
+from bfasst.netlist_cache import parse_netlist
 from bfasst.netlist_mapping.print_data import print_conformal_input_output_points
 from bfasst.netlist_mapping.print_data import print_conformal_mapped_ffs
 from bfasst.netlist_mapping.structural.carry_chain_mapping import map_carries_and_ffs
@@ -26,13 +26,13 @@ def functionally_map_netlists(golden_netlist_arg, reversed_netlist_arg):
     """Maps golden and reversed netlists through the functional trees before each ff"""
 
     # Loads the first netlist as intermediate representation (ir1)
-    ir1 = sdn.parse(golden_netlist_arg)
+    ir1 = parse_netlist(golden_netlist_arg)
 
     # Get the first library in the netlist
     library1 = ir1.libraries[0]
 
     # Loads the second netlist as intermediate representation (ir2)
-    ir2 = sdn.parse(reversed_netlist_arg)
+    ir2 = parse_netlist(reversed_netlist_arg)
 
     # Get the second library in the netlist
     library2 = ir2.libraries[0]
@@ -1,44 +1,37 @@
 """Builds new netlist structured used with automated block mapping"""
 
 
+from bfasst.netlist_ir import NO_ID
 from bfasst.netlist_mapping.structural.instance import Instance
 
 
-def append_wires_names(pin, input_wires_names, output_wires_names, other_wires_names):
+def append_wires_names(netlist_ir, pin, input_wires_names, output_wires_names, other_wires_names):
     """Adds new wire names to the instance"""
 
-    cable_name = pin.wire.cable.name
-    wire_index = str(pin.wire.index())
-    wire_name = cable_name + "[" + wire_index + "]"
-    if ("I" in pin.inner_pin.port.name) or ("S" in pin.inner_pin.port.name):
+    port_name = netlist_ir.get_port_name(pin)
+    wire = netlist_ir.pin_wire[pin]
+    wire_name = netlist_ir.get_wire_name(wire)
+    if ("I" in port_name) or ("S" in port_name):
         # Added filter for CARRY (CARRIES are mapped through the real netlist)
-        if (
-            ("DI" in pin.inner_pin.port.name)
-            or ("CYINIT" in pin.inner_pin.port.name)
-            or ("CI" in pin.inner_pin.port.name)
-        ):
+        if ("DI" in port_name) or ("CYINIT" in port_name) or ("CI" in port_name):
             pass
         else:
             input_wires_names.append(wire_name)
-    elif "D" in pin.inner_pin.port.name:
+    elif "D" in port_name:
         # Added filter for CARRY (CARRIES are mapped through the real netlist)
-        if (
-            ("DI" in pin.inner_pin.port.name)
-            or ("CYINIT" in pin.inner_pin.port.name)
-            or ("CI" in pin.inner_pin.port.name)
-        ):
+        if ("DI" in port_name) or ("CYINIT" in port_name) or ("CI" in port_name):
             pass
         else:
             input_wires_names.append(wire_name)
-    elif "O" in pin.inner_pin.port.name:
+    elif "O" in port_name:
         # Check that the wire is connected to other Input Pins
-        if len(pin.wire.pins) > 1:
+        if netlist_ir.wire_num_pins[wire] > 1:
             # Check that it is not a CO signal (CARRIES!)
-            if "CO" in pin.inner_pin.port.name:
+            if "CO" in port_name:
                 pass
             else:
                 output_wires_names.append(wire_name)
-    elif "Q" in pin.inner_pin.port.name:
+    elif "Q" in port_name:
         output_wires_names.append(wire_name)
     else:
         other_wires_names.append(wire_name)
@@ -321,15 +314,15 @@ def get_lut(
     return netlist
 
 
-def get_netlist(library):
-    """Builds new netlist structure out of SpyDrNet netlist"""
+def get_netlist(netlist_ir):
+    """Builds new netlist structure out of a NetlistIR"""
 
     netlist = []
     # Loop through each instance in the current library
-    for instance in library.get_instances():
+    for instance in range(netlist_ir.num_instances):
         instance_data = {
-            "name": instance.name,
-            "type": instance.reference.name,
+            "name": netlist_ir.instance_names[instance],
+            "type": netlist_ir.get_cell_type(instance),
         }
         input_wires = {
             "names": [],
@@ -346,15 +339,19 @@ def get_netlist(library):
             "number": 0,
         }
         # Loop through each of the pins in the instance
-        for pin in instance.pins:
+        for pin in netlist_ir.get_instance_pins(instance):
             # Check to see that there is a wire connected to the pin
-            if pin.wire is not None:
+            if netlist_ir.pin_wire[pin] != NO_ID:
                 (
                     input_wires["names"],
                     output_wires["names"],
                     other_wires["names"],
                 ) = append_wires_names(
-                    pin, input_wires["names"], output_wires["names"], other_wires["names"]
+                    netlist_ir,
+                    pin,
+                    input_wires["names"],
+                    output_wires["names"],
+                    other_wires["names"],
                 )
         # Getting the lengths
         input_wires["number"] = len(input_wires["names"])
@@ -17,7 +17,8 @@
 
 
 import argparse
-import spydrnet as sdn
+from bfasst.netlist_cache import load_netlist_record, record_to_netlist
+from bfasst.netlist_ir import NetlistIR
 from bfasst.netlist_mapping.print_data import print_conformal_input_output_points
 from bfasst.netlist_mapping.print_data import print_conformal_structural_points
 from bfasst.netlist_mapping.structural.netlist import get_netlist
@@ -28,20 +29,16 @@ def structurally_map_netlists(golden_netlist_arg, reversed_netlist_arg):
     """Map the golden and reversed netlists through automated block mapping"""
 
     # Loads the first netlist as intermediate representation (ir1)
-    ir1 = sdn.parse(golden_netlist_arg)
-
-    # Get the first library in the netlist
-    library1 = ir1.libraries[0]
+    record1 = load_netlist_record(golden_netlist_arg)
+    ir1 = record_to_netlist(record1)
 
     # Loads the second netlist as intermediate representation (ir2)
-    ir2 = sdn.parse(reversed_netlist_arg)
-
-    # Get the first library in the netlist
-    library2 = ir2.libraries[0]
+    record2 = load_netlist_record(reversed_netlist_arg)
+    ir2 = record_to_netlist(record2)
 
     # Get netlists for the structural mapping algorithm
-    golden_netlist = get_netlist(library1)
-    reversed_netlist = get_netlist(library2)
+    golden_netlist = get_netlist(NetlistIR(record1))
+    reversed_netlist = get_netlist(NetlistIR(record2))
 
     # Structurally map the rest of the netlists
     mapped_blocks = 0
@@ -2,14 +2,13 @@
 
 
 from abc import abstractmethod
-import pathlib
 import shutil
 import subprocess
 
 import bfasst
 from bfasst.opt.base import OptTool
 from bfasst.status import BfasstException, OptStatus, Status
-from bfasst.tool import ToolProduct
+from bfasst.tool import ToolProduct, tool_stage
 
 
 class Ic2BaseOptTool(OptTool):
@@ -17,6 +16,7 @@ class Ic2BaseOptTool(OptTool):
 
     TOOL_WORK_DIR = "ic2_opt"
 
+    @tool_stage
     def create_netlist(self, design, in_files, lib_files, force_run=False):
         """Create netlist"""
 
@@ -25,9 +25,7 @@ class Ic2BaseOptTool(OptTool):
 
         status = self.get_prev_run_status(
             tool_products=[ToolProduct(design.netlist_path, self.log_path, self.check_opt_log)],
-            dependency_modified_time=max(
-                pathlib.Path(__file__).stat().st_mtime, design.last_modified_time()
-            ),
+            dependencies=design.get_source_files(),
         )
 
         if status is not None and not force_run:
@@ -1,3 +1,5 @@
+import contextlib
+import os
 import sys
 import threading
 from io import StringIO
@@ -93,3 +95,35 @@ def disable_proxy():
     # sys.__stderr__ = orig___stderr__
     sys.stdout = orig_stdout
     # sys.stderr = orig_stderr
+
+
+@contextlib.contextmanager
+def redirect_to_file(path):
+    """
+    Redirects the stdout and stderr file descriptors of the process to a file,
+    for the duration of a with block.  Unlike redirect(), this applies to every
+    thread, and to child processes and native code (eg. the JVM), and output
+    goes straight to the file instead of being held in memory.
+
+    :param path: The file to write the output to (truncated).
+    :type path: ``pathlib.Path``
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = [os.dup(fd) for fd in (1, 2)]
+    line_buffering = sys.stdout.line_buffering
+
+    try:
+        with open(path, "w") as fp:
+            os.dup2(fp.fileno(), 1)
+            os.dup2(fp.fileno(), 2)
+        # Written line by line, so the log is complete if the process is killed
+        sys.stdout.reconfigure(line_buffering=True)
+        yield
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        sys.stdout.reconfigure(line_buffering=line_buffering)
+        for fd, saved_fd in zip((1, 2), saved_fds):
+            os.dup2(saved_fd, fd)
+            os.close(saved_fd)
@@ -0,0 +1,179 @@
+""" Run external commands with streamed output, a wall-clock timeout and resource usage """
+
+import codecs
+import os
+import pathlib
+import selectors
+import signal
+import subprocess
+import time
+from dataclasses import dataclass
+
+# Seconds between SIGTERM and SIGKILL when killing a command that timed out
+KILL_GRACE_PERIOD = 5.0
+
+READ_SIZE = 1 << 16
+
+
+@dataclass
+class ResourceUsage:
+    """Resources used by a command and the processes it waited for"""
+
+    wall_time: float
+    user_time: float
+    system_time: float
+    max_rss_kb: int
+
+    @property
+    def cpu_time(self):
+        return self.user_time + self.system_time
+
+    def __str__(self):
+        return (
+            f"{self.wall_time:.1f}s wall, {self.cpu_time:.1f}s CPU, "
+            f"{self.max_rss_kb / 1024:.0f} MB peak RSS"
+        )
+
+
+class LineReader:
+    """Split the bytes read from a pipe into lines of text, like universal_newlines=True"""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.partial = ""
+
+    def feed(self, data):
+        text = self.partial + self.decoder.decode(data, final=not data)
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+        lines = text.split("\n")
+        self.partial = lines.pop()
+        for line in lines:
+            self.callback(line + "\n")
+        if not data and self.partial:
+            self.callback(self.partial)
+            self.partial = ""
+
+
+def run_streamed(cmd, on_stdout, *, on_stderr=None, cwd=None, env=None, timeout=None):
+    """Run a command, calling on_stdout(line) and on_stderr(line) for each line of output as it
+    is produced.  Both pipes are drained concurrently, so neither can fill up and stall the
+    command.  If on_stderr is None, stderr is merged into stdout.
+
+    The command runs in its own process group.  If it is still running after timeout seconds,
+    the whole group is killed and subprocess.TimeoutExpired is raised.
+
+    Returns the (finished) Popen object, with its resource usage in proc.resource_usage."""
+
+    start_time = time.monotonic()
+    deadline = None if timeout is None else start_time + timeout
+
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT if on_stderr is None else subprocess.PIPE,
+        cwd=cwd,
+        env=env,
+        start_new_session=True,
+    )
+
+    try:
+        with selectors.DefaultSelector() as selector:
+            selector.register(proc.stdout, selectors.EVENT_READ, LineReader(on_stdout))
+            if on_stderr is not None:
+                selector.register(proc.stderr, selectors.EVENT_READ, LineReader(on_stderr))
+
+            while selector.get_map():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+                for key, _ in selector.select(remaining):
+                    data = os.read(key.fileobj.fileno(), READ_SIZE)
+                    key.data.feed(data)
+                    if not data:
+                        selector.unregister(key.fileobj)
+
+        # Output is closed, but the command may still be running
+        status, rusage = wait_for_exit(proc, deadline)
+        if status is None:
+            raise subprocess.TimeoutExpired(cmd, timeout)
+
+    except BaseException:
+        # Timeout, but also eg. KeyboardInterrupt: don't leave the command running
+        kill_process_group(proc)
+        raise
+
+    finally:
+        proc.stdout.close()
+        if proc.stderr is not None:
+            proc.stderr.close()
+
+    proc.returncode = get_exit_code(status)
+    proc.resource_usage = ResourceUsage(
+        wall_time=time.monotonic() - start_time,
+        user_time=rusage.ru_utime,
+        system_time=rusage.ru_stime,
+        max_rss_kb=rusage.ru_maxrss,
+    )
+    return proc
+
+
+def wait_for_exit(proc, deadline=None):
+    """Wait for a command to exit, until deadline (time.monotonic).  Returns its wait status and
+    resource usage, or (None, None) if it is still running at the deadline.  The resource usage
+    includes the processes the command waited for."""
+    while True:
+        if deadline is None:
+            _, status, rusage = os.wait4(proc.pid, 0)
+            return status, rusage
+        pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            return status, rusage
+        if time.monotonic() >= deadline:
+            return None, None
+        time.sleep(0.05)
+
+
+def get_exit_code(status):
+    """Return code of a wait status, like subprocess (negative signal number if it was killed)"""
+    return -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+
+
+def kill_process_group(proc):
+    """Terminate the process group of a command started by run_streamed, then kill it if it
+    doesn't exit within KILL_GRACE_PERIOD"""
+    if proc.returncode is not None:
+        return
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            break
+        try:
+            proc.wait(KILL_GRACE_PERIOD)
+            break
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def get_process_group_usage(pgid):
+    """Return the (CPU seconds, peak RSS in KB) of the live processes of a process group, for
+    long-lived commands that are not waited for.  The peak RSS is the largest high-water mark of
+    any of the processes.  Only supported on Linux (uses /proc)."""
+    ticks_per_second = os.sysconf("SC_CLK_TCK")
+    cpu_time = 0.0
+    max_rss_kb = 0
+    for proc_dir in pathlib.Path("/proc").glob("[0-9]*"):
+        try:
+            # Fields after the command name, which is in parentheses and may contain spaces
+            stat = (proc_dir / "stat").read_text().rsplit(")", 1)[1].split()
+            if int(stat[2]) != pgid:
+                continue
+            cpu_time += (int(stat[11]) + int(stat[12])) / ticks_per_second
+            for line in (proc_dir / "status").read_text().splitlines():
+                if line.startswith("VmHWM:"):
+                    max_rss_kb = max(max_rss_kb, int(line.split()[1]))
+        except (OSError, IndexError, ValueError):
+            # The process exited in the meantime
+            continue
+    return cpu_time, max_rss_kb
@@ -0,0 +1,185 @@
+""" Per-stage metrics of experiment runs, and the SQLite database they are kept in
+
+Each run of a tool (a stage of a design job) produces a StageRecord: when it ran, its duration,
+the peak RSS and CPU time of the commands it ran, whether it ran or a previous run was reused
+(from the build directory, or restored from the artifact cache), and its status.  The records
+of a job are collected in the worker (see pop_stage_records) and stored by run_experiment.py
+in build/<experiment>/results.sqlite as each job finishes, so the database can be queried while
+the experiment runs (see scripts/query_results.py).
+"""
+
+import sqlite3
+import time
+from dataclasses import asdict, dataclass
+
+DB_FILE_NAME = "results.sqlite"
+
+# How a tool stage got its products
+OUTCOME_RAN = "ran"
+OUTCOME_REUSED = "reused"  # previous run in the build directory
+OUTCOME_RESTORED = "restored"  # from the artifact cache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    experiment TEXT,
+    start_time REAL,
+    end_time REAL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    run_id INTEGER,
+    design TEXT,
+    status TEXT,
+    error INTEGER,
+    runtime REAL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id INTEGER,
+    design TEXT,
+    tool TEXT,
+    start_time REAL,
+    duration REAL,
+    peak_rss_kb INTEGER,
+    cpu_time REAL,
+    outcome TEXT,
+    status TEXT,
+    error INTEGER
+);
+CREATE INDEX IF NOT EXISTS stages_run ON stages (run_id, design, tool);
+"""
+
+
+@dataclass
+class StageRecord:
+    """Metrics of one run of a tool"""
+
+    tool: str
+    start_time: float
+    duration: float
+    peak_rss_kb: int
+    cpu_time: float
+    outcome: str
+    status: str
+    error: bool
+
+
+# Records of the tools run by this process, since the last call to pop_stage_records
+_RECORDS = []
+
+
+def add_stage_record(record):
+    _RECORDS.append(record)
+
+
+def pop_stage_records():
+    """Return the records of the tools run since the last call, eg. by a design job"""
+    records = list(_RECORDS)
+    _RECORDS.clear()
+    return records
+
+
+def get_status_name(status):
+    """Name of a Status (or of an exception raised instead), as stored in the database"""
+    if status is None:
+        return "Exception"
+    if isinstance(status, Exception):
+        return f"Exception: {type(status).__name__}"
+    return str(status.status)
+
+
+def is_error(status):
+    return status is None or isinstance(status, Exception) or bool(status.error)
+
+
+class ResultsDB:
+    """Results of the runs of an experiment.  Jobs are added to the run started last."""
+
+    def __init__(self, path):
+        self.path = path
+        self.run_id = None
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        # Readers (eg. query_results.py) don't block the experiment while it writes
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def start_run(self, experiment):
+        """Start a new run of an experiment, returns its id"""
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (experiment, start_time) VALUES (?, ?)", (experiment, time.time())
+            )
+        self.run_id = cursor.lastrowid
+        return self.run_id
+
+    def end_run(self):
+        with self.connection:
+            self.connection.execute(
+                "UPDATE runs SET end_time = ? WHERE id = ?", (time.time(), self.run_id)
+            )
+
+    def add_job(self, design, status, runtime, records):
+        """Store a finished design job, and the records of its stages"""
+        run_id = self.run_id
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?)",
+                (run_id, design, get_status_name(status), is_error(status), runtime),
+            )
+            self.connection.executemany(
+                "INSERT INTO stages VALUES (:run_id, :design, :tool, :start_time, :duration, "
+                ":peak_rss_kb, :cpu_time, :outcome, :status, :error)",
+                [dict(asdict(record), run_id=run_id, design=design) for record in records],
+            )
+
+    def get_runs(self):
+        return self.connection.execute("SELECT * FROM runs ORDER BY id").fetchall()
+
+    def get_last_run_id(self, before=None):
+        """Id of the latest run, or of the latest run before another one"""
+        row = self.connection.execute(
+            "SELECT MAX(id) FROM runs WHERE id < ?", (before or float("inf"),)
+        ).fetchone()
+        return row[0]
+
+    def get_slowest_stages(self, run_id, limit=20):
+        """Stages of a run that took the longest"""
+        return self.connection.execute(
+            "SELECT * FROM stages WHERE run_id = ? ORDER BY duration DESC LIMIT ?",
+            (run_id, limit),
+        ).fetchall()
+
+    def get_regressions(self, run_id, baseline_run_id, threshold=1.2, min_duration=1.0):
+        """Stages that ran in both runs, and took at least threshold times longer in run_id than
+        in the baseline run (ignoring stages shorter than min_duration seconds)"""
+        return self.connection.execute(
+            """
+            SELECT new.design, new.tool, old.duration AS old_duration,
+                new.duration AS new_duration, new.duration / old.duration AS ratio
+            FROM stages AS new JOIN stages AS old
+                ON new.design = old.design AND new.tool = old.tool
+            WHERE new.run_id = ? AND old.run_id = ?
+                AND new.outcome = 'ran' AND old.outcome = 'ran'
+                AND new.duration >= ? AND new.duration >= old.duration * ?
+            ORDER BY ratio DESC
+            """,
+            (run_id, baseline_run_id, min_duration, threshold),
+        ).fetchall()
+
+    def get_cache_effectiveness(self, run_id):
+        """Number of stages of each tool that ran, or were reused or restored, in a run, with the
+        time spent running them"""
+        return self.connection.execute(
+            """
+            SELECT tool,
+                SUM(outcome = 'ran') AS ran,
+                SUM(outcome = 'reused') AS reused,
+                SUM(outcome = 'restored') AS restored,
+                SUM(CASE WHEN outcome = 'ran' THEN duration ELSE 0 END) AS run_time
+            FROM stages WHERE run_id = ? GROUP BY tool ORDER BY run_time DESC
+            """,
+            (run_id,),
+        ).fetchall()
@@ -1,12 +1,11 @@
 """ X-ray bitstream to netlist tool"""
 import os
 import re
-import pathlib
 
 from bfasst.reverse_bit.base import ReverseBitTool
 from bfasst.status import BfasstException, Status, BitReverseStatus
 from bfasst import paths, config
-from bfasst.tool import ToolProduct
+from bfasst.tool import ToolProduct, tool_stage
 
 
 class XRayReverseBitTool(ReverseBitTool):
@@ -33,6 +32,7 @@ class XRayReverseBitTool(ReverseBitTool):
         self.to_netlist_log = self.work_dir / "to_netlist.log"
         self.to_fasm_log = self.work_dir / "to_fasm.log"
 
+    @tool_stage
     def reverse_bitstream(self, design):
         """Run bitstream to netlist conversion"""
         # To fasm process
@@ -52,9 +52,7 @@ class XRayReverseBitTool(ReverseBitTool):
 
         status = self.get_prev_run_status(
             [generate_fasm, generate_netlist],
-            dependency_modified_time=max(
-                pathlib.Path(__file__).stat().st_mtime, design.bitstream_path.stat().st_mtime
-            ),
+            dependencies=[design.bitstream_path, design.constraints_path],
         )
 
         if status is not None:
@@ -79,7 +77,9 @@ class XRayReverseBitTool(ReverseBitTool):
                 self.to_netlist_log_parser(self.to_netlist_log)
             raise e
 
-        return self.to_netlist_log_parser(self.to_netlist_log)
+        status = self.to_netlist_log_parser(self.to_netlist_log)
+        self.cache_products(status)
+        return status
 
     def convert_bit_to_fasm(self, bitstream_path, fasm_path):
         """Convert bitstream to FASM file"""
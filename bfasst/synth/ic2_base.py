@@ -2,6 +2,7 @@
 
 from abc import abstractmethod
 from bfasst.synth.base import SynthesisTool
+from bfasst.tool import tool_stage
 
 
 class Ic2BaseSynthesisTool(SynthesisTool):
@@ -9,6 +10,7 @@ class Ic2BaseSynthesisTool(SynthesisTool):
 
     TOOL_WORK_DIR = "ic2_synth"
 
+    @tool_stage
     def create_netlist(self, design):
         """Create netlist"""
         # Save edif netlist path to design object
@@ -1,15 +1,14 @@
 """ This file provides tools to wrap Vivado for synthesis purposes """
 
 import re
-import pathlib
 
 import bfasst
 from bfasst.design import HdlType
 from bfasst.synth.base import SynthesisTool
 from bfasst.synth import vivado_ioparse
 from bfasst.status import Status, SynthStatus
-from bfasst.config import VIVADO_COMMAND
-from bfasst.tool import ToolProduct
+from bfasst import vivado_server
+from bfasst.tool import ToolProduct, tool_stage
 
 
 def xdc_line(pin):
@@ -36,6 +35,9 @@ class VivadoSynthesisTool(SynthesisTool):
 
     TOOL_WORK_DIR = "vivado_synth"
 
+    def get_tool_version(self):
+        return vivado_server.get_vivado_version()
+
     def check_runs(self, design):
         """Check if synthesis has already been run"""
 
@@ -50,13 +52,9 @@ class VivadoSynthesisTool(SynthesisTool):
             generate_constraints = ToolProduct(design.constraints_path)
             tool_products = [generate_netlist, generate_constraints]
 
-        return self.get_prev_run_status(
-            tool_products,
-            dependency_modified_time=max(
-                pathlib.Path(__file__).stat().st_mtime, design.last_modified_time()
-            ),
-        )
+        return self.get_prev_run_status(tool_products, dependencies=design.get_source_files())
 
+    @tool_stage
     def create_netlist(self, design):
         """create netlist from design"""
 
@@ -79,7 +77,9 @@ class VivadoSynthesisTool(SynthesisTool):
             extract_contraints(design, report_io_path)
 
         # Check synthesis log
-        return self.check_synth_log(self.log_path)
+        status = self.check_synth_log(self.log_path)
+        self.cache_products(status)
+        return status
 
     def write_header(self, stream):
         stream.write("if { [ catch {\n")
@@ -147,8 +147,7 @@ class VivadoSynthesisTool(SynthesisTool):
         with open(tcl_path, "w") as stream:
             self.write_tcl(design, report_io_path, stream)
 
-        cmd = VIVADO_COMMAND + ["-source", str(tcl_path)]
-        proc = self.exec_and_log(cmd)
+        proc = vivado_server.exec_tcl(self, tcl_path)
         if proc.returncode:
             return Status(SynthStatus.ERROR)
 
@@ -10,6 +10,7 @@ import bfasst
 from bfasst import paths
 from bfasst.synth.base import SynthesisTool
 from bfasst.status import Status, SynthStatus
+from bfasst.tool import tool_stage
 
 YOSYS_SCRIPT_TEMPLATE = "ex_yos_tech.yos"
 YOSYS_SCRIPT_FILE = "script.yos"
@@ -21,6 +22,7 @@ class YosysTechSynthTool(SynthesisTool):
 
     TOOL_WORK_DIR = "yosys_synth"
 
+    @tool_stage
     def create_netlist(self, design):
         # Target netlist output
         design.netlist_path = self.cwd / (design.top + "_yosys_tech.v")
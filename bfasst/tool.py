@@ -3,14 +3,66 @@
 import abc
 import argparse
 import datetime
+import functools
 import pathlib
 import shlex
 import subprocess
 import sys
+import time
 import types
+import weakref
 from dataclasses import dataclass
 
-from bfasst.utils import TermColor, print_color
+from bfasst import artifact_cache
+from bfasst.process_runner import run_streamed
+from bfasst.results_db import (
+    OUTCOME_RAN,
+    OUTCOME_RESTORED,
+    OUTCOME_REUSED,
+    StageRecord,
+    add_stage_record,
+    get_status_name,
+    is_error,
+)
+from bfasst.status import BfasstException, Status
+from bfasst.tool_log import LogLevel, ToolLog
+from bfasst.utils import TermColor
+
+# Peak RSS (KB) of the commands run by each type of tool (TOOL_WORK_DIR) in this process, since
+# the last call to pop_peak_rss_by_tool
+_PEAK_RSS_KB = {}
+
+
+def pop_peak_rss_by_tool():
+    """Return the peak RSS (KB) of the commands run by each type of tool since the last call, eg.
+    to measure the memory used by the tools of a design job"""
+    peak_rss_kb = dict(_PEAK_RSS_KB)
+    _PEAK_RSS_KB.clear()
+    return peak_rss_kb
+
+
+def tool_stage(method):
+    """Decorator of the methods that run a tool (eg. create_netlist), which records the metrics
+    of each call (see Tool.record_stage)"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.stage_start_time = time.time()
+        self.run_outcome = OUTCOME_RAN
+        self.command_usage = []
+
+        status = None
+        try:
+            status = method(self, *args, **kwargs)
+            return status
+        except BfasstException as e:
+            # Error statuses are usually raised
+            status = Status(e.error, str(e), raise_excep=False)
+            raise
+        finally:
+            self.record_stage(status)
+
+    return wrapper
 
 
 @dataclass
@@ -40,6 +92,17 @@ class Tool(abc.ABC):
         self.log_path = self.work_dir / "log.txt"
         self.log_fp = None
 
+        # Key and products of the current run (see get_prev_run_status)
+        self.run_key = None
+        self.run_products = []
+
+        # (command, ResourceUsage) of each command run by exec_and_log
+        self.command_usage = []
+
+        # Start time (time.time) and outcome of the current run (see record_stage)
+        self.stage_start_time = time.time()
+        self.run_outcome = OUTCOME_RAN
+
         # Argument parser
         self.arg_parser = None
 
@@ -84,33 +147,85 @@ class Tool(abc.ABC):
         return work_dir
 
     def open_new_log(self):
-        self.log_fp = open(self.log_path, "w")
+        """Start a new log file (see ToolLog).  It is closed by close_log, or when the tool is
+        garbage collected."""
+        self.close_log()
+        self.log_fp = ToolLog(self.log_path)
+        weakref.finalize(self, self.log_fp.close)
+
+    def close_log(self):
+        if self.log_fp is not None:
+            self.log_fp.close()
 
     def log_title(self, *msg):
-        self.log(f"{'='*80}\n{' '.join(str(s) for s in msg)}\n{'='*80}")
+        """Log a title, which also starts a new stage in the log summary"""
+        title = " ".join(str(s) for s in msg)
+        self.log_fp.start_stage(title)
+        self.log(f"{'='*80}\n{title}\n{'='*80}")
 
-    def log(self, *msg, add_timestamp=False):
+    def log(self, *msg, add_timestamp=False, level=LogLevel.INFO):
         """Write text to the log file and stdout"""
-        text = " ".join(str(s) for s in msg)
-        if add_timestamp:
-            time_now = datetime.datetime.now()
-            text = time_now.strftime(Tool.TIMESTAMP_FORMAT) + text
-        print(text)
-        self.log_fp.write(text + "\n")
-        self.log_fp.flush()
+        self.log_color(None, *msg, add_timestamp=add_timestamp, level=level)
 
-    def log_color(self, color, *msg, add_timestamp=False):
+    def log_color(self, color, *msg, add_timestamp=False, level=LogLevel.INFO):
+        if not self.log_fp.is_enabled(level):
+            return
         text = " ".join(str(s) for s in msg)
         if add_timestamp:
             time_now = datetime.datetime.now()
             text = time_now.strftime(Tool.TIMESTAMP_FORMAT) + text
-        print_color(color, text)
-        self.log_fp.write(text + "\n")
-        self.log_fp.flush()
+        self.log_fp.write(text, level, color)
+
+    def log_debug(self, *msg):
+        """Log detailed (eg. per pin or per wire) messages, which are dropped unless the log
+        level is DEBUG"""
+        self.log_color(None, *msg, level=LogLevel.DEBUG)
 
-    def get_prev_run_status(self, tool_products, dependency_modified_time):
+    def get_tool_version(self):
+        """Version of the external tool run by this tool, part of the key of each run (see
+        artifact_cache)"""
+        return ""
+
+    def get_prev_run_status(self, tool_products, dependencies):
         """Determines whether previous run data can be reused, and if so,
-        returns the Status, otherwise returns None if Tool needs to be re-run"""
+        returns the Status, otherwise returns None if Tool needs to be re-run.
+
+        A run is identified by a key that covers the tool and its arguments, and the contents of
+        the dependencies (input files).  A previous run in the work directory is reused if it
+        had the same key, otherwise the products of a run with the same key are restored from
+        the artifact cache, if possible.  If the tool needs to be re-run, the products of the
+        previous run are removed first."""
+
+        self.run_key = artifact_cache.get_run_key(self, dependencies)
+        self.run_products = tool_products
+
+        if artifact_cache.read_run_key(self.work_dir) == self.run_key:
+            status = self.check_prev_run_products(tool_products)
+            if status is not None:
+                self.run_outcome = OUTCOME_REUSED
+                return status
+
+        if artifact_cache.restore(self.run_key, tool_products):
+            artifact_cache.write_run_key(self.work_dir, self.run_key)
+            status = self.check_prev_run_products(tool_products)
+            if status is not None:
+                self.run_outcome = OUTCOME_RESTORED
+                return status
+
+        artifact_cache.remove_products(tool_products)
+        artifact_cache.write_run_key(self.work_dir, self.run_key)
+        return None
+
+    def record_run(self, tool_products, dependencies):
+        """Record a run that didn't start with get_prev_run_status (eg. because it was part of
+        the run of another tool), so it can be reused and cached"""
+        self.run_key = artifact_cache.get_run_key(self, dependencies)
+        self.run_products = tool_products
+        artifact_cache.write_run_key(self.work_dir, self.run_key)
+
+    def check_prev_run_products(self, tool_products):
+        """Returns the Status of a previous run from its products, or None if they are
+        incomplete"""
 
         # Loop through tool prodcuts
         for tool_product in tool_products:
@@ -120,31 +235,47 @@ class Tool(abc.ABC):
                 if not tool_product.log_path.is_file():
                     return None
 
-                # If log file is out of date, need to re-run
-                if dependency_modified_time > tool_product.log_path.stat().st_mtime:
-                    return None
-
                 # If log file has an error, return that status
                 status = tool_product.check_log_fcn(tool_product.log_path)
                 if status.error:
                     return status
 
-                # If log file doesn't have an error, but output file is expected and missing, re-run
-                if (tool_product.file_path is not None) and (not tool_product.file_path.is_file()):
-                    return None
-            else:
-                # This ToolProduct doesn't produce a log file
-
-                # Rerun if product file is missing, or if product file is out of date
-                if not tool_product.file_path.is_file() or (
-                    dependency_modified_time > tool_product.file_path.stat().st_mtime
-                ):
-                    return None
+            # If output file is expected and missing, re-run
+            if (tool_product.file_path is not None) and (not tool_product.file_path.is_file()):
+                return None
 
         return self.success_status
 
+    def cache_products(self, status):
+        """Store the products of the current run in the artifact cache, if it was successful"""
+        if self.run_key is not None and not status.error:
+            if self.log_fp is not None:
+                self.log_fp.flush()
+            artifact_cache.store(self.run_key, self.run_products)
+
+    def record_stage(self, status):
+        """Record the metrics of the current run of the tool: its duration, the peak RSS and CPU
+        time of the commands it ran, whether a previous run was reused instead, and its status
+        (None if it raised an exception).  See bfasst.results_db."""
+        usage = [usage for _, usage in self.command_usage]
+        add_stage_record(
+            StageRecord(
+                tool=self.TOOL_WORK_DIR,
+                start_time=self.stage_start_time,
+                duration=time.time() - self.stage_start_time,
+                peak_rss_kb=max((u.max_rss_kb for u in usage), default=0),
+                cpu_time=sum(u.cpu_time for u in usage),
+                outcome=self.run_outcome,
+                status=get_status_name(status),
+                error=is_error(status),
+            )
+        )
+
     def exec_and_log(self, cmd, cwd=None, fp=None, fp_err=None, env=None, timeout=None):
-        """Run a command using Popen and log the output, return the process handle"""
+        """Run a command and log its output as it is produced, return the (finished) process
+        handle.  If the command runs longer than timeout seconds, it is killed, along with any
+        processes it started, and subprocess.TimeoutExpired is raised.  The peak memory and CPU
+        time of the command are logged and kept in self.command_usage."""
 
         # Default cwd is the work directory
         if cwd is None:
@@ -153,33 +284,40 @@ class Tool(abc.ABC):
         # Can't provide an fp_err without an fp
         assert fp_err is None or fp is not None
 
-        proc = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT if fp_err is None else subprocess.PIPE,
-            universal_newlines=True,
-            cwd=cwd,
-            env=env,
-        )
-
-        # Print stdout to log
-        for line in proc.stdout:
-            if fp:
-                fp.write(line)
-            else:
-                self.log(line.strip())
-
-        # If stderr is separate, print it to log as well.
-        if fp_err:
-            for line in proc.stderr:
-                if fp:
-                    fp.write(line)
-                else:
-                    self.log(line.strip())
-
-        proc.communicate(timeout=timeout)
+        if self.log_fp is not None:
+            self.log_fp.flush()
+        try:
+            proc = run_streamed(
+                cmd,
+                fp.write if fp else self.log_output,
+                on_stderr=fp_err.write if fp_err else None,
+                cwd=cwd,
+                env=env,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            if self.log_fp is not None:
+                self.log(f"Command timed out after {timeout}s and was killed: {cmd}")
+            raise
+
+        self.log_command_usage(cmd, proc.returncode, proc.resource_usage)
         return proc
 
+    def log_output(self, line):
+        """Log a line of output of a command"""
+        self.log(line.strip())
+
+    def log_command_usage(self, cmd, returncode, usage):
+        """Keep the resource usage of a finished command in self.command_usage, and log it"""
+        self.command_usage.append((cmd, usage))
+        tool_type = self.TOOL_WORK_DIR
+        _PEAK_RSS_KB[tool_type] = max(_PEAK_RSS_KB.get(tool_type, 0), usage.max_rss_kb)
+        if self.log_fp is not None:
+            self.log(f"Command finished with exit code {returncode} ({usage})")
+
+            # Tools check their log for errors once the command is done
+            self.log_fp.flush()
+
 
 class ToolArgParser(argparse.ArgumentParser):
     def __init__(self, name) -> None:
@@ -0,0 +1,137 @@
+""" Buffered, level-filtered log file used by Tool.log """
+
+import enum
+import json
+import os
+import time
+
+from bfasst.utils import TermColor, print_color
+
+
+class LogLevel(enum.IntEnum):
+    """Verbosity of a log message (same values as the standard logging module)"""
+
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+
+
+# Defaults, which can be changed through the environment.  Batch runs can set BFASST_LOG_STDOUT=0
+# to only write log files, and BFASST_LOG_LEVEL=DEBUG logs every pin, wire and mapping candidate.
+def get_default_level():
+    """Log level of BFASST_LOG_LEVEL, INFO if it is not set or not a level name"""
+    value = os.environ.get("BFASST_LOG_LEVEL", "INFO")
+    name = value.upper()
+    if name not in LogLevel.__members__:
+        print_color(
+            TermColor.YELLOW,
+            f"Invalid BFASST_LOG_LEVEL {value} (expected one of {', '.join(LogLevel.__members__)}),",
+            "using INFO",
+        )
+        return LogLevel.INFO
+    return LogLevel[name]
+
+
+DEFAULT_LEVEL = get_default_level()
+DEFAULT_ECHO = os.environ.get("BFASST_LOG_STDOUT", "1") != "0"
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+
+class ToolLog:
+    """Log file of a tool.  Messages below the log level are dropped.  The rest are written to a
+    buffered file, which is flushed when the log is closed, when an error is logged, and at most
+    every flush_interval seconds otherwise.  Messages are also echoed to stdout, unless disabled
+    (eg. for batch runs).
+
+    The log is divided into stages, one per title (see Tool.log_title).  When the log is closed,
+    a summary of the stages (duration and number of messages by level) is written next to it, in
+    <log name>.summary.json."""
+
+    BUFFER_SIZE = 1 << 16
+
+    def __init__(self, path, level=None, echo=None, flush_interval=None):
+        self.path = path
+        self.level = DEFAULT_LEVEL if level is None else level
+        self.echo = DEFAULT_ECHO if echo is None else echo
+        self.flush_interval = DEFAULT_FLUSH_INTERVAL if flush_interval is None else flush_interval
+
+        self.fp = open(path, "w", buffering=self.BUFFER_SIZE)
+        self.last_flush = time.monotonic()
+
+        self.stages = []
+        self.start_stage("")
+
+    @property
+    def summary_path(self):
+        return self.path.with_name(self.path.name + ".summary.json")
+
+    def is_enabled(self, level):
+        """Whether messages of this level are logged.  Use this to skip building expensive
+        messages."""
+        return level >= self.level
+
+    def write(self, text, level=LogLevel.INFO, color=None):
+        """Write one message (without trailing newline) to the log, and optionally stdout"""
+        if level < self.level:
+            return
+
+        self.stages[-1]["messages"][level.name] += 1
+        if self.echo:
+            if color is None:
+                print(text)
+            else:
+                print_color(color, text)
+
+        self.fp.write(text + "\n")
+        if level >= LogLevel.ERROR or time.monotonic() - self.last_flush > self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.fp.flush()
+        self.last_flush = time.monotonic()
+
+    def start_stage(self, name):
+        """Start a new stage, ending the current one"""
+        now = time.monotonic()
+        if self.stages:
+            self.end_stage(now)
+        self.stages.append(
+            {
+                "name": name,
+                "start": now,
+                "duration": None,
+                "messages": {level.name: 0 for level in LogLevel},
+            }
+        )
+
+    def end_stage(self, now):
+        stage = self.stages[-1]
+        stage["duration"] = now - stage["start"]
+
+    def get_summary(self):
+        """Per-stage summary, skipping the unnamed stage before the first title if it is
+        empty"""
+        start = self.stages[0]["start"]
+        return [
+            {
+                "name": stage["name"],
+                "start": stage["start"] - start,
+                "duration": stage["duration"],
+                "messages": stage["messages"],
+            }
+            for stage in self.stages
+            if stage["name"] or any(stage["messages"].values())
+        ]
+
+    def close(self):
+        if self.fp.closed:
+            return
+        self.end_stage(time.monotonic())
+        self.fp.close()
+        with open(self.summary_path, "w") as fp:
+            json.dump(self.get_summary(), fp, indent=2)
+
+    @property
+    def closed(self):
+        return self.fp.closed
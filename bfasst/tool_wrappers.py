@@ -2,11 +2,8 @@
 Only import as needed to minimize dependencies to the tools being used."""
 
 # pylint: disable=import-outside-toplevel
-from pathlib import Path
-from bfasst.config import VIVADO_BIN_PATH
 from bfasst.locks import conformal_lock, onespin_lock
 from bfasst.status import BfasstException
-from bfasst.tool import ToolProduct
 from bfasst.types import ToolType, Vendor
 
 
@@ -138,7 +135,7 @@ def xray_rev(design, build_dir, flow_args):
     return reverse_bit_tool.reverse_bitstream(design)
 
 
-def xilinx_phys_netlist(design, build_dir):
+def xilinx_phys_netlist(design, build_dir, _flow_args=None):
     """Run the xilinx physical netlist transformation"""
     from bfasst.transform.xilinx_phys_netlist import XilinxPhysNetlist
 
@@ -147,8 +144,33 @@ def xilinx_phys_netlist(design, build_dir):
     return status
 
 
+def get_vivado_ooc_prev_run_status(design, synth_tool, impl_tool):
+    """Status of the previous out-of-context synthesis and implementation run, or None if they
+    need to run again"""
+    from bfasst import artifact_cache
+
+    synth_status = synth_tool.check_runs(design)
+
+    impl_tool.init_design(design)
+    impl_products = impl_tool.get_tool_products(design, impl_tool.check_impl_status)
+    if synth_status is not None:
+        try:
+            impl_status = impl_tool.get_prev_run_status(
+                impl_products, dependencies=impl_tool.get_dependencies(design)
+            )
+        except FileNotFoundError:
+            impl_status = None
+        if impl_status is not None:
+            return impl_status
+
+    # The products of the previous run may be hardlinks to the artifact cache
+    artifact_cache.remove_products(impl_products)
+    return None
+
+
 def vivado_ooc(design, build_dir, flow_args):
     """Run Vivado Synthesis and Implementation for out-of-context designs"""
+    from bfasst import vivado_server
     from bfasst.impl.vivado import VivadoImplementationTool
     from bfasst.synth.vivado import VivadoSynthesisTool
     from bfasst.status import ImplStatus
@@ -159,29 +181,13 @@ def vivado_ooc(design, build_dir, flow_args):
     synth_tool.args.out_of_context = True
     impl_tool.args.out_of_context = True
 
-    synth_status = synth_tool.check_runs(design)
-
-    if synth_status is not None:
-        impl_tool.init_design(design)
-        try:
-            impl_status = impl_tool.get_prev_run_status(
-                tool_products=[
-                    ToolProduct(
-                        design.bitstream_path,
-                        impl_tool.log_path,
-                        impl_tool.check_impl_status,
-                    )
-                ],
-                dependency_modified_time=max(
-                    Path(__file__).stat().st_mtime, design.netlist_path.stat().st_mtime
-                ),
-            )
-        except FileNotFoundError:
-            impl_status = None
-        if impl_status is not None:
-            synth_tool.print_skipping_synth()
-            impl_tool.print_skipping_impl()
-            return impl_status
+    impl_status = get_vivado_ooc_prev_run_status(design, synth_tool, impl_tool)
+    if impl_status is not None:
+        synth_tool.print_skipping_synth()
+        impl_tool.print_skipping_impl()
+        synth_tool.record_stage(synth_tool.success_status)
+        impl_tool.record_stage(impl_status)
+        return impl_status
 
     synth_tool.print_running_synth()
     impl_tool.print_running_impl()
@@ -200,9 +206,21 @@ def vivado_ooc(design, build_dir, flow_args):
         impl_tool.write_outputs(design, fp)
         synth_tool.write_footer(fp)
 
-    cmd = [str(VIVADO_BIN_PATH), "-mode", "tcl", "-source", str(tcl_path)]
-    proc = synth_tool.exec_and_log(cmd)
+    proc = vivado_server.exec_tcl(synth_tool, tcl_path)
     if proc.returncode:
         raise BfasstException(ImplStatus.ERROR, "Vivado ooc synth/impl flow failed")
 
+    # Implementation ran as part of synthesis, its key depends on the new netlist
+    impl_tool.record_run(
+        impl_tool.get_tool_products(design, impl_tool.check_impl_status),
+        dependencies=impl_tool.get_dependencies(design),
+    )
+    synth_status = synth_tool.check_synth_log(synth_tool.log_path)
+    synth_tool.cache_products(synth_status)
+    impl_tool.cache_products(impl_tool.success_status)
+
+    # Synthesis ran the commands of both tools
+    synth_tool.record_stage(synth_status)
+    impl_tool.record_stage(impl_tool.success_status)
+
     return impl_tool.success_status
@@ -0,0 +1,177 @@
+""" Write a structural Verilog netlist from an EDIF netlist, without Vivado
+
+The EDIF is parsed with SpyDrNet and composed as Verilog, changed to look like the netlists of
+Vivado's write_verilog:
+  - Names that aren't Verilog identifiers are escaped, eg. \\a_reg[0] (EDIF renames them, and
+    SpyDrNet keeps the original names).
+  - The properties of each instance become parameters, except those that Vivado writes as
+    attributes (eg. XLNX_LINE_COL, OPT_INSERTED).
+  - Primitives (the hdi_primitives library) are instantiated, but not defined.
+  - The pins of bus ports are put in Verilog order.  EDIF members (and SpyDrNet pins) are
+    numbered from the left index of the range, eg. member 0 of a[3:0] is a[3], while the
+    Verilog composer takes pin i to be bit i.
+  - The unconnected bits of the bus ports of instances are connected to NLW_*_UNCONNECTED
+    wires, like Vivado does, so the connected bits keep their position (the composer leaves
+    unconnected bits out of concatenations).
+
+The Verilog is then read back with SpyDrNet, and the connections of its pins are compared with
+those of the EDIF netlist (see get_pin_connections).
+"""
+
+import re
+
+import spydrnet as sdn
+
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_$]*")
+
+# Range of a bus port in its EDIF name, eg. a[3:0]
+PORT_RANGE_RE = re.compile(r"\[(\d+):(\d+)\]$")
+
+# Verilog sized literals (eg. 64'h0000000000000008), written as they are rather than as strings
+SIZED_LITERAL_RE = re.compile(r"\d*'[sS]?[bBoOdDhH][0-9a-fA-FxXzZ_?]+")
+
+# Properties that Vivado writes as attributes rather than parameters
+ATTRIBUTE_PREFIXES = ("XLNX_", "XILINX_", "OPT_", "BOX_TYPE")
+
+VERILOG_KEYWORDS = frozenset(
+    (
+        "always assign begin buf case default defparam else end endcase endfunction endmodule "
+        "endtask for function if initial inout input integer module negedge not or output "
+        "parameter posedge reg supply0 supply1 task tri wire xor"
+    ).split()
+)
+
+
+def write_verilog(edif_path, verilog_path):
+    """Write the netlist of an EDIF file as structural Verilog.  Returns the differences between
+    the pin connections of the EDIF netlist and of the Verilog netlist, as read back by
+    SpyDrNet (an empty list if the Verilog is correct)."""
+    netlist = sdn.parse(str(edif_path))
+    definitions = []
+    for library in netlist.libraries:
+        for definition in library.definitions:
+            prepare_ports(definition)
+            if library.name != "hdi_primitives":
+                prepare_definition(definition)
+                definitions.append(definition)
+    connections = get_pin_connections(netlist)
+
+    unconnected_cables = set()
+    for definition in definitions:
+        unconnected_cables.update(connect_unconnected_bits(definition))
+    sdn.compose(netlist, str(verilog_path), write_blackbox=False)
+
+    verilog_connections = get_pin_connections(sdn.parse(str(verilog_path)), unconnected_cables)
+    return [
+        f"{key}: {connections.get(key)} in EDIF, {verilog_connections.get(key)} in Verilog"
+        for key in sorted(connections.keys() | verilog_connections.keys(), key=str)
+        if connections.get(key) != verilog_connections.get(key)
+    ]
+
+
+def prepare_ports(definition):
+    """Remove the ranges from the port names of a definition (primitives included), and reverse
+    the pins of the ports that have a descending range, so that pin i is bit lower_index + i"""
+    for port in definition.ports:
+        match = PORT_RANGE_RE.search(port.name)
+        if match and int(match[1]) > int(match[2]):
+            port.pins = reversed(port.pins)
+        port.name = escape_name(PORT_RANGE_RE.sub("", port.name))
+
+
+def prepare_definition(definition):
+    """Escape the names of a definition and its contents, and convert the EDIF properties of its
+    instances to Verilog parameters and attributes"""
+    definition.name = escape_name(definition.name)
+    for cable in definition.cables:
+        cable.name = escape_name(cable.name)
+
+    for instance in definition.children:
+        instance.name = escape_name(instance.name)
+        parameters = {}
+        attributes = {}
+        for prop in instance.get("EDIF.properties", ()):
+            name = prop.get("original_identifier", prop["identifier"])
+            if name.upper().startswith(ATTRIBUTE_PREFIXES):
+                attributes[name] = format_value(prop["value"])
+            else:
+                parameters[name] = format_value(prop["value"])
+        if parameters:
+            instance["VERILOG.Parameters"] = parameters
+        if attributes:
+            instance["VERILOG.InlineConstraints"] = attributes
+
+
+def escape_name(name):
+    """Name as a Verilog identifier, escaped if needed"""
+    if name.startswith("\\") or (IDENTIFIER_RE.fullmatch(name) and name not in VERILOG_KEYWORDS):
+        return name
+    return "\\" + name
+
+
+def unescape_name(name):
+    return name[1:] if name.startswith("\\") else name
+
+
+def format_value(value):
+    """EDIF property value (bool, int or string) as a Verilog expression"""
+    if isinstance(value, bool):
+        return "1'b1" if value else "1'b0"
+    if isinstance(value, int):
+        return str(value)
+    if SIZED_LITERAL_RE.fullmatch(value):
+        return value
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def connect_unconnected_bits(definition):
+    """Connect the unconnected pins of the partly connected bus ports of the instances of a
+    definition to new NLW_<instance>_<port>_UNCONNECTED cables, one bit per pin.  Returns the
+    names of the new cables."""
+    names = []
+    for instance in definition.children:
+        for port in instance.reference.ports:
+            pins = [instance.pins[pin] for pin in port.pins]
+            unconnected = [pin for pin in pins if pin.wire is None]
+            if len(unconnected) in (0, len(pins)):
+                continue
+            name = escape_name(
+                "_".join(("NLW", unescape_name(instance.name), port.name, "UNCONNECTED"))
+            )
+            cable = definition.create_cable(name=name, is_downto=True)
+            cable.create_wires(len(unconnected))
+            for wire, pin in zip(cable.wires, unconnected):
+                wire.connect_pin(pin)
+            names.append(name)
+    return names
+
+
+def get_pin_connections(netlist, unconnected_cables=()):
+    """Connections of the pins of the ports and instances of each definition of a netlist, as
+    {(definition, instance (None for ports), port, bit): (cable, index)}.  Unconnected pins, and
+    pins on the given cables (eg. NLW_*_UNCONNECTED), are left out."""
+    connections = {}
+    for library in netlist.libraries:
+        for definition in library.definitions:
+            for port in definition.ports:
+                for bit, pin in enumerate(port.pins):
+                    add_pin_connection(
+                        connections, (definition.name, None, port.name, bit), pin.wire
+                    )
+            for instance in definition.children:
+                for port in instance.reference.ports:
+                    for bit, pin in enumerate(port.pins):
+                        add_pin_connection(
+                            connections,
+                            (definition.name, instance.name, port.name, bit),
+                            instance.pins[pin].wire,
+                        )
+    for key in [key for key, (cable, _) in connections.items() if cable in unconnected_cables]:
+        del connections[key]
+    return connections
+
+
+def add_pin_connection(connections, key, wire):
+    if wire is not None:
+        cable = wire.cable
+        connections[key] = (cable.name, cable.lower_index + cable.wires.index(wire))
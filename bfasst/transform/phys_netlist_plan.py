@@ -0,0 +1,296 @@
+""" Plans of the rewrites of XilinxPhysNetlist, made from reads of the design only
+
+The LUTs of each slice are read into Python once (each call into RapidWright goes through
+JPype), and the LUT6_2 that replaces each pair of LUT BELs is planned, with its new INIT.  Reads
+don't change the design, so the sites of each clock region are planned on a thread pool, and
+XilinxPhysNetlist then applies the plans one at a time.
+
+The new INIT of a LUT is its logical INIT with the bits permuted for its physical pin mapping,
+by a table of indices computed once per mapping with NumPy (see get_init_permutation), rather
+than by evaluating its equation.
+"""
+
+import concurrent.futures
+from dataclasses import dataclass
+import functools
+import os
+import re
+
+import numpy as np
+
+from bfasst import jpype_jvm
+from bfasst.utils import property_to_val
+
+# pylint: disable=wrong-import-position,wrong-import-order
+jpype_jvm.start()
+from com.xilinx.rapidwright.device import SiteTypeEnum
+
+# pylint: enable=wrong-import-position,wrong-import-order
+
+# Threads reading the design and planning the rewrites of its sites (see plan_sites).  JPype
+# releases the GIL during calls into Java, so the reads run in parallel.
+NUM_THREADS = int(os.environ.get("BFASST_PHYS_NETLIST_THREADS", "4"))
+
+SLICE_SITE_TYPES = (SiteTypeEnum.SLICEL, SiteTypeEnum.SLICEM)
+
+# Addresses of a 6-input LUT, ie. the bits of its INIT
+LUT_ADDRESSES = np.arange(64, dtype=np.uint64)
+
+LUT_INPUT_RE = re.compile(r"I\d$")
+
+# LUT BELs of a slice, in pairs sharing a LUT6_2, with their output site wires
+LUT_PAIR_BEL_NAMES = (
+    ("A6LUT", "A6LUT_O6", "A5LUT", "A5LUT_O5"),
+    ("B6LUT", "B6LUT_O6", "B5LUT", "B5LUT_O5"),
+    ("C6LUT", "C6LUT_O6", "C5LUT", "C5LUT_O5"),
+    ("D6LUT", "D6LUT_O6", "D5LUT", "D5LUT_O5"),
+)
+
+
+@dataclass
+class LutCell:
+    """A LUT cell (or LUT routethru) of a slice, with the data the transform uses from it.  Each
+    call into RapidWright goes through JPype, so the data is read once, not at each use."""
+
+    cell: object
+    edif_cell_inst: object
+    name: str
+    bel_name: str
+    is_routethru: bool
+    pin_map: dict  # Logical pin -> physical pin
+    cell_type: str
+    init: str  # Logical INIT, None for routethrus
+    const_pins: dict  # Logical input without a physical pin -> constant value (0 or 1)
+
+
+def read_lut_cell(cell, bel_name):
+    """Return the LutCell of a RapidWright Cell placed on a LUT BEL (None if cell is None)"""
+    if cell is None:
+        return None
+
+    pin_map = {}
+    for logical_pin, physical_pins in cell.getPinMappingsL2P().items():
+        assert len(physical_pins) == 1
+        pin_map[str(logical_pin)] = str(next(iter(physical_pins)))
+
+    edif_cell_inst = cell.getEDIFCellInst()
+    is_routethru = bool(cell.isRoutethru())
+    init = None if is_routethru else edif_cell_inst.getProperty("INIT")
+
+    return LutCell(
+        cell=cell,
+        edif_cell_inst=edif_cell_inst,
+        name=str(cell.getName()),
+        bel_name=bel_name,
+        is_routethru=is_routethru,
+        pin_map=pin_map,
+        cell_type=str(edif_cell_inst.getCellType().getName()),
+        init=None if init is None else str(init.getValue()),
+        const_pins={} if is_routethru else read_const_pins(edif_cell_inst, pin_map),
+    )
+
+
+def read_const_pins(edif_cell_inst, pin_map):
+    """Logical inputs of a LUT cell without a physical pin that are tied to GND (0) or VCC (1)"""
+    const_pins = {}
+    for port_inst in edif_cell_inst.getPortInsts():
+        name = str(port_inst.getName())
+        if name in pin_map or not LUT_INPUT_RE.match(name):
+            continue
+        net = port_inst.getNet()
+        if net is not None and (net.isGND() or net.isVCC()):
+            const_pins[name] = int(bool(net.isVCC()))
+    return const_pins
+
+
+@dataclass
+class LutPlan:
+    """Replacement of the cells of a pair of LUT BELs (lut5 may be None) by a LUT6_2 with the
+    given INIT"""
+
+    lut6: LutCell
+    lut5: LutCell
+    init: str
+
+
+@dataclass
+class LutGndPlan:
+    """A LUT6_2 to create for a pair of LUT BELs without cells, that generates GND on the given
+    output pins"""
+
+    site_inst: object
+    pins: list
+
+
+@dataclass
+class CellInfo:
+    """A cell of the design, with its EDIF instance and cell type (None if it has none)"""
+
+    cell: object
+    name: str
+    edif_cell_inst: object
+    cell_type: str
+
+
+def get_clock_region_name(site_inst):
+    region = site_inst.getTile().getClockRegion()
+    return None if region is None else str(region)
+
+
+def map_in_threads(fcn, groups, *args):
+    """Call fcn(group, *args) for each group on NUM_THREADS threads, and return the concatenated
+    results, in the order of the groups"""
+    with concurrent.futures.ThreadPoolExecutor(NUM_THREADS) as pool:
+        futures = [pool.submit(fcn, group, *args) for group in groups]
+        return [item for future in futures for item in future.result()]
+
+
+def plan_sites(sites, gnd_net):
+    """Plan the rewrite of the LUTs of (index, SiteInst) pairs.  Only reads the design, so sites
+    can be planned in parallel.  Returns (site index, LutPlan or LutGndPlan) pairs."""
+    return [
+        (idx, plan)
+        for idx, site_inst in sites
+        if site_inst.getSiteTypeEnum() in SLICE_SITE_TYPES
+        for plan in plan_slice(site_inst, gnd_net)
+    ]
+
+
+def plan_slice(site_inst, gnd_net):
+    """Plan the rewrite of the LUTs of a slice"""
+    lut_pairs, plans = read_slice_luts(site_inst, gnd_net)
+    plans.extend(LutPlan(lut6, lut5, get_lut_init(lut6, lut5)) for lut6, lut5 in lut_pairs)
+    return plans
+
+
+def read_slice_luts(site_inst, gnd_net):
+    """Return the (6LUT, 5LUT) LutCell pairs of a slice (the 5LUT may be None), and the
+    LutGndPlans of its LUTs without cells that generate GND"""
+
+    # One call each for the cells and GND site wires of the site, rather than one per BEL
+    cells_by_bel = {str(bel): cell for bel, cell in site_inst.getCellMap().items()}
+    gnd_site_wires = {str(wire) for wire in site_inst.getSiteWiresFromNet(gnd_net)}
+
+    lut_pairs = []
+    gnd_plans = []
+    for lut6_bel, lut6_pin_out, lut5_bel, lut5_pin_out in LUT_PAIR_BEL_NAMES:
+        lut6_cell = cells_by_bel.get(lut6_bel)
+        lut5_cell = cells_by_bel.get(lut5_bel)
+        gnd_generator_pins = []
+
+        if lut6_pin_out in gnd_site_wires:
+            # If a gnd net, then there can't be a cell there
+            assert lut6_cell is None
+            assert lut5_cell is None
+
+            gnd_generator_pins.append(lut6_pin_out)
+
+        if lut5_pin_out in gnd_site_wires:
+            # If a gnd net, then there can't be a cell there
+            assert lut6_cell is None
+            assert lut5_cell is None
+
+            gnd_generator_pins.append(lut5_pin_out)
+
+        if lut6_cell or lut5_cell:
+            assert lut6_cell is not None
+            lut_pairs.append(
+                (read_lut_cell(lut6_cell, lut6_bel), read_lut_cell(lut5_cell, lut5_bel))
+            )
+        elif gnd_generator_pins:
+            gnd_plans.append(LutGndPlan(site_inst, gnd_generator_pins))
+    return lut_pairs, gnd_plans
+
+
+def read_cells(cells):
+    """Return the CellInfo of cells"""
+    infos = []
+    for cell in cells:
+        edif_cell_inst = cell.getEDIFCellInst()
+        cell_type = str(edif_cell_inst.getCellType().getName()) if edif_cell_inst else None
+        infos.append(CellInfo(cell, str(cell.getName()), edif_cell_inst, cell_type))
+    return infos
+
+
+def read_design_cells(rw_design):
+    """Return the CellInfo of the cells of a design, read in chunks on NUM_THREADS threads"""
+    cells = list(rw_design.getCells())
+    chunk_size = len(cells) // NUM_THREADS + 1
+    return map_in_threads(
+        read_cells, [cells[idx : idx + chunk_size] for idx in range(0, len(cells), chunk_size)]
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_init_permutation(positions, vcc_mask, num_inputs):
+    """Index permutation table of a LUT INIT: entry a is the bit of the logical INIT that gives
+    the value at physical address a.  Logical input j is physical input positions[j], or a
+    constant (None), VCC if bit j of vcc_mask is set and GND otherwise."""
+    addresses = LUT_ADDRESSES[: 1 << num_inputs]
+    table = np.zeros(len(addresses), dtype=np.uint64)
+    for logical, physical in enumerate(positions):
+        if physical is None:
+            table |= np.uint64(vcc_mask & (1 << logical))
+        else:
+            assert physical < num_inputs
+            table |= ((addresses >> np.uint64(physical)) & np.uint64(1)) << np.uint64(logical)
+    table.flags.writeable = False
+    return table
+
+
+def permute_init(init, positions, vcc_mask, num_inputs):
+    """INIT (as an int) of a LUT with num_inputs physical inputs computing the function of a
+    logical INIT, with the inputs given as for get_init_permutation"""
+    table = get_init_permutation(positions, vcc_mask, num_inputs)
+    bits = (np.uint64(init) >> table) & np.uint64(1)
+    return int(np.bitwise_or.reduce(bits << LUT_ADDRESSES[: len(table)]))
+
+
+def get_physical_input(physical_pin):
+    """Index of a physical LUT input: A1 is 0, A6 is 5"""
+    matches = re.match(r"A(\d)$", physical_pin)
+    assert matches
+    return int(matches[1]) - 1
+
+
+def get_lut_inputs(lut):
+    """Logical INIT of a LUT cell (as an int) and where its inputs are, as (init, positions,
+    vcc_mask) for permute_init"""
+
+    # LUT routethrus don't really exist in the EDIF netlist, and as such don't have INIT
+    # strings.  Instead, we just look at which physical input pin is used for the routethrough,
+    # and use the INIT of a buffer on that input.
+    if lut.is_routethru:
+        # Make sure this maps to only one physical pin
+        assert len(lut.pin_map) == 1
+        (physical_pin,) = lut.pin_map.values()
+        return 0b10, (get_physical_input(physical_pin),), 0
+
+    matches = re.match(r"LUT(\d)$", lut.cell_type)
+    assert matches
+
+    positions = []
+    vcc_mask = 0
+    for logical in range(int(matches[1])):
+        logical_pin = f"I{logical}"
+        if logical_pin in lut.pin_map:
+            positions.append(get_physical_input(lut.pin_map[logical_pin]))
+        elif logical_pin in lut.const_pins:
+            positions.append(None)
+            vcc_mask |= lut.const_pins[logical_pin] << logical
+        else:
+            # An unmapped input that isn't constant stays on the physical input of the same index
+            positions.append(logical)
+    return property_to_val(lut.init), tuple(positions), vcc_mask
+
+
+def get_lut_init(lut6, lut5):
+    """INIT property of the LUT6_2 replacing lut6 and lut5 (which may be None).  With a 5LUT, A6
+    is tied to VCC, so the 6LUT function is the upper half of the INIT, and the 5LUT function is
+    the lower half."""
+    if not lut5:
+        return f"64'h{permute_init(*get_lut_inputs(lut6), 6):016X}"
+    return (
+        f"64'h{permute_init(*get_lut_inputs(lut6), 5):08X}"
+        f"{permute_init(*get_lut_inputs(lut5), 5):08X}"
+    )
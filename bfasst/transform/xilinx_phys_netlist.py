@@ -1,35 +1,42 @@
 """ Creates a xilinx netlist that has only physical primitives"""
 
 from fnmatch import fnmatch
-import pathlib
+import os
 import re
-import subprocess
-import sys
 
 from bidict import bidict
 import jpype
 import jpype.imports
 from jpype.types import JInt
 
-from bfasst import jpype_jvm
-from bfasst.config import VIVADO_BIN_PATH
+from bfasst import jpype_jvm, vivado_server
 from bfasst.status import Status, TransformStatus
-from bfasst.tool import ToolProduct
+from bfasst.tool import ToolProduct, tool_stage
 from bfasst.transform.base import TransformTool
+from bfasst.transform.edif_to_verilog import write_verilog
+from bfasst.transform.phys_netlist_plan import (
+    LutGndPlan,
+    get_clock_region_name,
+    map_in_threads,
+    plan_sites,
+    read_design_cells,
+)
 from bfasst.utils import TermColor, print_color
 
 
 # pylint: disable=wrong-import-position,wrong-import-order
 jpype_jvm.start()
-from com.xilinx.rapidwright.device import SiteTypeEnum
 from com.xilinx.rapidwright.design import Design, Unisim
 from com.xilinx.rapidwright.edif import EDIFDirection, EDIFNet, EDIFPropertyValue, EDIFValueType
-from com.xilinx.rapidwright.design.tools import LUTTools
 from java.lang import System
 from java.io import PrintStream, File
 
 # pylint: enable=wrong-import-position,wrong-import-order
 
+# Export the Verilog netlist with Vivado (write_verilog of a checkpoint of the new design), rather
+# than writing it from the EDIF netlist (see edif_to_verilog.py)
+VIVADO_EXPORT = os.environ.get("BFASST_PHYS_NETLIST_VIVADO", "0") != "0"
+
 
 class RapidwrightException(Exception):
     pass
@@ -104,9 +111,15 @@ class XilinxPhysNetlist(TransformTool):
         self.rw_design = None
         self.rw_netlist = None
 
-        # Cell to use for all new LUTs
+        # Cell to use for all new LUTs, and its ports by name
         self.lut6_2_edif_cell = None
+        self.lut6_2_ports = {}
+
+    def get_tool_version(self):
+        # Vivado and edif_to_verilog don't write the same Verilog
+        return vivado_server.get_vivado_version() + (" write_verilog" if VIVADO_EXPORT else "")
 
+    @tool_stage
     def run(self, design):
         """Transform the logical netlist into a netlist with only physical primitives"""
         phys_netlist_verilog_path = design.impl_edif_path.parent / (
@@ -117,19 +130,12 @@ class XilinxPhysNetlist(TransformTool):
         )
         design.impl_netlist_path = phys_netlist_verilog_path
 
-        # Redirect rapidwright output to file
-        System.setOut(PrintStream(File(str(self.work_dir / "rapidwright_stdout.log"))))
-
         # Check for up to date previous run
         status = self.get_prev_run_status(
             tool_products=[
                 ToolProduct(phys_netlist_verilog_path),
             ],
-            dependency_modified_time=max(
-                pathlib.Path(__file__).stat().st_mtime,
-                design.xilinx_impl_checkpoint_path.stat().st_mtime,
-                design.impl_edif_path.stat().st_mtime,
-            ),
+            dependencies=[design.xilinx_impl_checkpoint_path, design.impl_edif_path],
         )
 
         if status is not None:
@@ -147,6 +153,11 @@ class XilinxPhysNetlist(TransformTool):
 
         phys_netlist_checkpoint = self.work_dir / "phys_netlist.dcp"
 
+        # Redirect rapidwright output to file, until it is done (the JVM outlives the design
+        # when workers run several designs)
+        java_stdout = System.out
+        System.setOut(PrintStream(File(str(self.work_dir / "rapidwright_stdout.log"))))
+
         # Catch all Java exceptions since they are not picklable,
         # and so cannot be handled properly by multiprocessing
         # Don't raise from as this is also problematic.
@@ -154,8 +165,14 @@ class XilinxPhysNetlist(TransformTool):
             self.run_rapidwright(design, phys_netlist_checkpoint, phys_netlist_edif_path)
         except jpype.JException as exc:
             raise RapidwrightException(str(exc))  # pylint: disable=raise-missing-from
+        finally:
+            System.out.close()
+            System.setOut(java_stdout)
 
-        status = self.export_new_netlist(phys_netlist_checkpoint, phys_netlist_verilog_path)
+        status = self.export_new_netlist(
+            phys_netlist_checkpoint, phys_netlist_edif_path, phys_netlist_verilog_path
+        )
+        self.cache_products(status)
 
         return status
 
@@ -190,6 +207,9 @@ class XilinxPhysNetlist(TransformTool):
     def run_rapidwright(self, design, phys_netlist_checkpoint, phys_netlist_edif_path):
         """Do all rapidwright related processing on the netlist"""
 
+        # The device of the part is loaded once per process, and reused by readCheckpoint
+        jpype_jvm.get_device()
+
         # Read the checkpoint into rapidwright, and get the netlist
         try:
             self.rw_design = Design.readCheckpoint(
@@ -225,23 +245,18 @@ class XilinxPhysNetlist(TransformTool):
         self.process_all_luts(cells_already_visited)
 
         # Loop through all cells in the design
-        for cell in self.rw_design.getCells():
-            edif_cell_inst = cell.getEDIFCellInst()
-
-            self.log_color(
-                TermColor.RED,
-                cell.getName(),
-                f"({edif_cell_inst.getCellType().getName() if edif_cell_inst else 'None'})",
-            )
+        for info in read_design_cells(self.rw_design):
+            cell = info.cell
+            cell_type = info.cell_type
+            self.log_color(TermColor.RED, info.name, f"({cell_type})")
 
-            if edif_cell_inst is None:
+            if info.edif_cell_inst is None:
                 self.log("  Skipping")
                 continue
 
             if cell in cells_already_visited:
                 continue
 
-            cell_type = edif_cell_inst.getCellType().getName()
             if cell_type in ("MUXF7", "MUXF8"):
                 cells_to_remove.extend(self.process_muxf7_muxf8(cell))
                 continue
@@ -268,69 +283,69 @@ class XilinxPhysNetlist(TransformTool):
         # Remove old unusued cells
         self.log("Removing old cells...")
         for cell in cells_to_remove:
-            self.log("  ", cell.getName())
+            self.log_debug("  ", cell.getName())
             edif_cell_inst = cell.getEDIFCellInst()
 
             # Remove the port instances
             edif_cell_inst.getParentCell().removeCellInst(edif_cell_inst)
 
-        # Export checkpoint, then run vivado to generate a new netlist
-        self.rw_design.unplaceDesign()
-        self.rw_design.writeCheckpoint(phys_netlist_checkpoint)
+        # Export checkpoint, for vivado to generate the new netlist from
+        if VIVADO_EXPORT:
+            self.rw_design.unplaceDesign()
+            self.rw_design.writeCheckpoint(phys_netlist_checkpoint)
 
         self.log_color(TermColor.BLUE, "\nWriting EDIF phsyical netlist:", phys_netlist_edif_path)
         self.rw_netlist.exportEDIF(phys_netlist_edif_path)
 
     def process_all_luts(self, cells_already_visited):
-        """Visit all LUTs and replace them with LUT6_2 instances"""
+        """Visit all LUTs and replace them with LUT6_2 instances.  The rewrites are planned for
+        the sites of each clock region in parallel, then applied one at a time, in site order
+        (the netlist is shared, and the new cells and nets are created in the top cell)."""
 
         # Get the LUT6_2 EDIFCell
         self.lut6_2_edif_cell = self.rw_netlist.getHDIPrimitive(Unisim.LUT6_2)
+        self.lut6_2_ports = {str(port.getName()): port for port in self.lut6_2_edif_cell.getPorts()}
 
-        for site_inst in self.rw_design.getSiteInsts():
-            if site_inst.getSiteTypeEnum() not in (SiteTypeEnum.SLICEL, SiteTypeEnum.SLICEM):
-                continue
-
-            lut_pair_bel_names = [
-                ("A6LUT", "A6LUT_O6", "A5LUT", "A5LUT_O5"),
-                ("B6LUT", "B6LUT_O6", "B5LUT", "B5LUT_O5"),
-                ("C6LUT", "C6LUT_O6", "C5LUT", "C5LUT_O5"),
-                ("D6LUT", "D6LUT_O6", "D5LUT", "D5LUT_O5"),
-            ]
-
-            gnd_nets = site_inst.getSiteWiresFromNet(self.rw_design.getGndNet())
-
-            for lut6_bel, lut6_pin_out, lut5_bel, lut5_pin_out in lut_pair_bel_names:
-                lut6_cell = site_inst.getCell(lut6_bel)
-                lut5_cell = site_inst.getCell(lut5_bel)
-                gnd_generator_pins = []
-
-                if lut6_pin_out in gnd_nets:
-                    # If a gnd net, then there can't be a cell there
-                    assert lut6_cell is None
-                    assert lut5_cell is None
-
-                    gnd_generator_pins.append(lut6_pin_out)
-
-                if lut5_pin_out in gnd_nets:
-                    # If a gnd net, then there can't be a cell there
-                    assert lut6_cell is None
-                    assert lut5_cell is None
+        sites_by_region = {}
+        for idx, site_inst in enumerate(self.rw_design.getSiteInsts()):
+            sites_by_region.setdefault(get_clock_region_name(site_inst), []).append(
+                (idx, site_inst)
+            )
+        plans = map_in_threads(plan_sites, sites_by_region.values(), self.rw_design.getGndNet())
+        self.log(f"Planned {len(plans)} LUT rewrites in {len(sites_by_region)} clock regions")
 
-                    gnd_generator_pins.append(lut5_pin_out)
+        for _, plan in sorted(plans, key=lambda idx_plan: idx_plan[0]):
+            if isinstance(plan, LutGndPlan):
+                self.process_lut_gnd(plan.site_inst, plan.pins)
+                continue
 
-                if lut6_cell or lut5_cell:
-                    self.process_lut(lut6_cell, lut5_cell)
-                elif gnd_generator_pins:
-                    self.process_lut_gnd(site_inst, gnd_generator_pins)
+            self.process_lut(plan)
+            cells_already_visited.add(plan.lut6.cell)
+            if plan.lut5:
+                cells_already_visited.add(plan.lut5.cell)
 
-                if lut6_cell:
-                    cells_already_visited.add(lut6_cell)
-                if lut5_cell:
-                    cells_already_visited.add(lut5_cell)
+    def export_new_netlist(
+        self, phys_netlist_checkpoint, phys_netlist_edif_path, phys_netlist_verilog_path
+    ):
+        """Export the new netlist to a Verilog netlist file, from the EDIF netlist (checked by
+        reading it back), or with Vivado from the checkpoint if VIVADO_EXPORT is set"""
 
-    def export_new_netlist(self, phys_netlist_checkpoint, phys_netlist_verilog_path):
-        """Export the new netlist to a Verilog netlist file"""
+        if not VIVADO_EXPORT:
+            self.log_color(
+                TermColor.BLUE, "\nWriting new netlist from EDIF:", phys_netlist_verilog_path
+            )
+            differences = write_verilog(phys_netlist_edif_path, phys_netlist_verilog_path)
+            if differences:
+                self.log("Pins connected differently in the Verilog netlist:")
+                for difference in differences:
+                    self.log("  ", difference)
+                return Status(
+                    TransformStatus.ERROR,
+                    f"{len(differences)} pins connected differently in the Verilog netlist "
+                    "(BFASST_PHYS_NETLIST_VIVADO=1 writes it with Vivado)",
+                )
+            self.log("Exported new netlist to", phys_netlist_verilog_path)
+            return self.success_status
 
         self.log_color(
             TermColor.BLUE, "\nUsing Vivado to create new netlist:", phys_netlist_verilog_path
@@ -338,30 +353,13 @@ class XilinxPhysNetlist(TransformTool):
 
         vivado_tcl_path = self.work_dir / "vivado_checkpoint_to_netlist.tcl"
         with open(vivado_tcl_path, "w") as fp:
+            fp.write(f"open_checkpoint {phys_netlist_checkpoint}\n")
             fp.write(f"write_verilog -force {phys_netlist_verilog_path}\n")
             fp.write("exit\n")
 
         vivado_log_path = self.work_dir / "vivado_edf_to_v.txt"
         with open(vivado_log_path, "w") as fp:
-            proc = subprocess.Popen(
-                [
-                    VIVADO_BIN_PATH,
-                    phys_netlist_checkpoint,
-                    "-mode",
-                    "batch",
-                    "-source",
-                    vivado_tcl_path,
-                ],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-            )
-            for line in proc.stdout:
-                sys.stdout.write(line)
-                sys.stdout.flush()
-                fp.write(line)
-                fp.flush()
-            proc.communicate()
+            proc = vivado_server.exec_tcl(self, vivado_tcl_path, fp=fp)
             if proc.returncode:
                 return Status(TransformStatus.ERROR)
 
@@ -478,7 +476,7 @@ class XilinxPhysNetlist(TransformTool):
         bufgctrl.addProperty("PRESELECT_I1", "FALSE")
 
         # Copy pins
-        self.log(f"  Copying pins from {bufg_cell.getName()}")
+        self.log_debug(f"  Copying pins from {bufg_cell.getName()}")
 
         for pins in bufg_cell.getPinMappingsL2P().items():
             self.valid_net_transfer(*pins, bufg_edif_inst, bufgctrl)
@@ -512,24 +510,25 @@ class XilinxPhysNetlist(TransformTool):
         self.log("Created new cell", new_cell_name)
 
         for pin_out in pins:
-            self.log("Processing GND output pin", pin_out)
+            self.log_debug("Processing GND output pin", pin_out)
 
             # Create a new net to replace the global ground
             new_net_name = str(site_inst.getName()) + "." + pin_out + ".GND"
-            self.log("  Creating new GND net", new_net_name)
+            self.log_debug("  Creating new GND net", new_net_name)
             new_net = EDIFNet(new_net_name, self.rw_design.getTopEDIFCell())
 
             # Drive net using LUT output port
             lut_out_port = new_cell_inst.getPort("O6" if pin_out.endswith("O6") else "O5")
-            self.log("  Connecting new net to LUT output port", lut_out_port.getName())
+            self.log_debug("  Connecting new net to LUT output port", lut_out_port.getName())
             assert lut_out_port
             new_net.createPortInst(lut_out_port, new_cell_inst)
 
             # Loop through ports this GND net needs to drive and connect them up
             for pin_in in site_inst.getSiteWirePins(pin_out):
-                cell = site_inst.getCell(pin_in.getBEL())
+                bel = pin_in.getBEL()
+                cell = site_inst.getCell(bel)
                 if cell:
-                    self.log(" ", pin_in, pin_in.getBEL(), site_inst.getCell(pin_in.getBEL()))
+                    self.log_debug(" ", pin_in, bel, cell)
                     routed_to_cell_inst = cell.getEDIFCellInst()
 
                     # Map physical pin back to logical netlist port name
@@ -556,34 +555,35 @@ class XilinxPhysNetlist(TransformTool):
                     else:
                         new_net.createPortInst(routed_to_port_inst.getPort(), routed_to_cell_inst)
 
-    def process_lut(self, lut6_cell, lut5_cell):
-        """This function takes a LUT* from the netlist and replaces with with a LUT6_2
-        with logical mapping equal to the physical mapping."""
+    def process_lut(self, plan):
+        """This function takes a LUT* from the netlist (as a LutPlan) and replaces with with a
+        LUT6_2 with logical mapping equal to the physical mapping."""
 
-        assert lut6_cell is not None
+        lut6 = plan.lut6
+        lut5 = plan.lut5
+        assert lut6 is not None
         self.log_color(
             TermColor.BLUE,
             "\nProcessing and replacing LUT(s):",
             ",".join(
-                str(lut_cell) + ("(routethru)" if lut_cell.isRoutethru() else "")
-                for lut_cell in (lut6_cell, lut5_cell)
-                if lut_cell is not None
+                str(lut.cell) + ("(routethru)" if lut.is_routethru else "")
+                for lut in (lut6, lut5)
+                if lut is not None
             ),
         )
-        lut6_edif_cell_inst = lut6_cell.getEDIFCellInst()
+        lut6_edif_cell_inst = lut6.edif_cell_inst
         assert lut6_edif_cell_inst
+        lut6_edif_cell_inst_name = str(lut6_edif_cell_inst.getName())
 
         #### Get name for new LUT6_2 cell
-        new_cell_name = lut6_edif_cell_inst.getName() + "_phys"
+        new_cell_name = lut6_edif_cell_inst_name + "_phys"
 
         # Routethru only?
-        if lut6_cell.isRoutethru() and (lut5_cell is None or lut5_cell.isRoutethru()):
+        if lut6.is_routethru and (lut5 is None or lut5.is_routethru):
             # Suffix routethru as _RT(ABCD)
-            new_cell_name = (
-                lut6_edif_cell_inst.getName() + "_routethru_" + str(lut6_cell.getBEL().getName())[0]
-            )
+            new_cell_name = lut6_edif_cell_inst_name + "_routethru_" + lut6.bel_name[0]
 
-        if lut5_cell:
+        if lut5:
             new_cell_name += "_shared"
 
         #### Create the new LUT6_2 instance
@@ -599,34 +599,26 @@ class XilinxPhysNetlist(TransformTool):
         #### Wire up inputs/outputs
         physical_pins_to_nets = {}
 
-        self.log(f"Processing LUT {lut6_cell.getName()}")
-        for logical_pin, physical_pin in lut6_cell.getPinMappingsL2P().items():
-            assert len(physical_pin) == 1
-            physical_pin = list(physical_pin)[0]
-
+        self.log(f"Processing LUT {lut6.name}")
+        for logical_pin, physical_pin in lut6.pin_map.items():
             port_inst = lut6_edif_cell_inst.getPortInst(logical_pin)
             assert port_inst
-            physical_pins_to_nets[physical_pin] = port_inst.getNet()
 
-            self.lut_move_net_to_new_cell(
-                lut6_edif_cell_inst, new_cell_inst, logical_pin, physical_pin
+            physical_pins_to_nets[physical_pin] = self.lut_move_net_to_new_cell(
+                port_inst, new_cell_inst, logical_pin, physical_pin
             )
 
         # Now do the same for the other LUT
-        if lut5_cell:
-            self.log(f"Processing LUT {lut5_cell.getName()}")
-            for logical_pin, physical_pin in lut5_cell.getPinMappingsL2P().items():
-                assert len(physical_pin) == 1
-                physical_pin = list(physical_pin)[0]
-
-                lut5_edif_cell_inst = lut5_cell.getEDIFCellInst()
-                port_inst = lut5_edif_cell_inst.getPortInst(logical_pin)
+        if lut5:
+            self.log(f"Processing LUT {lut5.name}")
+            for logical_pin, physical_pin in lut5.pin_map.items():
+                port_inst = lut5.edif_cell_inst.getPortInst(logical_pin)
                 assert port_inst
 
                 # Disconnect net from logical pin on old cell,
                 # and connect to new logical pin (based on physical pin) of new cell
                 self.lut_move_net_to_new_cell(
-                    lut5_edif_cell_inst,
+                    port_inst,
                     new_cell_inst,
                     logical_pin,
                     physical_pin,
@@ -634,54 +626,46 @@ class XilinxPhysNetlist(TransformTool):
                 )
 
         # Connect up remaining inputs to VCC
-        for logical_port in XilinxPhysNetlist.STD_PIN_MAP_BY_CELL["LUT6_2"]:
-            if logical_port.startswith("I"):
-                port = new_cell_inst.getPortInst(logical_port)
-                if not port:
-                    self.vcc_edif_net.createPortInst(
-                        new_cell_inst.getPort(logical_port), new_cell_inst
-                    )
+        used_physical_pins = set(lut6.pin_map.values()).union(lut5.pin_map.values() if lut5 else ())
+        for logical_port, physical_pin in XilinxPhysNetlist.STD_PIN_MAP_BY_CELL["LUT6_2"].items():
+            if logical_port.startswith("I") and physical_pin not in used_physical_pins:
+                self.vcc_edif_net.createPortInst(self.lut6_2_ports[logical_port], new_cell_inst)
 
         # If old cell is a LUT route through some extra processing is required.
         # LUT route through cells don't exist in the original netlist (the original net
         # goes straight to the FF), so now that the net is going to stop at the LUT input,
         # a new net is needed to connect LUT output to FF
-        if lut6_cell.isRoutethru():
-            self.create_lut_routethru_net(lut6_cell, False, new_cell_inst)
-        if lut5_cell and lut5_cell.isRoutethru():
-            self.create_lut_routethru_net(lut5_cell, True, new_cell_inst)
+        if lut6.is_routethru:
+            self.create_lut_routethru_net(lut6, False, new_cell_inst)
+        if lut5 and lut5.is_routethru:
+            self.create_lut_routethru_net(lut5, True, new_cell_inst)
 
-        # Fix the new LUT INIT property based on the new pin mappings
-        self.process_lut_init(lut6_cell, lut5_cell, new_cell_inst)
+        # Set the new LUT INIT property, planned from the new pin mappings
+        self.log_debug("  New LUT INIT:", plan.init)
+        new_cell_inst.addProperty("INIT", plan.init)
 
         # Return the cells to be removed
         cells_to_remove = []
-        if not lut6_cell.isRoutethru():
-            cells_to_remove.append(lut6_cell)
-        if lut5_cell and not lut5_cell.isRoutethru():
-            cells_to_remove.append(lut5_cell)
+        if not lut6.is_routethru:
+            cells_to_remove.append(lut6.cell)
+        if lut5 and not lut5.is_routethru:
+            cells_to_remove.append(lut5.cell)
         return cells_to_remove
 
-    def create_lut_routethru_net(self, cell, is_lut5, new_lut_cell):
+    def create_lut_routethru_net(self, lut, is_lut5, new_lut_cell):
         """Extra processing for LUT route through.  Need to create a new net
         connecting from the new LUT6_2 instance to the FF"""
 
-        self.log("Creating routethru for", cell.getName())
+        self.log("Creating routethru for", lut.name)
 
         # Create the new net
-        new_net_name = (
-            cell.getName()
-            + "_routethru_"
-            + str(cell.getBEL().getName())[0]
-            + ("6" if not is_lut5 else "5")
-        )
-        self.log("  Creating new net", new_net_name)
-        new_net = EDIFNet(new_net_name, cell.getEDIFCellInst().getParentCell())
+        new_net_name = lut.name + "_routethru_" + lut.bel_name[0] + ("6" if not is_lut5 else "5")
+        self.log_debug("  Creating new net", new_net_name)
+        new_net = EDIFNet(new_net_name, lut.edif_cell_inst.getParentCell())
 
         # Connect net to LUT output
-        lut_out_port = new_lut_cell.getPort("O5" if is_lut5 else "O6")
-        assert lut_out_port
-        self.log(
+        lut_out_port = self.lut6_2_ports["O5" if is_lut5 else "O6"]
+        self.log_debug(
             "  Connecting new net to LUT", new_lut_cell.getName(), "port", lut_out_port.getName()
         )
         new_net.createPortInst(lut_out_port, new_lut_cell)
@@ -689,8 +673,8 @@ class XilinxPhysNetlist(TransformTool):
         # Connect net to the input of the other cell in this site (FF, CARRY4)
         matching_cells = [
             other_cell
-            for other_cell in cell.getSiteInst().getCells()
-            if other_cell.getName() == cell.getName() and not other_cell.isRoutethru()
+            for other_cell in lut.cell.getSiteInst().getCells()
+            if str(other_cell.getName()) == lut.name and not other_cell.isRoutethru()
         ]
         assert len(matching_cells) == 1
         routed_to_cell = matching_cells[0]
@@ -700,16 +684,15 @@ class XilinxPhysNetlist(TransformTool):
         # Even though we are calling the gePinMappingsL2P on the LUT cell,
         # it doesn't actually return the logical pin on the LUT, but rather
         # the downstream cell (FF, CARRY4).
-        logical_pins = list(cell.getPinMappingsL2P().keys())
-        assert len(logical_pins) == 1
-        routed_to_port_name = str(logical_pins[0])
+        assert len(lut.pin_map) == 1
+        (routed_to_port_name,) = lut.pin_map
 
         routed_to_port_inst = routed_to_cell_inst.getPortInst(routed_to_port_name)
         assert routed_to_port_inst
 
-        self.log(
+        self.log_debug(
             "  Connecting new net to BEL",
-            routed_to_cell.getBEL().getName(),
+            routed_to_cell.getBELName(),
             ", port",
             routed_to_port_name,
         )
@@ -723,34 +706,35 @@ class XilinxPhysNetlist(TransformTool):
 
     def lut_move_net_to_new_cell(
         self,
-        old_edif_cell_inst,
+        port_inst,
         new_edif_cell_inst,
         old_logical_pin,
         physical_pin,
         already_connected_net=None,
     ):
-        """This function connects the net from old_edif_cell_inst/old_logical_pin,
+        """This function connects the net of port_inst (old_logical_pin of the old cell),
         to the appropriate logical pin on the new_edif_cell_inst, based on the physical pin,
         and disconnects from the old cell.  It's possible the net is already_connected to the
-        new cell, in which case only the disconnect from old cell needs to be performed."""
+        new cell, in which case only the disconnect from old cell needs to be performed.
+        Returns the net."""
 
-        self.log(f"  Processing logical pin {old_logical_pin}, physical pin {physical_pin}")
+        self.log_debug(f"  Processing logical pin {old_logical_pin}, physical pin {physical_pin}")
 
-        port_inst = old_edif_cell_inst.getPortInst(old_logical_pin)
         logical_net = port_inst.getNet()
         assert logical_net
 
         if already_connected_net:
             assert logical_net == already_connected_net
-            self.log(f"    Skipping already connected physical pin {physical_pin}")
+            self.log_debug(f"    Skipping already connected physical pin {physical_pin}")
 
         else:
-            if port_inst.getDirection() == EDIFDirection.INPUT:
-                self.log("    Input driven by net", logical_net)
+            direction = port_inst.getDirection()
+            if direction == EDIFDirection.INPUT:
+                self.log_debug("    Input driven by net", logical_net)
 
                 # A5 becomes I4, A1 becomes I0, etc.
-                new_logical_pin = "I" + str(int(str(physical_pin[1])) - 1)
-                self.log(
+                new_logical_pin = "I" + str(int(physical_pin[1]) - 1)
+                self.log_debug(
                     "    Connecting net",
                     logical_net,
                     "to input pin",
@@ -758,89 +742,20 @@ class XilinxPhysNetlist(TransformTool):
                     "on new cell",
                 )
 
-            elif port_inst.getDirection() == EDIFDirection.OUTPUT:
-                self.log("    Drives net", logical_net)
+            elif direction == EDIFDirection.OUTPUT:
+                self.log_debug("    Drives net", logical_net)
 
                 new_logical_pin = physical_pin
-                self.log("    Connecting net", logical_net, "to output pin", new_logical_pin)
+                self.log_debug("    Connecting net", logical_net, "to output pin", new_logical_pin)
 
-            new_port = new_edif_cell_inst.getPort(new_logical_pin)
-            assert new_port
-            logical_net.createPortInst(new_port, new_edif_cell_inst)
+            logical_net.createPortInst(self.lut6_2_ports[new_logical_pin], new_edif_cell_inst)
 
         # Disconnect connection to port on old cell
-        self.log("    Disconnecting net", logical_net, "from pin", old_logical_pin, "on old cell")
+        self.log_debug(
+            "    Disconnecting net", logical_net, "from pin", old_logical_pin, "on old cell"
+        )
         logical_net.removePortInst(port_inst)
-
-    def process_lut_eqn(self, cell, is_lut5):
-        """Transform a logical lut equation into a physical lut equation"""
-
-        s6_or_5 = "5" if is_lut5 else "6"
-
-        # The process is different for LUT routethrus as they don't really exist
-        # in the EDIF netlist, and as such don't have equations or INIT strings.
-        # Instead, we just look at which physical input pin is used for the
-        # routethrough and generate a simple O=I<X> equation
-        if cell.isRoutethru():
-            assert len(cell.getPinMappingsL2P()) == 1
-            physical_pins = list(list(cell.getPinMappingsL2P().values())[0])
-
-            # Make sure this maps to only one physical pion
-            assert len(physical_pins) == 1
-            physical_pin = str(physical_pins[0])
-            eqn = "O=I" + str(int(physical_pin[1]) - 1)
-            self.log(
-                f"  LUT{s6_or_5} is routethru using physical pin {physical_pin}, creating eqn {eqn}"
-            )
-            return eqn
-
-        # First get an equation from the logical INIT string
-        orig_init_eqn = str(LUTTools.getLUTEquation(cell))
-
-        self.log(f"  LUT{s6_or_5} INIT:", cell.getProperty("INIT"))
-        self.log(f"  LUT{s6_or_5} equation:", orig_init_eqn)
-
-        eqn = orig_init_eqn
-        for logical_pin, physical_pin in cell.getPinMappingsL2P().items():
-            # Skip the output pin
-            if str(physical_pin).startswith("[O"):
-                continue
-
-            matches = re.match(r"\[A(\d)\]", str(physical_pin))
-            assert matches
-
-            # A5 becomes I4, A1 becomes I0, etc, so subtract 1, but
-            # don't replace A with I yet, until all replacements are done.
-            physical_pin = int(matches[1]) - 1
-
-            eqn = eqn.replace(str(logical_pin), "A" + str(physical_pin))
-
-        # Physical LUT inputs use A#, but LUTTools expect I#
-        eqn = eqn.replace("A", "I")
-
-        self.log(f"  New LUT{s6_or_5} eqn:", eqn)
-        return eqn
-
-    def process_lut_init(self, lut6_cell, lut5_cell, new_cell_inst):
-        """Fix the LUT INIT property for the new_cell_inst"""
-
-        self.log("Fixing INIT string")
-
-        lut6_eqn_phys = self.process_lut_eqn(lut6_cell, False)
-
-        if lut5_cell:
-            lut5_eqn_phys = self.process_lut_eqn(lut5_cell, True)
-
-        if not lut5_cell:
-            init_str = "64'h" + LUTTools.getLUTInitFromEquation(lut6_eqn_phys, 6)[4:].zfill(16)
-        else:
-            init_str = (
-                "64'h"
-                + LUTTools.getLUTInitFromEquation(lut6_eqn_phys, 5)[4:].zfill(8)
-                + LUTTools.getLUTInitFromEquation(lut5_eqn_phys, 5)[4:].zfill(8)
-            )
-        self.log("  New LUT INIT:", init_str)
-        new_cell_inst.addProperty("INIT", init_str)
+        return logical_net
 
     def cell_is_6lut(self, cell):
         """Return whether this cell is using the 6LUT BEL"""
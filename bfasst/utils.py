@@ -74,6 +74,56 @@ def print_tcl_cmd_catch(fp, cmd, return_code=1):
     fp.write("if { [catch { " + cmd + " } ] } { exit " + str(return_code) + " }\n")
 
 
+# Sized Verilog literal (eg. 64'h0123, 1'b0, 16'd99), and the base of each radix
+VERILOG_LITERAL_RE = re.compile(r"\d+'([dbh])([0-9a-fA-F]+)")
+VERILOG_LITERAL_BASES = {"d": 10, "b": 2, "h": 16}
+VERILOG_BOOLEANS = {"TRUE": 1, "FALSE": 0}
+
+
+def property_to_val(prop):
+    """Convert a Verilog property string to an integer, if possible
+
+    >>> property_to_val("8'he9")
+    233
+    >>> property_to_val("TRUE")
+    1
+    >>> property_to_val("SYNC")
+    'SYNC'
+    """
+
+    # Not a string? just return the prop
+    if not isinstance(prop, str):
+        return prop
+
+    # Try to convert to int
+    try:
+        prop = int(prop)
+        return prop
+    except ValueError:
+        pass
+
+    # Decimal, binary or hex literal
+    matches = VERILOG_LITERAL_RE.match(prop)
+    if matches:
+        try:
+            return int(matches.group(2), VERILOG_LITERAL_BASES[matches.group(1)])
+        except ValueError:
+            return prop
+
+    return VERILOG_BOOLEANS.get(prop.upper(), prop)
+
+
+def normalize_properties(properties, prop_names):
+    """Return a hashable tuple of the named properties converted with property_to_val,
+    suitable for comparing or indexing cells by their properties.  Missing properties are None.
+
+    >>> normalize_properties({"INIT": "64'h00000000000000E8"}, ("INIT",))
+    (232,)
+    """
+    properties = properties or {}
+    return tuple(property_to_val(properties.get(prop)) for prop in prop_names)
+
+
 def properties_are_equal(prop1, prop2):
     """Compare Verilog property strings for equivalence
 
@@ -87,33 +137,4 @@ def properties_are_equal(prop1, prop2):
     True
     """
 
-    def convert_to_val(prop):
-        # Not a string? just return the prop
-        if not isinstance(prop, str):
-            return prop
-
-        # Try to convert to int
-        try:
-            prop = int(prop)
-            return prop
-        except ValueError:
-            pass
-
-        # Decimal literal
-        matches = re.match(r"\d+'d(\d+)", prop)
-        if matches:
-            return int(matches.group(1))
-
-        # Binary literal
-        matches = re.match(r"\d+'b([01]+)", prop)
-        if matches:
-            return int(matches.group(1), 2)
-
-        # Hex literal
-        matches = re.match(r"\d+'h([0-9a-fA-F]+)", prop)
-        if matches:
-            return int(matches.group(1), 16)
-
-        return prop
-
-    return convert_to_val(prop1) == convert_to_val(prop2)
+    return property_to_val(prop1) == property_to_val(prop2)
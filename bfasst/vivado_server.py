@@ -0,0 +1,251 @@
+""" Long-lived Vivado process that runs Tcl jobs, to avoid paying Vivado startup for every step
+
+Each process that runs Vivado jobs (eg. each worker of run_experiment.py, so one per -j) starts
+a single Vivado in Tcl mode the first time it needs one, and feeds it jobs over stdin.  A job
+sources a Tcl script, in the work directory of the tool, and then every open design and project
+is closed, so jobs don't see each other's designs.  Scripts are written as for a one-shot
+Vivado: `exit` is redefined in the server to only end the script, and its status is reported
+back after a marker line.
+
+If the server is disabled (BFASST_VIVADO_SERVER=0), or can't be started, each job runs in a new
+Vivado process instead.  So do jobs started while the server is busy with a job of another thread
+(eg. a concurrent flow_graph stage).
+"""
+
+import collections
+import multiprocessing.util
+import os
+import pathlib
+import selectors
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+
+from bfasst.config import VIVADO_COMMAND
+from bfasst.process_runner import (
+    READ_SIZE,
+    LineReader,
+    ResourceUsage,
+    get_process_group_usage,
+    kill_process_group,
+)
+from bfasst.utils import TermColor, print_color
+
+ENABLED = os.environ.get("BFASST_VIVADO_SERVER", "1") != "0"
+
+# Seconds to wait for Vivado to start, and to exit when the server is closed
+STARTUP_TIMEOUT = 300.0
+SHUTDOWN_TIMEOUT = 30.0
+
+# Printed by the server once it is set up, and after each job.  The Tcl below builds them with
+# join, so they can't be matched by Vivado echoing the commands.
+READY_MARKER = "BFASST_VIVADO_READY"
+JOB_DONE_MARKER = "BFASST_JOB_DONE"
+
+SERVER_SETUP_TCL = """\
+rename exit bfasst_exit
+proc exit {{status 0}} { set ::bfasst_exit_status $status; return -code return }
+puts "[join {BFASST VIVADO READY} _]"
+flush stdout
+"""
+
+JOB_TCL = """\
+set ::bfasst_exit_status 0
+if {{[catch {{cd {{{cwd}}}; source -notrace {{{tcl_path}}}}} bfasst_msg] == 1}} {{
+    puts "ERROR: $bfasst_msg"
+    set ::bfasst_exit_status 1
+}}
+catch {{close_project -quiet}}
+foreach bfasst_design [get_designs -quiet] {{
+    catch {{current_design $bfasst_design; close_design}}
+}}
+puts "[join {{BFASST JOB DONE}} _] $::bfasst_exit_status"
+flush stdout
+"""
+
+
+@dataclass
+class TclJobResult:
+    """Outcome of a Tcl job run by a VivadoServer"""
+
+    returncode: int
+    resource_usage: ResourceUsage
+
+
+class VivadoServer:
+    """A Vivado process running in Tcl mode, which runs one Tcl job at a time"""
+
+    def __init__(self, cmd=None):
+        self.proc = subprocess.Popen(
+            VIVADO_COMMAND if cmd is None else cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.proc.stdout, selectors.EVENT_READ)
+        self.lines = collections.deque()
+        self.reader = LineReader(self.lines.append)
+        self.output_closed = False
+
+        self.send(SERVER_SETUP_TCL)
+        if self.read_until(READY_MARKER, lambda line: None, STARTUP_TIMEOUT) is None:
+            self.kill()
+            raise OSError("Vivado server exited before it was ready")
+
+    @property
+    def alive(self):
+        return self.proc.poll() is None and not self.output_closed
+
+    def run(self, tcl_path, cwd, on_output, timeout=None):
+        """Source a Tcl script in Vivado, with cwd as the working directory, calling
+        on_output(line) for each line of output.  Returns a TclJobResult.  If the job takes more
+        than timeout seconds, Vivado is killed and subprocess.TimeoutExpired is raised."""
+        start_time = time.monotonic()
+        start_cpu_time, _ = get_process_group_usage(self.proc.pid)
+
+        try:
+            self.send(JOB_TCL.format(cwd=cwd, tcl_path=tcl_path))
+            status = self.read_until(JOB_DONE_MARKER, on_output, timeout)
+        except BaseException:
+            # The state of Vivado is unknown, don't reuse it
+            self.kill()
+            raise
+
+        if status is None:
+            on_output("ERROR: Vivado server exited unexpectedly\n")
+            returncode = 1
+        else:
+            returncode = int(status)
+
+        cpu_time, max_rss_kb = get_process_group_usage(self.proc.pid)
+        usage = ResourceUsage(
+            wall_time=time.monotonic() - start_time,
+            user_time=max(cpu_time - start_cpu_time, 0.0),
+            system_time=0.0,
+            max_rss_kb=max_rss_kb,
+        )
+        return TclJobResult(returncode, usage)
+
+    def send(self, tcl):
+        try:
+            self.proc.stdin.write(tcl.encode())
+            self.proc.stdin.flush()
+        except BrokenPipeError:
+            self.output_closed = True
+
+    def read_until(self, marker, on_output, timeout=None):
+        """Pass lines of output to on_output until a line containing marker, and return the rest
+        of that line.  Returns None if Vivado exits first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            while self.lines:
+                line = self.lines.popleft()
+                if marker in line:
+                    return line.split(marker, 1)[1].strip()
+                on_output(line)
+
+            if self.output_closed:
+                return None
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise subprocess.TimeoutExpired(VIVADO_COMMAND, timeout)
+            if self.selector.select(remaining):
+                data = os.read(self.proc.stdout.fileno(), READ_SIZE)
+                self.reader.feed(data)
+                self.output_closed = not data
+
+    def close(self):
+        """Ask Vivado to exit, and kill it if it doesn't"""
+        if self.proc.stdin.closed:
+            return
+        self.send("bfasst_exit\n")
+        try:
+            self.proc.wait(SHUTDOWN_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            pass
+        self.kill()
+
+    def kill(self):
+        if self.proc.stdin.closed:
+            return
+        kill_process_group(self.proc)
+        self.selector.close()
+        self.proc.stdin.close()
+        self.proc.stdout.close()
+        self.output_closed = True
+
+
+_SERVER = None
+_SERVER_FAILED = False
+_SERVER_LOCK = threading.Lock()
+
+
+def get_server():
+    """Return the Vivado server of this process, starting it if needed.  Returns None if the
+    server is disabled or failed to start."""
+    global _SERVER, _SERVER_FAILED  # pylint: disable=global-statement
+
+    if not ENABLED or _SERVER_FAILED:
+        return None
+    if _SERVER is not None:
+        if _SERVER.alive:
+            return _SERVER
+        _SERVER.kill()
+
+    try:
+        _SERVER = VivadoServer()
+    except OSError as e:
+        print_color(TermColor.YELLOW, "Vivado server unavailable, running Vivado per job:", e)
+        _SERVER_FAILED = True
+        return None
+
+    # Runs at exit of the main process, and of multiprocessing workers (which skip atexit)
+    multiprocessing.util.Finalize(_SERVER, _SERVER.close, exitpriority=10)
+    return _SERVER
+
+
+def get_vivado_version():
+    """Version of Vivado, for the artifact cache.  Vivado is installed in a directory named
+    after its version, so its resolved path is used."""
+    return str(pathlib.Path(VIVADO_COMMAND[0]).resolve())
+
+
+def exec_tcl(tool, tcl_path, fp=None, timeout=None):
+    """Run a Vivado Tcl script for a tool, and log its output like Tool.exec_and_log.  The
+    script runs in the Vivado server of this process, or in a new Vivado process if there is no
+    server, or if it is busy with a job of another thread.  Returns an object with the
+    returncode of the script."""
+
+    # pylint: disable-next=consider-using-with
+    if not _SERVER_LOCK.acquire(blocking=False):
+        return exec_tcl_one_shot(tool, tcl_path, fp, timeout)
+    try:
+        server = get_server()
+        if server is None:
+            return exec_tcl_one_shot(tool, tcl_path, fp, timeout)
+
+        if tool.log_fp is not None:
+            tool.log_fp.flush()
+        try:
+            on_output = fp.write if fp else tool.log_output
+            result = server.run(tcl_path, tool.work_dir, on_output, timeout)
+        except subprocess.TimeoutExpired:
+            if tool.log_fp is not None:
+                tool.log(f"Vivado job timed out after {timeout}s and the server was killed")
+            raise
+    finally:
+        _SERVER_LOCK.release()
+
+    cmd = ["vivado server", str(tcl_path)]
+    tool.log_command_usage(cmd, result.returncode, result.resource_usage)
+    return result
+
+
+def exec_tcl_one_shot(tool, tcl_path, fp=None, timeout=None):
+    """Run a Vivado Tcl script for a tool in a new Vivado process"""
+    cmd = VIVADO_COMMAND + ["-source", str(tcl_path)]
+    return tool.exec_and_log(cmd, fp=fp, timeout=timeout)
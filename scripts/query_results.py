@@ -0,0 +1,121 @@
+""" Query the results database of an experiment (see bfasst/results_db.py) """
+
+from argparse import ArgumentParser
+import datetime
+import pathlib
+import sys
+
+from bfasst.results_db import DB_FILE_NAME, ResultsDB
+
+
+def print_table(rows, columns):
+    """Print rows (sqlite3.Row) as a table of the given columns"""
+    cells = [[format_cell(row[column]) for column in columns] for row in rows]
+    widths = [
+        max([len(column)] + [len(line[idx]) for line in cells])
+        for idx, column in enumerate(columns)
+    ]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    print("-" * (sum(widths) + 2 * (len(widths) - 1)))
+    for line in cells:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)))
+
+
+def format_cell(value):
+    if isinstance(value, float):
+        return f"{value:.1f}"
+    return str(value)
+
+
+def print_runs(results, _args):
+    """List the runs of the experiment, with their start time and duration"""
+    rows = []
+    for run in results.get_runs():
+        start = datetime.datetime.fromtimestamp(run["start_time"])
+        duration = run["end_time"] - run["start_time"] if run["end_time"] else None
+        rows.append(
+            {
+                "run": run["id"],
+                "experiment": run["experiment"],
+                "start": start.strftime("%Y-%m-%d %H:%M:%S"),
+                "duration": "-" if duration is None else duration,
+            }
+        )
+    print_table(rows, ["run", "experiment", "start", "duration"])
+
+
+def print_slowest(results, args):
+    rows = results.get_slowest_stages(args.run or results.get_last_run_id(), args.limit)
+    print_table(
+        [dict(row, peak_rss_mb=row["peak_rss_kb"] / 1024) for row in rows],
+        ["design", "tool", "duration", "cpu_time", "peak_rss_mb", "outcome", "status"],
+    )
+
+
+def print_regressions(results, args):
+    run_id = args.run or results.get_last_run_id()
+    baseline_run_id = args.baseline or results.get_last_run_id(before=run_id)
+    if baseline_run_id is None:
+        print("No run before run", run_id, "to compare with")
+        return
+    print(f"Run {run_id} versus run {baseline_run_id}")
+    rows = results.get_regressions(run_id, baseline_run_id, args.threshold, args.min_duration)
+    print_table(rows, ["design", "tool", "old_duration", "new_duration", "ratio"])
+
+
+def print_cache(results, args):
+    rows = results.get_cache_effectiveness(args.run or results.get_last_run_id())
+    print_table(rows, ["tool", "ran", "reused", "restored", "run_time"])
+
+
+def main():
+    """Parse the command line and run the query"""
+    parser = ArgumentParser(description="Query the results database of an experiment")
+    parser.add_argument(
+        "results",
+        type=pathlib.Path,
+        help=f"Build directory of the experiment (eg. build/<experiment>), or its {DB_FILE_NAME}",
+    )
+    parser.add_argument("--run", type=int, help="Run to report on (default: the latest)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("runs", help="List the runs of the experiment").set_defaults(
+        fcn=print_runs
+    )
+
+    slowest_parser = subparsers.add_parser("slowest", help="Stages that took the longest")
+    slowest_parser.add_argument("-n", "--limit", type=int, default=20)
+    slowest_parser.set_defaults(fcn=print_slowest)
+
+    regressions_parser = subparsers.add_parser(
+        "regressions", help="Stages that got slower than in a previous run"
+    )
+    regressions_parser.add_argument(
+        "--baseline", type=int, help="Run to compare with (default: the one before --run)"
+    )
+    regressions_parser.add_argument(
+        "--threshold", type=float, default=1.2, help="Minimum slowdown (ratio of durations)"
+    )
+    regressions_parser.add_argument(
+        "--min_duration", type=float, default=1.0, help="Ignore stages shorter than this (s)"
+    )
+    regressions_parser.set_defaults(fcn=print_regressions)
+
+    subparsers.add_parser(
+        "cache", help="Stages of each tool that ran, or were reused or restored from the cache"
+    ).set_defaults(fcn=print_cache)
+
+    args = parser.parse_args()
+
+    db_path = args.results / DB_FILE_NAME if args.results.is_dir() else args.results
+    if not db_path.is_file():
+        sys.exit(f"No results database at {db_path}")
+    results = ResultsDB(db_path)
+    try:
+        args.fcn(results, args)
+    finally:
+        results.close()
+
+
+if __name__ == "__main__":
+    main()
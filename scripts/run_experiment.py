@@ -7,7 +7,7 @@ import functools
 import multiprocessing
 import os
 import pathlib
-from shutil import copyfileobj
+import queue
 import signal
 import sys
 import threading
@@ -18,13 +18,49 @@ import traceback
 
 import bfasst
 import bfasst.experiment
-from bfasst.output_cntrl import redirect, cleanup_redirect, enable_proxy
+from bfasst.flow_graph import (
+    get_resource_budget,
+    set_resource_budget,
+    set_stage_callback,
+    shared_resource_budget,
+)
+from bfasst.job_scheduler import JobHistory, JobScheduler
+from bfasst.output_cntrl import redirect_to_file
+from bfasst.results_db import DB_FILE_NAME, OUTCOME_RAN, ResultsDB, pop_stage_records
 from bfasst.status import BfasstException, Status
+from bfasst.tool import pop_peak_rss_by_tool
 from bfasst.utils import TermColor, print_color
 
 
 LOG_FILE_NAME = "log.txt"
 
+# Events the design jobs send to the progress thread, as (event, design rel_path, data)
+JOB_STARTED = "started"  # data: start time of the job
+JOB_STAGE = "stage"  # data: name of the flow stage that started
+JOB_DONE = "done"  # data: completion message of the job
+
+# Event queue of the progress thread, in worker processes (see init_worker)
+_EVENTS = None
+
+
+def init_worker(resource_budget, events, warm=False):
+    """Process pool initializer, giving the workers the resource budget (see bfasst.flow_graph)
+    and the event queue of the main process.  Warm workers also start the JVM and load the
+    RapidWright device of the part up front, and keep them for all of their jobs."""
+    global _EVENTS  # pylint: disable=global-statement
+    set_resource_budget(resource_budget)
+    _EVENTS = events
+
+    if warm:
+        # pylint: disable=import-outside-toplevel
+        from bfasst import jpype_jvm
+
+        jpype_jvm.get_device()
+
+
+def post_event(event, design_rel_path, data=None):
+    _EVENTS.put((event, design_rel_path, data))
+
 
 def print_running_list(running_list):
     """This function prints the list of jobs that are currently executing,
@@ -32,8 +68,10 @@ def print_running_list(running_list):
 
     sys.stdout.write("\r\033[K")
     sys.stdout.write("Running: ")
-    for design_rel_path, start_time in running_list.items()[:6]:
+    for design_rel_path, (start_time, stage) in list(running_list.items())[:6]:
         sys.stdout.write(design_rel_path.name[:8] + " (")
+        if stage is not None:
+            sys.stdout.write(stage + ", ")
         sys.stdout.write(str(datetime.datetime.now() - start_time).split(".", maxsplit=1)[0])
         sys.stdout.write(") ")
     if len(running_list) > 6:
@@ -41,145 +79,189 @@ def print_running_list(running_list):
     sys.stdout.flush()
 
 
-def update_runtimes_thread(print_lock, num_jobs, running_list, statuses, period=1):
-    """This function, designed to run in its own thread,
-    calls print_running_list() periodically, until all jobs are done,
-    or it is terminated."""
+def print_progress(events, num_jobs, print_period=1):
+    """This function, designed to run in its own thread, consumes the events of
+    the jobs until they are all done.  It prints each job completion message,
+    and the list of running jobs whenever it changes, and every print_period
+    seconds (unless 0)."""
 
-    if len(statuses) == num_jobs:
-        sys.stdout.write("\r\033[K")
-        print("All done")
-        return
-    with print_lock:
+    running_list = {}
+    num_done = 0
+    while num_done < num_jobs:
+        try:
+            event, design_rel_path, data = events.get(timeout=print_period or None)
+        except queue.Empty:
+            print_running_list(running_list)
+            continue
+
+        if event == JOB_STARTED:
+            running_list[design_rel_path] = (data, None)
+        elif event == JOB_STAGE and design_rel_path in running_list:
+            running_list[design_rel_path] = (running_list[design_rel_path][0], data)
+        elif event == JOB_DONE:
+            running_list.pop(design_rel_path, None)
+            num_done += 1
+            sys.stdout.write("\r\033[K" + data + "\n")
         print_running_list(running_list)
-    threading.Timer(
-        period,
-        update_runtimes_thread,
-        (print_lock, num_jobs, running_list, statuses),
-    ).start()
+
+    sys.stdout.write("\r\033[K")
+    print("All done")
 
 
-def run_design(print_lock, running_list, design, work_path, flow_fcn, flow_args):
+def run_design(design, work_path, flow_fcn, flow_args):
     """This function runs a single job, running the selected CAD flow for one design"""
 
-    enable_proxy()  # Enable STDOUT redirects
+    post_event(JOB_STARTED, design.rel_path, datetime.datetime.now())
+    set_stage_callback(functools.partial(post_event, JOB_STAGE, design.rel_path))
 
-    running_list[design.rel_path] = datetime.datetime.now()
-    with print_lock:
-        print_running_list(running_list)
+    # Peak memory of the tools of this job, for the job history (see bfasst.job_scheduler),
+    # and the metrics of its stages (see bfasst.results_db)
+    pop_peak_rss_by_tool()
+    pop_stage_records()
 
-    buf = redirect()
-    try:
-        status = flow_fcn(design=design, build_dir=work_path, flow_args=flow_args)
-    except BfasstException as e:
-        status = Status(status=e.error, msg=str(e), raise_excep=False)
-    finally:
-        with open(work_path / LOG_FILE_NAME, "w") as f:
-            buf.seek(0)
-            copyfileobj(buf, f)
-        cleanup_redirect()
-    return (design, status)
+    # Workers run one job at a time, so all of the output of the process (including its
+    # threads, the JVM and child processes) is the output of the job
+    with redirect_to_file(work_path / LOG_FILE_NAME):
+        try:
+            status = flow_fcn(design=design, build_dir=work_path, flow_args=flow_args)
+        except BfasstException as e:
+            status = Status(status=e.error, msg=str(e), raise_excep=False)
+    return (design, status, pop_peak_rss_by_tool(), pop_stage_records())
 
 
-def job_done(experiment, print_lock, running_list, design, work_path, statuses, future):
-    """Removes job from the running_list, prints the job completion status,
-    and saves the return status."""
+def job_done(experiment, scheduler, events, design, future):
+    """Saves the exception of a failed job to its log, sends the job completion
+    message to the progress thread, and returns the job status, runtime and
+    stage records."""
 
     ljust = experiment.get_longest_design_name() + 5
 
-    with print_lock:
-        if future.exception():
-            status = future.exception()
+    if future.exception():
+        status = future.exception()
+        peak_rss_kb, stage_records = None, []
 
-            with open(work_path / LOG_FILE_NAME, "a") as f:
-                traceback.print_exception(status, value=status, tb=status.__traceback__, file=f)
-        else:
-            status = future.result()[1]
+        with open(experiment.work_dir / design.rel_path / LOG_FILE_NAME, "a") as f:
+            traceback.print_exception(status, value=status, tb=status.__traceback__, file=f)
+    else:
+        _, status, peak_rss_kb, stage_records = future.result()
+        if not any(record.outcome == OUTCOME_RAN for record in stage_records):
+            # Nothing ran, so the runtime and memory of the job say nothing about a real run
+            peak_rss_kb = None
+
+    runtime = scheduler.finish(design, peak_rss_kb)
+    predicted_runtime = scheduler.estimates[design.rel_path].runtime
+
+    msg = str(design.rel_path).ljust(ljust) + str(status)
+    msg += f" (took {runtime:.0f}s, predicted {predicted_runtime:.0f}s)"
+    events.put((JOB_DONE, design.rel_path, msg))
+    return status, runtime, stage_records
+
+
+def run_jobs(pool, experiment, scheduler, events, statuses, *, results):
+    """Submit the design jobs to the pool as the scheduler admits them, until all are done.
+    Finished jobs are added to the results database as they come."""
+    futures = {}
+    while scheduler.pending or futures:
+        for design in scheduler.start_ready_jobs():
+            design_dir = experiment.work_dir / design.rel_path
+            design_dir.mkdir(parents=True, exist_ok=True)
 
-        sys.stdout.write("\r\033[K")
-        # sys.stdout.write("\033[u")
-        sys.stdout.write(str(design.rel_path).ljust(ljust))
-        sys.stdout.flush()
-        sys.stdout.write(str(status))
-        sys.stdout.write("\n")
-        # sys.stdout.write("\033[s")
+            future = pool.submit(
+                run_design, design, design_dir, experiment.flow_fcn, experiment.flow_args
+            )
+            futures[future] = design
 
-        del running_list[design.rel_path]
-        print_running_list(running_list)
+        done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            design = futures.pop(future)
+            status, runtime, stage_records = job_done(experiment, scheduler, events, design, future)
+            statuses.append(status)
+            results.add_job(str(design.rel_path), status, runtime, stage_records)
 
-    statuses.append(status)
 
+def create_worker_pool(num_workers, events, warm_workers, max_jobs_per_worker):
+    """Process pool that runs the design jobs"""
+    kwargs = {}
+    if max_jobs_per_worker is not None:
+        # Workers run many jobs; replacing them every few jobs bounds any leaks (Python 3.11+,
+        # checked with the command line)
+        kwargs["max_tasks_per_child"] = max_jobs_per_worker
 
-def main(experiment_yaml, num_threads, print_period=1):
+    # https://github.com/jpype-project/jpype/issues/1024
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        # Jobs share the CPU and memory budget of this process (see bfasst.flow_graph)
+        initializer=init_worker,
+        initargs=(get_resource_budget(), events, warm_workers),
+        **kwargs,
+    )
+
+
+def main(
+    experiment_yaml,
+    num_threads,
+    print_period=1,
+    memory_budgets=None,
+    *,
+    warm_workers=False,
+    max_jobs_per_worker=None,
+):
     """Setup and run experiment as multiple processes"""
     # os.setpgrp()  # create new process group, become its leader
 
     # Make sure we capture Ctrl+C
     signal.signal(signal.SIGINT, signal.default_int_handler)
 
-    enable_proxy()  # Enable STDOUT redirects
-
     # Build experiment object
     experiment = bfasst.experiment.Experiment(experiment_yaml)
 
     # Don't run with less than one thread
     num_threads = max(1, num_threads)
 
-    statuses = multiprocessing.Manager().list()
-    running_list = multiprocessing.Manager().dict()
-    print_lock = multiprocessing.Manager().Lock()
-
     print_color(TermColor.BLUE, "Running", len(experiment.designs), "designs")
 
+    # Longest jobs first, within the memory budget of each tool type
+    scheduler = JobScheduler(
+        experiment.designs,
+        JobHistory(experiment.work_dir),
+        num_threads,
+        memory_budgets,
+        get_resource_budget().get_size()[1],
+    )
+
     t_start = time.perf_counter()
     sys.stdout.write("\033[s")
 
-    if print_period:
-        update_process = multiprocessing.Process(
-            target=update_runtimes_thread,
-            args=[print_lock, len(experiment.designs), running_list, statuses],
-        )
-        update_process.start()
-
-    results = []
+    # Workers report the progress of their jobs over a single queue, which is
+    # rendered by one thread of this process
+    events = multiprocessing.get_context("spawn").Queue()
+    progress_thread = threading.Thread(
+        target=print_progress, args=(events, len(experiment.designs), print_period), daemon=True
+    )
+    progress_thread.start()
 
-    # https://github.com/jpype-project/jpype/issues/1024
-    with concurrent.futures.ProcessPoolExecutor(
-        max_workers=num_threads, mp_context=multiprocessing.get_context("spawn")
-    ) as pool:
-        for design in experiment.designs:
-            design_dir = experiment.work_dir / design.rel_path
-            design_dir.mkdir(parents=True, exist_ok=True)
-
-            future = pool.submit(
-                run_design,
-                print_lock,
-                running_list,
-                design,
-                design_dir,
-                experiment.flow_fcn,
-                experiment.flow_args,
-            )
-            future.add_done_callback(
-                functools.partial(
-                    job_done, experiment, print_lock, running_list, design, design_dir, statuses
-                )
-            )
-            results.append(future)
+    statuses = []
+    results = ResultsDB(experiment.work_dir / DB_FILE_NAME)
+    results.start_run(experiment.name)
 
+    with create_worker_pool(num_threads, events, warm_workers, max_jobs_per_worker) as pool:
         try:
+            run_jobs(pool, experiment, scheduler, events, statuses, results=results)
             pool.shutdown(wait=True)
         except KeyboardInterrupt:
             os.killpg(0, signal.SIGKILL)  # kill all processes in my group
 
-    if print_period:
-        update_process.terminate()
-        update_process.join()
+    progress_thread.join()
     t_end = time.perf_counter()
 
     if experiment.post_run is not None:
         experiment.post_run(experiment.work_dir)
 
+    results.end_run()
+    results.close()
+    print(scheduler.get_report())
+    print("Stage metrics are in", results.path, "(see scripts/query_results.py)")
     print_ending_stats(statuses, t_end - t_start)
 
 
@@ -228,5 +310,43 @@ if __name__ == "__main__":
     parser.add_argument("experiment_yaml", type=pathlib.Path, help="Experiment yaml file.")
     parser.add_argument("-j", "--threads", type=int, default=1, help="Number of threads")
     parser.add_argument("--print_period", type=int, default=1)
+    parser.add_argument(
+        "--cpus", type=int, help="CPUs available to flow stages (default: all of them)"
+    )
+    parser.add_argument(
+        "--memory", type=float, help="Memory (GB) available to flow stages (default: all of it)"
+    )
+    parser.add_argument(
+        "--tool_memory",
+        action="append",
+        default=[],
+        metavar="TOOL=GB",
+        help="Memory (GB) available to the jobs running a type of tool, eg. vivado_impl=32 "
+        "(default: --memory).  Can be repeated.",
+    )
+    parser.add_argument(
+        "--warm_workers",
+        action="store_true",
+        help="Start the JVM and load the RapidWright device in each worker before its first job",
+    )
+    parser.add_argument(
+        "--max_jobs_per_worker",
+        type=int,
+        help="Replace each worker process after this many jobs (default: never)",
+    )
     args = parser.parse_args()
-    main(args.experiment_yaml, args.threads, args.print_period)
+    if args.max_jobs_per_worker is not None and sys.version_info < (3, 11):
+        parser.error("--max_jobs_per_worker needs Python 3.11")
+    tool_memory = {}
+    for budget in args.tool_memory:
+        tool, _, memory = budget.partition("=")
+        tool_memory[tool] = float(memory)
+    with shared_resource_budget(args.cpus, args.memory):
+        main(
+            args.experiment_yaml,
+            args.threads,
+            args.print_period,
+            tool_memory,
+            warm_workers=args.warm_workers,
+            max_jobs_per_worker=args.max_jobs_per_worker,
+        )